@@ -0,0 +1,199 @@
+# agents/allocation.py
+import numpy as np
+
+ALLOCATION_METHODS = ("score", "inverse_risk", "risk_parity", "mean_variance")
+
+
+def _bisect(total, low, high, target, iterations=60):
+    """Find x in [low, high] where the non-decreasing total(x) reaches target."""
+    for _ in range(iterations):
+        mid = (low + high) / 2
+        if total(mid) < target:
+            low = mid
+        else:
+            high = mid
+    return (low + high) / 2
+
+
+def cap_weights(raw, cap, target=1.0):
+    """
+    Scale non-negative raw weights to sum to target with no weight above cap.
+
+    Weights that hit the cap are fixed there and the excess goes to the others
+    in proportion to their raw weight. When cap times the number of positive
+    weights is below target, every positive weight gets the cap.
+
+    Args:
+        raw (np.ndarray): Non-negative raw weights
+        cap (float): Maximum weight
+        target (float): Sum of the returned weights
+
+    Returns:
+        np.ndarray: Capped weights
+    """
+    raw = np.asarray(raw, dtype=float)
+    positive = raw > 0
+    if not positive.any():
+        return np.zeros_like(raw)
+    target = min(target, cap * positive.sum())
+
+    # With the k largest weights capped, the rest are scaled by (target - k * cap) / (sum of the rest)
+    order = np.argsort(-raw)
+    ranked = raw[order]
+    rest = np.cumsum(ranked[::-1])[::-1]  # rest[k] = sum of ranked[k:]
+    k = np.arange(len(ranked))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scale = (target - k * cap) / rest
+        # Smallest k whose scaled largest uncapped weight fits under the cap
+        fits = (ranked > 0) & (scale * ranked <= cap * (1 + 1e-12))
+    first = int(np.argmax(fits)) if fits.any() else int(positive.sum())
+    weights = np.zeros_like(raw)
+    capped = order[:first]
+    weights[capped] = cap
+    if first < len(ranked) and rest[first] > 0:
+        weights[order[first:]] = scale[first] * ranked[first:]
+    return weights
+
+
+class PortfolioAllocator:
+    def __init__(self, max_weight=0.25, correlation=0.3, volatility_range=(0.15, 0.60),
+                 max_expected_return=0.20, risk_aversion=3.0):
+        """
+        Initialize the allocator and its risk model.
+
+        Without return histories, risk and return are derived from the scores:
+        a stock's volatility rises linearly from volatility_range[0] at risk_score
+        10 (lowest risk) to volatility_range[1] at risk_score 1, every pair of
+        stocks has the same correlation, and the expected return rises linearly
+        from -max_expected_return at overall score 0 to +max_expected_return at 100.
+
+        Args:
+            max_weight (float): Maximum weight of one position
+            correlation (float): Pairwise correlation of stock returns
+            volatility_range (tuple): Annual volatility of the lowest and highest risk stocks
+            max_expected_return (float): Expected annual return of a stock scored 100
+            risk_aversion (float): Variance penalty of mean-variance allocation
+        """
+        if not 0 < max_weight <= 1:
+            raise ValueError("max_weight must be in (0, 1]")
+        if not 0 <= correlation < 1:
+            raise ValueError("correlation must be in [0, 1)")
+        self.max_weight = max_weight
+        self.correlation = correlation
+        self.volatility_range = volatility_range
+        self.max_expected_return = max_expected_return
+        self.risk_aversion = risk_aversion
+
+    def volatilities(self, risk_scores):
+        """Annual volatility implied by risk scores (1=highest risk, 10=lowest risk)."""
+        risk_level = (10 - np.clip(risk_scores, 1, 10)) / 9
+        low, high = self.volatility_range
+        return low + (high - low) * risk_level
+
+    def expected_returns(self, overall_scores):
+        """Expected annual return implied by overall scores (0-100)."""
+        return self.max_expected_return * (np.clip(overall_scores, 0, 100) - 50) / 50
+
+    def covariance_product(self, w, vol):
+        """
+        Covariance matrix times w without building the matrix.
+
+        With constant correlation rho, cov = diag(vol) ((1 - rho) I + rho 11') diag(vol),
+        so cov @ w = vol * ((1 - rho) * vol * w + rho * (vol @ w)).
+        """
+        weighted = vol * w
+        return vol * ((1 - self.correlation) * weighted + self.correlation * weighted.sum())
+
+    def _mean_variance(self, mu, vol, iterations=50):
+        """
+        Maximize mu @ w - risk_aversion / 2 * w @ cov @ w subject to 0 <= w <= max_weight
+        and sum(w) = target, over the stocks with a positive expected return.
+
+        Stocks expected to lose money get no weight: with non-negative correlations
+        they add variance and cost return, so cash beats them. The budget is fully
+        invested across the rest, up to their position caps; with none left it is all cash.
+
+        The covariance is diagonal plus rank one, so the KKT conditions give each
+        weight in closed form from two scalars: the budget multiplier nu and the
+        exposure m = vol @ w. Both are found by bisection, m outside and nu inside.
+        """
+        positive = mu > 0
+        result = np.zeros_like(mu)
+        if not positive.any():
+            return result
+        mu, vol = mu[positive], vol[positive]
+        target = min(1.0, self.max_weight * len(mu))
+        curvature = self.risk_aversion * (1 - self.correlation) * vol ** 2
+
+        def weights_for(m):
+            base = mu - self.risk_aversion * self.correlation * vol * m
+            weights = lambda nu: np.clip((base - nu) / curvature, 0.0, self.max_weight)
+            # The invested total falls as nu rises: all positions capped below low, none above high
+            nu = _bisect(lambda nu: -weights(nu).sum(), (base - curvature * self.max_weight).min(), base.max(),
+                         -target, iterations)
+            return weights(nu)
+
+        # A larger exposure shifts weight to low volatility stocks, so vol @ w(m) - m is decreasing
+        m = _bisect(lambda m: m - vol @ weights_for(m), 0.0, vol.max() * target, 0.0, iterations)
+        result[positive] = weights_for(m)
+        return result
+
+    def allocate(self, stocks, method="score", include_hold=False):
+        """
+        Allocate a portfolio across scored stocks.
+
+        Only Buy recommendations (and Hold with include_hold) receive weight.
+        Weight that the position cap leaves unallocated is reported as cash, as is
+        the whole budget under mean_variance when no eligible stock has a positive
+        expected return.
+
+        Args:
+            stocks (list): Dicts with ticker, overall_score, risk_score and investment_recommendation
+            method (str): "score" (proportional to overall score), "inverse_risk" (inversely
+                proportional to risk level), "risk_parity" (equal risk contributions) or
+                "mean_variance" (best return for the variance, at the risk aversion)
+            include_hold (bool): Also allocate to Hold recommendations
+
+        Returns:
+            dict: Weights and risk contributions per ticker, cash weight, and the expected
+                return and volatility of the portfolio under the risk model
+        """
+        if method not in ALLOCATION_METHODS:
+            raise ValueError(f"Unknown allocation method '{method}'; expected one of {', '.join(ALLOCATION_METHODS)}")
+
+        tickers = [stock["ticker"] for stock in stocks]
+        overall = np.array([float(stock.get("overall_score") or 0) for stock in stocks])
+        risk = np.array([float(stock.get("risk_score") or 1) for stock in stocks])
+        allowed = ("buy", "hold") if include_hold else ("buy",)
+        eligible = np.array([str(stock.get("investment_recommendation", "")).lower() in allowed
+                             for stock in stocks], dtype=bool)
+
+        weights = np.zeros(len(stocks))
+        vol = self.volatilities(risk)
+        mu = self.expected_returns(overall)
+        if eligible.any():
+            if method == "score":
+                weights[eligible] = cap_weights(overall[eligible], self.max_weight)
+            elif method == "inverse_risk":
+                # Risk level 1 (risk_score 10) to 10 (risk_score 1)
+                weights[eligible] = cap_weights(1.0 / (11 - np.clip(risk[eligible], 1, 10)), self.max_weight)
+            elif method == "risk_parity":
+                # With constant correlation, equal risk contributions is exactly inverse volatility
+                weights[eligible] = cap_weights(1.0 / vol[eligible], self.max_weight)
+            else:
+                weights[eligible] = self._mean_variance(mu[eligible], vol[eligible])
+
+        marginal = self.covariance_product(weights, vol)
+        variance = float(weights @ marginal)
+        contributions = weights * marginal / variance if variance > 0 else np.zeros_like(weights)
+        return {
+            "method": method,
+            "max_weight": self.max_weight,
+            "allocations": [
+                {"ticker": ticker, "weight": round(float(w), 6), "risk_contribution": round(float(rc), 6)}
+                for ticker, w, rc in zip(tickers, weights, contributions)
+            ],
+            "cash_weight": round(max(0.0, 1.0 - float(weights.sum())), 6),
+            "expected_return": round(float(weights @ mu), 6),
+            "volatility": round(float(np.sqrt(variance)), 6)
+        }
@@ -0,0 +1,114 @@
+# agents/article_ledger.py
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+class ArticleLedger:
+    def __init__(self, path, clock=time.time):
+        """
+        Per-ticker record of every article seen, with its relevance verdict and extraction.
+
+        Args:
+            path (str): SQLite database path
+            clock (callable): Time source, for tests
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "ticker TEXT NOT NULL, url TEXT NOT NULL, content_hash TEXT NOT NULL, "
+            "relevant INTEGER NOT NULL, explanation TEXT, extraction TEXT, "
+            "first_seen REAL NOT NULL, last_seen REAL NOT NULL, PRIMARY KEY (ticker, url))"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS articles_last_seen ON articles (ticker, last_seen)")
+
+    @staticmethod
+    def content_hash(content):
+        """Hash article text, ignoring whitespace differences."""
+        return hashlib.sha256(" ".join(content.split()).encode("utf-8")).hexdigest()
+
+    def lookup(self, ticker, url):
+        """
+        Return the ledger entry for an article.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            url (str): Article URL
+
+        Returns:
+            dict: Entry with content_hash, relevant, explanation and extraction, or None
+        """
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT content_hash, relevant, explanation, extraction FROM articles WHERE ticker = ? AND url = ?",
+                (ticker.upper(), url)
+            ).fetchone()
+        if row is None:
+            return None
+        return {
+            "content_hash": row[0],
+            "relevant": bool(row[1]),
+            "explanation": row[2],
+            "extraction": json.loads(row[3]) if row[3] else None
+        }
+
+    def record_verdict(self, ticker, url, content_hash, relevant, explanation):
+        """Store the relevance verdict for an article, clearing any extraction of older content."""
+        now = self.clock()
+        with self.lock:
+            self.conn.execute(
+                "INSERT INTO articles (ticker, url, content_hash, relevant, explanation, extraction, first_seen, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, NULL, ?, ?) "
+                "ON CONFLICT (ticker, url) DO UPDATE SET content_hash = excluded.content_hash, "
+                "relevant = excluded.relevant, explanation = excluded.explanation, extraction = NULL, "
+                "last_seen = excluded.last_seen",
+                (ticker.upper(), url, content_hash, int(relevant), explanation, now, now)
+            )
+
+    def record_extraction(self, ticker, url, content_hash, extraction):
+        """Store the extraction for an article whose verdict is recorded with the same content."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE articles SET extraction = ? WHERE ticker = ? AND url = ? AND content_hash = ?",
+                (json.dumps(extraction), ticker.upper(), url, content_hash)
+            )
+
+    def mark_seen(self, ticker, url):
+        """Record that an article appeared in the latest search results."""
+        with self.lock:
+            self.conn.execute(
+                "UPDATE articles SET last_seen = ? WHERE ticker = ? AND url = ?",
+                (self.clock(), ticker.upper(), url)
+            )
+
+    def recent_extractions(self, ticker, max_age_seconds, exclude_urls=(), limit=10):
+        """
+        Return extractions of relevant articles seen recently, most recent first.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            max_age_seconds (float): Only articles seen within this many seconds
+            exclude_urls (iterable): URLs already in the current set
+            limit (int): Maximum number of extractions
+
+        Returns:
+            list: Extraction results as produced by ExtractionAgent.extract
+        """
+        if limit <= 0:
+            return []
+        exclude_urls = set(exclude_urls)
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT url, extraction FROM articles WHERE ticker = ? AND relevant = 1 "
+                "AND extraction IS NOT NULL AND last_seen >= ? ORDER BY last_seen DESC",
+                (ticker.upper(), self.clock() - max_age_seconds)
+            ).fetchall()
+        extractions = [json.loads(extraction) for url, extraction in rows if url not in exclude_urls]
+        return extractions[:limit]
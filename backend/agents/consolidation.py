@@ -0,0 +1,172 @@
+# agents/consolidation.py
+import re
+from collections import Counter
+
+SEVERITY_RANK = {"low": 1, "medium": 2, "high": 3}
+
+class InsightConsolidator:
+    def __init__(self, similarity_threshold=0.6):
+        """
+        Initialize the Insight Consolidator.
+
+        Args:
+            similarity_threshold (float): Word-overlap ratio above which two
+                business developments are treated as the same event
+        """
+        self.similarity_threshold = similarity_threshold
+
+    @staticmethod
+    def _normalize(text):
+        """Lower-case a value and collapse punctuation and whitespace for matching."""
+        return re.sub(r"[^a-z0-9%.$]+", " ", str(text or "").lower()).strip()
+
+    @staticmethod
+    def _add_source(entry, url):
+        """Record a provenance URL on a merged entry."""
+        if url and url not in entry["sources"]:
+            entry["sources"].append(url)
+
+    def _merge_by_key(self, items, key_field, value_fields):
+        """
+        Merge items sharing a normalized key, keeping the most-cited values.
+
+        Args:
+            items (list): (url, item) pairs in article order
+            key_field (str): Field identifying duplicates
+            value_fields (list): Fields whose most-cited value is kept
+
+        Returns:
+            list: Merged entries with sources and mention counts
+        """
+        groups = {}
+        for url, item in items:
+            key = self._normalize(item.get(key_field))
+            if not key:
+                continue
+            group = groups.setdefault(key, {"item": dict(item), "votes": Counter(), "sources": [], "mentions": 0})
+            group["mentions"] += 1
+            if url and url not in group["sources"]:
+                group["sources"].append(url)
+            values = tuple(self._normalize(item.get(field)) for field in value_fields)
+            if any(values):
+                group["votes"][values] += 1
+                group.setdefault("originals", {}).setdefault(values, item)
+
+        merged = []
+        for group in groups.values():
+            entry = group["item"]
+            if group["votes"]:
+                # Counter.most_common keeps first-seen order on ties, so earlier articles win
+                top_values = group["votes"].most_common(1)[0][0]
+                # Every field comes from the winning report, so values of different reports are never mixed
+                entry = {**group["originals"][top_values], key_field: entry.get(key_field)}
+            entry["sources"] = group["sources"]
+            entry["mentions"] = group["mentions"]
+            merged.append(entry)
+
+        # Most-cited entries first
+        return sorted(merged, key=lambda x: -x["mentions"])
+
+    def _merge_developments(self, items):
+        """Merge business developments whose descriptions overlap heavily."""
+        merged = []
+        for url, item in items:
+            words = set(self._normalize(item.get("description")).split())
+            if not words:
+                continue
+            for entry in merged:
+                overlap = len(words & entry["_words"]) / len(words | entry["_words"])
+                if overlap >= self.similarity_threshold:
+                    entry["mentions"] += 1
+                    self._add_source(entry, url)
+                    break
+            else:
+                entry = {**item, "sources": [], "mentions": 1, "_words": words}
+                self._add_source(entry, url)
+                merged.append(entry)
+
+        for entry in merged:
+            del entry["_words"]
+        return sorted(merged, key=lambda x: -x["mentions"])
+
+    def _merge_risks(self, items):
+        """Merge risk factors of the same type, keeping the highest severity."""
+        merged = {}
+        for url, item in items:
+            key = self._normalize(item.get("risk_type"))
+            if not key:
+                continue
+            severity = SEVERITY_RANK.get(self._normalize(item.get("severity")), 0)
+            entry = merged.get(key)
+            if entry is None:
+                entry = merged[key] = {**item, "sources": [], "mentions": 0, "_rank": severity}
+            elif severity > entry["_rank"]:
+                entry.update({**item, "sources": entry["sources"], "mentions": entry["mentions"], "_rank": severity})
+            entry["mentions"] += 1
+            self._add_source(entry, url)
+
+        for entry in merged.values():
+            del entry["_rank"]
+        return sorted(merged.values(), key=lambda x: (-SEVERITY_RANK.get(self._normalize(x.get("severity")), 0), -x["mentions"]))
+
+    def _merge_sentiment(self, items):
+        """Combine market sentiment into a majority view with per-label counts."""
+        counts = Counter()
+        sources = []
+        for url, sentiment in items:
+            label = self._normalize(sentiment.get("overall_sentiment"))
+            if label:
+                counts[label] += 1
+                if url and url not in sources:
+                    sources.append(url)
+        if not counts:
+            return {}
+        return {
+            "overall_sentiment": counts.most_common(1)[0][0],
+            "counts": dict(counts),
+            "sources": sources
+        }
+
+    def consolidate(self, extraction_results):
+        """
+        Merge duplicate insights across articles before scoring.
+
+        Args:
+            extraction_results (dict): Results from ExtractionAgent
+
+        Returns:
+            dict: Extraction results with consolidated insights added
+        """
+        extracted_insights = extraction_results["extracted_insights"]
+
+        metrics, opinions, developments, sentiments, risks = [], [], [], [], []
+        summaries = []
+        for article_insights in extracted_insights:
+            url = article_insights.get("url")
+            if article_insights.get("summary"):
+                summaries.append({"url": url, "summary": article_insights["summary"]})
+
+            structured = article_insights.get("structured_insights") or {}
+            metrics.extend((url, m) for m in structured.get("financial_metrics") or [])
+            opinions.extend((url, o) for o in structured.get("analyst_opinions") or [])
+            developments.extend((url, d) for d in structured.get("business_developments") or [])
+            if structured.get("market_sentiment"):
+                sentiments.append((url, structured["market_sentiment"]))
+            risks.extend((url, r) for r in structured.get("risk_factors") or [])
+
+        consolidated_insights = {
+            "article_count": len(extracted_insights),
+            "summaries": summaries,
+            "financial_metrics": self._merge_by_key(metrics, "metric_name", ["value", "comparison", "sentiment"]),
+            "analyst_opinions": self._merge_by_key(
+                opinions, "analyst_or_firm", ["rating", "target_price", "previous_rating", "previous_target"]
+            ),
+            "business_developments": self._merge_developments(developments),
+            "market_sentiment": self._merge_sentiment(sentiments),
+            "risk_factors": self._merge_risks(risks)
+        }
+
+        return {
+            **extraction_results,
+            "consolidated_insights": consolidated_insights
+        }
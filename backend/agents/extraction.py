@@ -3,20 +3,47 @@ from langchain_openai import ChatOpenAI
 from langchain.chains import create_extraction_chain
 from langchain.prompts import PromptTemplate
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.runnables import RunnableLambda
 from langchain_core.utils.function_calling import convert_to_openai_function
 from langchain.output_parsers.openai_functions import JsonOutputFunctionsParser
+import hashlib
+import json
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import LLM_MODEL
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (LLM_MODEL, EXTRACTION_SINGLE_CALL, EXTRACTION_MAX_CONCURRENCY, EXTRACTION_TOKEN_BUDGET,
+                    PASSAGE_TOKENS, EXTRACTION_CACHE_ENABLED, EXTRACTION_CACHE_TTL_SECONDS,
+                    LEDGER_LOOKBACK_DAYS, LEDGER_MAX_ARTICLES)
+from utils.passages import select_passages
+from utils.helpers import clean_text
+from utils.cache import get_cache
+from utils.tracing import get_tracer
+from utils.profiling import profile_thread
+from utils.llm_costs import TokenBudgetExceeded
 
 class ExtractionAgent:
-    def __init__(self):
+    def __init__(self, single_call=None, use_cache=None, ledger=None):
         """
         Initialize the Extraction Agent with necessary components.
+        
+        Args:
+            single_call (bool): Return the summary from the extraction function call
+                instead of a separate summary call. Defaults to EXTRACTION_SINGLE_CALL.
+            use_cache (bool): Reuse cached extractions of identical content.
+                Defaults to EXTRACTION_CACHE_ENABLED.
+            ledger (ArticleLedger): Record new extractions and merge in the ticker's
+                recent extractions from earlier runs
         """
+        self.ledger = ledger
+        self.single_call = EXTRACTION_SINGLE_CALL if single_call is None else single_call
+        self.use_cache = EXTRACTION_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = get_cache()
+        self.cache.set_ttl("extraction", EXTRACTION_CACHE_TTL_SECONDS)
+        
         # Initialize LLM
         self.llm = ChatOpenAI(temperature=0, model=LLM_MODEL)
         
@@ -131,6 +158,55 @@ class ExtractionAgent:
         )
         
         self.summary_chain = PromptTemplate.from_template(summary_template) | self.llm | StrOutputParser()
+        
+        # Create combined extraction + summary chain (one call per article)
+        self.combined_schema = {
+            **self.extraction_schema,
+            "properties": {
+                **self.extraction_schema["properties"],
+                "summary": {
+                    "type": "string",
+                    "description": "Concise summary of the key investment insights for a short-term investor"
+                }
+            },
+            "required": ["summary"]
+        }
+        
+        combined_function = convert_to_openai_function({
+            "name": "extract_stock_insights",
+            "description": "Extract structured insights and a short investment summary from financial text about a stock",
+            "parameters": self.combined_schema
+        })
+        
+        self.combined_extraction_llm = self.llm.bind(
+            functions=[combined_function],
+            function_call={"name": "extract_stock_insights"}
+        )
+        
+        combined_template = """
+        You are a financial analyst specializing in extracting key insights for stock investors.
+        
+        Extract structured insights about {ticker} ({company_name}) from the following article.
+        In the summary field, give a concise summary of the most important information for a
+        short-term investor (last 3 month horizon), focusing on recent financial results,
+        analyst ratings and price targets, business developments, market sentiment and key risks.
+        
+        Article:
+        {text}
+        """
+        
+        self.combined_chain = PromptTemplate.from_template(combined_template) | self.combined_extraction_llm | self.parser
+        
+        # Version cached extractions by everything that shapes the LLM output,
+        # so changing the schema, prompts or passage budget invalidates old entries
+        version_source = json.dumps({
+            "single_call": self.single_call,
+            "schema": self.combined_schema if self.single_call else self.extraction_schema,
+            "template": combined_template if self.single_call else summary_template,
+            "token_budget": EXTRACTION_TOKEN_BUDGET,
+            "passage_tokens": PASSAGE_TOKENS
+        }, sort_keys=True)
+        self.schema_version = hashlib.sha256(version_source.encode("utf-8")).hexdigest()[:12]
     
     def extract(self, article, ticker, company_name):
         """
@@ -144,9 +220,58 @@ class ExtractionAgent:
         Returns:
             dict: Structured insights
         """
-        # Use the first 4000 chars of the article to avoid token limits
-        content = article['content'][:4000]
+        with get_tracer().start_span("extract_article", attributes={"url": article['url']}) as span, profile_thread():
+            cleaned_content = clean_text(article['content'])
+            
+            cache_key = self._cache_key(cleaned_content, ticker, company_name) if self.use_cache else None
+            if cache_key:
+                cache_hit, cached = self.cache.get("extraction", cache_key)
+                span.set_attribute("cache_hit", cache_hit)
+                if cache_hit:
+                    return {"url": article['url'], **cached}
+            
+            # Send the most relevant passages that fit in the token budget
+            content = select_passages(
+                cleaned_content, ticker, company_name,
+                token_budget=EXTRACTION_TOKEN_BUDGET,
+                passage_tokens=PASSAGE_TOKENS,
+                model=LLM_MODEL
+            )
+            
+            if self.single_call:
+                insights = self._extract_single_call(article, content, ticker, company_name)
+            else:
+                insights = self._extract_two_calls(article, content, ticker, company_name)
+            
+            # Only cache successful extractions so failures are retried
+            if cache_key and insights["structured_insights"]:
+                self.cache.set("extraction", cache_key, {
+                    "structured_insights": insights["structured_insights"],
+                    "summary": insights["summary"]
+                })
+            
+            return insights
+    
+    def _cache_key(self, cleaned_content, ticker, company_name):
+        """Build the extraction cache key from content, ticker, company name, model and schema version."""
+        digest = hashlib.sha256(
+            "\x1f".join([cleaned_content, ticker, company_name, LLM_MODEL, self.schema_version]).encode("utf-8")
+        ).hexdigest()
+        return digest
+    
+    def _extract_two_calls(self, article, content, ticker, company_name):
+        """
+        Extract structured insights and the summary with separate LLM calls.
         
+        Args:
+            article (dict): Article content and metadata
+            content (str): Article text sent to the LLM
+            ticker (str): Stock ticker symbol
+            company_name (str): Company name
+            
+        Returns:
+            dict: Structured insights
+        """
         # Extract structured data
         chain = self.extraction_llm | self.parser
         
@@ -154,6 +279,9 @@ class ExtractionAgent:
             structured_insights = chain.invoke(
                 f"Extract insights about {ticker} ({company_name}) from this article: {content}"
             )
+        except TokenBudgetExceeded:
+            # Fails the article without spending more; the pipeline degrades from there
+            raise
         except Exception as e:
             print(f"Error in extraction: {str(e)}")
             structured_insights = {}
@@ -171,29 +299,137 @@ class ExtractionAgent:
             "summary": summary
         }
     
-    def process(self, filtered_results):
+    def _extract_single_call(self, article, content, ticker, company_name):
+        """
+        Extract structured insights and the summary with a single function call.
+        
+        Args:
+            article (dict): Article content and metadata
+            content (str): Article text sent to the LLM
+            ticker (str): Stock ticker symbol
+            company_name (str): Company name
+            
+        Returns:
+            dict: Structured insights
+        """
+        try:
+            structured_insights = self.combined_chain.invoke({
+                "ticker": ticker,
+                "company_name": company_name,
+                "text": content
+            })
+        except TokenBudgetExceeded:
+            # Fails the article without spending more; the pipeline degrades from there
+            raise
+        except Exception as e:
+            print(f"Error in extraction: {str(e)}")
+            structured_insights = {}
+        
+        summary = structured_insights.pop("summary", "")
+        
+        return {
+            "url": article['url'],
+            "structured_insights": structured_insights,
+            "summary": summary
+        }
+    
+    def process(self, filtered_results, max_concurrency=None):
+        """
+        Extract insights from multiple articles concurrently.
+        
+        Args:
+            filtered_results (dict): Results from FilteringSystem
+            max_concurrency (int): Maximum articles extracted at once. Defaults to
+                EXTRACTION_MAX_CONCURRENCY.
+            
+        Returns:
+            dict: Extracted insights for each article
+        """
+        ticker = filtered_results["ticker"]
+        company_name = filtered_results["company_name"]
+        new_articles = [a for a in filtered_results["filtered_articles"] if not a.get("extraction")]
+        
+        results = self._extract_runnable(ticker, company_name).batch(
+            new_articles,
+            config={"max_concurrency": max_concurrency or EXTRACTION_MAX_CONCURRENCY},
+            return_exceptions=True
+        )
+        
+        return self._collect_results(ticker, company_name, filtered_results["filtered_articles"], new_articles, results)
+    
+    async def aprocess(self, filtered_results, max_concurrency=None):
         """
-        Extract insights from multiple articles.
+        Async variant of process, extracting articles concurrently with abatch.
         
         Args:
             filtered_results (dict): Results from FilteringSystem
+            max_concurrency (int): Maximum articles extracted at once. Defaults to
+                EXTRACTION_MAX_CONCURRENCY.
             
         Returns:
             dict: Extracted insights for each article
         """
         ticker = filtered_results["ticker"]
         company_name = filtered_results["company_name"]
-        filtered_articles = filtered_results["filtered_articles"]
+        new_articles = [a for a in filtered_results["filtered_articles"] if not a.get("extraction")]
+        
+        results = await self._extract_runnable(ticker, company_name).abatch(
+            new_articles,
+            config={"max_concurrency": max_concurrency or EXTRACTION_MAX_CONCURRENCY},
+            return_exceptions=True
+        )
         
+        return self._collect_results(ticker, company_name, filtered_results["filtered_articles"], new_articles, results)
+    
+    def _extract_runnable(self, ticker, company_name):
+        """Wrap extract as a runnable so articles can go through batch/abatch."""
+        return RunnableLambda(lambda article: self.extract(article, ticker, company_name))
+    
+    def _collect_results(self, ticker, company_name, filtered_articles, new_articles, results):
+        """
+        Combine reused and new extractions in article order, record failures, and
+        merge in the ticker's recent extractions from the ledger.
+        """
+        new_results = {id(article): insights for article, insights in zip(new_articles, results)}
         extracted_insights = []
+        errors = []
+        reused = 0
         for article in filtered_articles:
-            insights = self.extract(article, ticker, company_name)
+            if article.get("extraction"):
+                extracted_insights.append(article["extraction"])
+                reused += 1
+                continue
+            insights = new_results[id(article)]
+            if isinstance(insights, Exception):
+                error = f"Error extracting {article.get('url')}: {str(insights)}"
+                print(error)
+                errors.append(error)
+                continue
             extracted_insights.append(insights)
+            if self.ledger and article.get("content_hash") and insights["structured_insights"]:
+                self.ledger.record_extraction(ticker, article["url"], article["content_hash"], insights)
+        
+        # Relevant articles from earlier runs that this search did not return
+        merged = []
+        if self.ledger:
+            merged = self.ledger.recent_extractions(
+                ticker,
+                LEDGER_LOOKBACK_DAYS * 24 * 60 * 60,
+                exclude_urls=[article["url"] for article in filtered_articles],
+                limit=LEDGER_MAX_ARTICLES - len(extracted_insights)
+            )
+            extracted_insights.extend(merged)
+        
+        print(f"Extraction for {ticker}: {len(extracted_insights) - reused - len(merged)} new, "
+              f"{reused} reused, {len(merged)} merged from earlier runs")
         
         return {
             "ticker": ticker,
             "company_name": company_name,
-            "extracted_insights": extracted_insights
+            "extracted_insights": extracted_insights,
+            "reused_extractions": reused,
+            "merged_extractions": len(merged),
+            "errors": errors
         }
 
 # # Test the extraction agent
@@ -11,13 +11,28 @@ import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import LLM_MODEL, MAX_FILTERED_ARTICLES, ARTICLE_RECENCY_DAYS
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (LLM_MODEL, MAX_FILTERED_ARTICLES, ARTICLE_RECENCY_DAYS, RELEVANCE_TOKEN_BUDGET, PASSAGE_TOKENS,
+                    ARTICLE_CACHE_TTL_SECONDS, LEDGER_MAX_ARTICLES)
+from utils.passages import select_passages
+from utils.cache import get_cache
+from utils.tracing import get_tracer, set_span_attributes
+from agents.article_ledger import ArticleLedger
+
+# Verdict token at the start of the reply, allowing for quotes or markdown around it
+VERDICT_PATTERN = re.compile(r"^[\s\"'*`#-]*(NOT[_ ]RELEVANT|RELEVANT)\b[\s\"'*`.:,-]*", re.IGNORECASE)
 
 class FilteringSystem:
-    def __init__(self):
+    def __init__(self, ledger=None):
         """
         Initialize the Filtering System with necessary components.
+        
+        Args:
+            ledger (ArticleLedger): Reuse relevance verdicts of articles already seen
+                for the ticker with unchanged content, and record new verdicts
         """
+        self.ledger = ledger
         # Initialize LLM
         self.llm = ChatOpenAI(temperature=0, model=LLM_MODEL)
         
@@ -51,8 +66,38 @@ class FilteringSystem:
         #     llm=self.llm,
         #     prompt=self.relevance_prompt
         # )
+        
+        self.cache = get_cache()
+        self.cache.set_ttl("article", ARTICLE_CACHE_TTL_SECONDS)
     
     def fetch_article_content(self, url):
+        """
+        Fetch and extract text content from a URL, reusing cached content.
+        
+        Args:
+            url (str): Article URL
+            
+        Returns:
+            str: Extracted text content
+        """
+        with get_tracer().start_span("fetch_article", kind="client", attributes={"url": url}) as span:
+            cache_hit, cached = self.cache.get("article", url)
+            span.set_attribute("cache_hit", cache_hit)
+            if cache_hit:
+                text, error = cached["text"], cached["error"]
+            else:
+                text, error = self._fetch_article_content(url)
+                
+                # Cache content and "too old" verdicts; fetch failures are retried next time
+                if text or error == "Article too old":
+                    self.cache.set("article", url, {"text": text, "error": error})
+            
+            span.set_attribute("text_chars", len(text) if text else 0)
+            if error:
+                span.set_error(error)
+            return text, error
+    
+    def _fetch_article_content(self, url):
         """
         Fetch and extract text content from a URL.
         
@@ -67,6 +112,8 @@ class FilteringSystem:
                 'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36'
             }
             response = requests.get(url, headers=headers, timeout=10)
+            set_span_attributes(**{"http.status_code": response.status_code,
+                                   "http.response_bytes": len(response.content)})
             response.raise_for_status()
             
             soup = BeautifulSoup(response.content, 'html.parser')
@@ -118,7 +165,12 @@ class FilteringSystem:
         """
         # Create input dictionary
         input_variables = {
-            "article": article[:1500],  # Limit to first 1500 chars
+            "article": select_passages(  # Most relevant passages within the token budget
+                article, ticker, company_name,
+                token_budget=RELEVANCE_TOKEN_BUDGET,
+                passage_tokens=PASSAGE_TOKENS,
+                model=LLM_MODEL
+            ),
             "ticker": ticker,
             "company_name": company_name
         }
@@ -129,11 +181,26 @@ class FilteringSystem:
         # Extract the content from the AIMessage object
         content = result.content
         
-        # Process the content
-        is_relevant = "RELEVANT" in content
-        explanation = content.replace("RELEVANT", "").replace("NOT_RELEVANT", "").strip()
+        return self.parse_verdict(content)
+    
+    @staticmethod
+    def parse_verdict(content):
+        """
+        Parse a relevance reply into a verdict and its explanation.
         
-        return is_relevant, explanation
+        Args:
+            content (str): Reply starting with RELEVANT or NOT_RELEVANT
+            
+        Returns:
+            bool: True only for an explicit RELEVANT verdict
+            str: Explanation
+        """
+        match = VERDICT_PATTERN.match(content)
+        if not match:
+            # Unparseable replies count as not relevant rather than guessing
+            return False, content.strip()
+        is_relevant = not match.group(1).upper().startswith("NOT")
+        return is_relevant, content[match.end():].strip()
     
     def filter(self, research_results, ticker, company_name):
         """
@@ -149,6 +216,8 @@ class FilteringSystem:
         """
         filtered_results = []
         errors = []
+        new_relevant = 0
+        reused = 0
         
         # Extract URLs from search results
         search_text = research_results["search_results"]
@@ -161,6 +230,16 @@ class FilteringSystem:
             urls = [item.get('url') for item in search_text if 'url' in item]
         
         for url in urls[:20]:  # Limit to first 20 URLs for efficiency
+            # New, reused and changed articles together stay within the ledger cap
+            if len(filtered_results) >= LEDGER_MAX_ARTICLES:
+                break
+            
+            prior = self.ledger.lookup(ticker, url) if self.ledger else None
+            
+            # Enough new articles; keep going only for articles already in the ledger
+            if prior is None and new_relevant >= MAX_FILTERED_ARTICLES:
+                continue
+            
             # Fetch article content
             content, error = self.fetch_article_content(url)
             
@@ -171,23 +250,47 @@ class FilteringSystem:
             if not content:
                 continue
             
-            # Check relevance using first part of the article
+            content_hash = ArticleLedger.content_hash(content)
+            
+            # Unchanged article seen before: reuse its verdict and extraction
+            if prior and prior["content_hash"] == content_hash:
+                self.ledger.mark_seen(ticker, url)
+                reused += 1
+                if prior["relevant"]:
+                    filtered_results.append({
+                        'url': url,
+                        'content': content,
+                        'explanation': prior["explanation"],
+                        'content_hash': content_hash,
+                        'extraction': prior["extraction"]
+                    })
+                continue
+            
+            # Changed articles count as new, so they need a free slot before another relevance call
+            if new_relevant >= MAX_FILTERED_ARTICLES:
+                continue
+            
+            # Check relevance using the most relevant passages of the article
             is_relevant, explanation = self.check_relevance(content, ticker, company_name)
             
+            if self.ledger:
+                self.ledger.record_verdict(ticker, url, content_hash, is_relevant, explanation)
+            
             if is_relevant:
                 filtered_results.append({
                     'url': url,
                     'content': content,
-                    'explanation': explanation
+                    'explanation': explanation,
+                    'content_hash': content_hash
                 })
-            
-            if len(filtered_results) >= MAX_FILTERED_ARTICLES:
-                break
+                new_relevant += 1
         
         return {
             "ticker": ticker,
             "company_name": company_name,
             "filtered_articles": filtered_results,
+            "new_articles": new_relevant,
+            "reused_articles": reused,
             "errors": errors
         }
 
@@ -0,0 +1,283 @@
+# agents/quant_scoring.py
+import re
+import numpy as np
+
+# Analyst rating vocabulary mapped to buy / hold / sell buckets
+BUY_RATINGS = ("strong buy", "buy", "outperform", "overweight", "accumulate", "add", "positive", "market outperform", "sector outperform")
+SELL_RATINGS = ("strong sell", "sell", "underperform", "underweight", "reduce", "negative", "market underperform", "sector underperform")
+HOLD_RATINGS = ("hold", "neutral", "equal weight", "equal-weight", "market perform", "sector perform", "in-line", "in line", "peer perform")
+
+SEVERITY_WEIGHTS = {"high": 3.0, "medium": 2.0, "low": 1.0}
+
+POSITIVE_IMPACT = ("positive", "increase", "boost", "growth", "expand", "improve", "higher", "strong", "gain")
+NEGATIVE_IMPACT = ("negative", "decrease", "decline", "hurt", "pressure", "lower", "weak", "loss", "delay")
+
+# Feature vector layout
+FEATURES = (
+    "metrics_positive", "metrics_negative", "metrics_neutral",
+    "analyst_buy", "analyst_hold", "analyst_sell", "target_upside", "has_upside",
+    "developments_positive", "developments_negative", "developments_total",
+    "sentiment_bullish", "sentiment_bearish", "sentiment_neutral",
+    "risk_weight", "article_count"
+)
+F = {name: i for i, name in enumerate(FEATURES)}
+
+# Component weights for the overall score
+COMPONENT_WEIGHTS = np.array([0.25, 0.20, 0.25, 0.15, 0.15])
+
+# Prefer an amount with a currency sign; otherwise a number standing on its own, not part of a word like "Q3"
+_CURRENCY_PRICE_PATTERN = re.compile(r"[$€£¥]\s*(\d[\d,]*(?:\.\d+)?)")
+_PRICE_PATTERN = re.compile(r"(?<![\w.])(\d[\d,]*(?:\.\d+)?)(?![\w])")
+
+_RATING_TERMS = {term: bucket for bucket, terms in (("buy", BUY_RATINGS), ("hold", HOLD_RATINGS), ("sell", SELL_RATINGS))
+                 for term in terms}
+# Longest terms first so 'strong sell' matches before 'sell' at the same position
+_RATING_PATTERN = re.compile(
+    r"\b(" + "|".join(re.escape(term) for term in sorted(_RATING_TERMS, key=len, reverse=True)) + r")\b"
+)
+_PREVIOUS_RATING_PATTERN = re.compile(r"\bfrom\s+(?:an?\s+)?" + _RATING_PATTERN.pattern)
+
+
+def _parse_price(value):
+    """Return the price in a string such as '$1,250.50' or 'Q3 target $250', or None."""
+    text = str(value or "")
+    match = _CURRENCY_PRICE_PATTERN.search(text) or _PRICE_PATTERN.search(text)
+    if not match:
+        return None
+    try:
+        price = float(match.group(1).replace(",", ""))
+    except ValueError:
+        return None
+    return price if price > 0 else None
+
+
+def _rating_bucket(rating):
+    """Map a free-text analyst rating to 'buy', 'hold', 'sell' or None."""
+    rating = str(rating or "").lower()
+    # Drop the previous rating of an upgrade or downgrade, as in 'Buy (from Sell)' or
+    # 'Downgraded from Buy to Hold', then take the first rating named
+    match = _RATING_PATTERN.search(_PREVIOUS_RATING_PATTERN.sub(" ", rating))
+    return _RATING_TERMS[match.group(1)] if match else None
+
+
+def _impact_direction(text):
+    """Return +1, -1 or 0 for the direction of an expected-impact description."""
+    text = str(text or "").lower()
+    positive = sum(term in text for term in POSITIVE_IMPACT)
+    negative = sum(term in text for term in NEGATIVE_IMPACT)
+    return int(np.sign(positive - negative))
+
+
+class QuantScoringEngine:
+    def __init__(self, buy_threshold=65, sell_threshold=40):
+        """
+        Initialize the rule-based scoring engine.
+
+        Args:
+            buy_threshold (int): Overall score at or above which the recommendation is Buy
+            sell_threshold (int): Overall score at or below which the recommendation is Sell
+        """
+        self.buy_threshold = buy_threshold
+        self.sell_threshold = sell_threshold
+
+    def features(self, consolidated, current_price=None):
+        """
+        Build the feature vector for one ticker from consolidated insights.
+
+        Args:
+            consolidated (dict): Results of InsightConsolidator
+            current_price (float): Latest share price, used for target upside
+
+        Returns:
+            np.ndarray: Feature vector laid out as FEATURES
+        """
+        x = np.zeros(len(FEATURES))
+
+        for metric in consolidated.get("financial_metrics", []):
+            sentiment = str(metric.get("sentiment", "")).lower()
+            key = f"metrics_{sentiment}" if sentiment in ("positive", "negative") else "metrics_neutral"
+            x[F[key]] += metric.get("mentions", 1)
+
+        upsides = []
+        for opinion in consolidated.get("analyst_opinions", []):
+            bucket = _rating_bucket(opinion.get("rating"))
+            if bucket:
+                x[F[f"analyst_{bucket}"]] += opinion.get("mentions", 1)
+
+            # Upside against the current price, or the revision against the previous target
+            target = _parse_price(opinion.get("target_price"))
+            reference = current_price or _parse_price(opinion.get("previous_target"))
+            if target and reference:
+                upsides.append(target / reference - 1.0)
+        if upsides:
+            x[F["target_upside"]] = float(np.clip(np.median(upsides), -0.5, 0.5))
+            x[F["has_upside"]] = 1.0
+
+        for development in consolidated.get("business_developments", []):
+            direction = _impact_direction(development.get("expected_impact"))
+            if direction > 0:
+                x[F["developments_positive"]] += 1
+            elif direction < 0:
+                x[F["developments_negative"]] += 1
+            x[F["developments_total"]] += 1
+
+        counts = (consolidated.get("market_sentiment") or {}).get("counts", {})
+        for label in ("bullish", "bearish", "neutral"):
+            x[F[f"sentiment_{label}"]] = counts.get(label, 0)
+
+        for risk in consolidated.get("risk_factors", []):
+            x[F["risk_weight"]] += SEVERITY_WEIGHTS.get(str(risk.get("severity", "")).lower(), 1.0)
+
+        x[F["article_count"]] = consolidated.get("article_count", 0)
+        return x
+
+    def score_features(self, X):
+        """
+        Score a matrix of feature vectors, one row per ticker.
+
+        Args:
+            X (np.ndarray): Feature matrix of shape (n_tickers, len(FEATURES))
+
+        Returns:
+            dict: Arrays of component scores (1-10) and overall scores (1-100)
+        """
+        X = np.atleast_2d(np.asarray(X, dtype=float))
+        col = lambda name: X[:, F[name]]
+
+        def balance(positive, negative, total):
+            # Net share of positive evidence in [-1, 1], damped when evidence is thin
+            return (positive - negative) / (total + 1.0)
+
+        metrics_total = col("metrics_positive") + col("metrics_negative") + col("metrics_neutral")
+        metrics_balance = balance(col("metrics_positive"), col("metrics_negative"), metrics_total)
+
+        analyst_total = col("analyst_buy") + col("analyst_hold") + col("analyst_sell")
+        analyst_balance = balance(col("analyst_buy"), col("analyst_sell"), analyst_total)
+        upside = np.tanh(4.0 * col("target_upside")) * col("has_upside")
+
+        developments_balance = balance(
+            col("developments_positive"), col("developments_negative"), col("developments_total")
+        )
+
+        sentiment_total = col("sentiment_bullish") + col("sentiment_bearish") + col("sentiment_neutral")
+        sentiment_balance = balance(col("sentiment_bullish"), col("sentiment_bearish"), sentiment_total)
+
+        # No signal maps to 5.5, and ties round down, so missing evidence scores a neutral 5
+        to_ten = lambda signal: np.clip(np.ceil(5.0 + 4.5 * np.clip(signal, -1.0, 1.0)), 1, 10)
+
+        evidence = metrics_total + analyst_total + col("developments_total") + sentiment_total
+        # 10 = lowest risk; each severity point erodes the score with diminishing effect
+        risk = np.rint(10.0 - 9.0 * (1.0 - np.exp(-col("risk_weight") / 6.0)))
+        # No risks reported says nothing when nothing else was found either
+        risk = np.where((evidence == 0) & (col("risk_weight") == 0), 5.0, risk)
+
+        components = np.column_stack([
+            to_ten(metrics_balance),
+            to_ten(0.5 * developments_balance + 0.3 * metrics_balance + 0.2 * upside),
+            to_ten(0.7 * analyst_balance + 0.3 * upside),
+            to_ten(sentiment_balance),
+            np.clip(risk, 1, 10)
+        ])
+
+        overall = np.clip(np.rint(components @ COMPONENT_WEIGHTS * 10.0), 1, 100)
+
+        return {
+            "financial_health_score": components[:, 0].astype(int),
+            "growth_potential_score": components[:, 1].astype(int),
+            "analyst_sentiment_score": components[:, 2].astype(int),
+            "momentum_score": components[:, 3].astype(int),
+            "risk_score": components[:, 4].astype(int),
+            "overall_score": overall.astype(int),
+            "evidence": evidence,
+            "article_count": col("article_count")
+        }
+
+    def _recommendation(self, overall, evidence):
+        """Map an overall score to Buy, Hold or Sell; without evidence always Hold."""
+        if evidence == 0:
+            return "Hold"
+        if overall >= self.buy_threshold:
+            return "Buy"
+        if overall <= self.sell_threshold:
+            return "Sell"
+        return "Hold"
+
+    @staticmethod
+    def _confidence(evidence, article_count):
+        """Grade confidence by the amount of evidence behind the scores."""
+        if article_count >= 3 and evidence >= 8:
+            return "High"
+        if evidence < 3:
+            return "Low"
+        return "Medium"
+
+    @staticmethod
+    def _reasoning(x, scores):
+        """Describe the evidence behind each component score."""
+        return {
+            "financial_health_score": (
+                f"{int(x[F['metrics_positive']])} positive, {int(x[F['metrics_negative']])} negative and "
+                f"{int(x[F['metrics_neutral']])} neutral financial metric mentions"
+            ),
+            "growth_potential_score": (
+                f"{int(x[F['developments_positive']])} positive and {int(x[F['developments_negative']])} negative "
+                f"of {int(x[F['developments_total']])} business developments"
+            ),
+            "analyst_sentiment_score": (
+                f"{int(x[F['analyst_buy']])} buy, {int(x[F['analyst_hold']])} hold and {int(x[F['analyst_sell']])} sell "
+                f"analyst ratings" + (f"; median target upside {x[F['target_upside']]:.1%}" if x[F['has_upside']] else "")
+            ),
+            "momentum_score": (
+                f"Market sentiment {int(x[F['sentiment_bullish']])} bullish, {int(x[F['sentiment_bearish']])} bearish, "
+                f"{int(x[F['sentiment_neutral']])} neutral"
+            ),
+            "risk_score": f"Risk severity weight {x[F['risk_weight']]:.0f} across reported risk factors",
+            "overall_score": f"Weighted average of component scores ({scores:.0f}/100)"
+        }
+
+    def score_batch(self, consolidated_list, current_prices=None):
+        """
+        Score several tickers at once.
+
+        Args:
+            consolidated_list (list): Consolidated insights, one per ticker
+            current_prices (list): Latest share prices aligned with consolidated_list
+
+        Returns:
+            list: StockScore fields for each ticker
+        """
+        current_prices = current_prices or [None] * len(consolidated_list)
+        X = np.array([
+            self.features(consolidated, price)
+            for consolidated, price in zip(consolidated_list, current_prices)
+        ]).reshape(len(consolidated_list), len(FEATURES))
+        scores = self.score_features(X)
+
+        results = []
+        for i in range(len(consolidated_list)):
+            overall = int(scores["overall_score"][i])
+            results.append({
+                "financial_health_score": int(scores["financial_health_score"][i]),
+                "growth_potential_score": int(scores["growth_potential_score"][i]),
+                "analyst_sentiment_score": int(scores["analyst_sentiment_score"][i]),
+                "momentum_score": int(scores["momentum_score"][i]),
+                "risk_score": int(scores["risk_score"][i]),
+                "overall_score": overall,
+                "reasoning": self._reasoning(X[i], overall),
+                "investment_recommendation": self._recommendation(overall, scores["evidence"][i]),
+                "confidence_level": self._confidence(scores["evidence"][i], scores["article_count"][i])
+            })
+        return results
+
+    def score(self, consolidated, current_price=None):
+        """
+        Score a single ticker.
+
+        Args:
+            consolidated (dict): Results of InsightConsolidator
+            current_price (float): Latest share price, used for target upside
+
+        Returns:
+            dict: StockScore fields
+        """
+        return self.score_batch([consolidated], [current_price])[0]
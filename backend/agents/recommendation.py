@@ -1,21 +1,41 @@
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
+import hashlib
+import json
+import math
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import LLM_MODEL
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (LLM_MODEL, RECOMMENDATION_PROMPT_TOKEN_BUDGET, RECOMMENDATION_CACHE_ENABLED,
+                    RECOMMENDATION_PRICE_BUCKET_PCT, RECOMMENDATION_CACHE_TTL_SECONDS)
+from agents.consolidation import InsightConsolidator
+from utils.passages import count_tokens
+from utils.prompt_builder import build_insights_text, build_scores_text, build_price_text
+from utils.cache import get_cache
 
 class RecommendationAgent:
-    def __init__(self):
+    def __init__(self, use_cache=None):
         """
         Initialize the Recommendation Agent with necessary components.
+        
+        Args:
+            use_cache (bool): Reuse the stored recommendation when scores and insights
+                are unchanged. Defaults to RECOMMENDATION_CACHE_ENABLED.
         """
+        self.use_cache = RECOMMENDATION_CACHE_ENABLED if use_cache is None else use_cache
+        self.cache = get_cache()
+        self.cache.set_ttl("recommendation", RECOMMENDATION_CACHE_TTL_SECONDS)
+        
         # Initialize LLM
         self.llm = ChatOpenAI(temperature=0, model=LLM_MODEL)
         
+        self.consolidator = InsightConsolidator()
+        
         # Create recommendation prompt
         recommendation_template = """
         You are a financial advisor specializing in short-term stock investments.
@@ -23,6 +43,9 @@ class RecommendationAgent:
         Based on the following scores and insights for {ticker} ({company_name}), 
         provide a detailed investment recommendation.
         
+        CURRENT PRICE:
+        {current_price}
+        
         SCORES:
         {scores}
         
@@ -48,7 +71,7 @@ class RecommendationAgent:
         """
         
         self.recommendation_prompt = PromptTemplate(
-            input_variables=["ticker", "company_name", "scores", "key_insights"],
+            input_variables=["ticker", "company_name", "current_price", "scores", "key_insights"],
             template=recommendation_template
         )
         
@@ -57,54 +80,207 @@ class RecommendationAgent:
         #     prompt=self.recommendation_prompt
         # )
         self.recommendation_chain = self.recommendation_prompt | self.llm
+        
+        # Changing the prompt invalidates cached recommendations
+        self.template_version = hashlib.sha256(recommendation_template.encode("utf-8")).hexdigest()[:12]
+    
+    def _consolidated(self, scoring_results):
+        """Return the consolidated insights, consolidating on the fly if needed."""
+        consolidated = scoring_results.get("consolidated_insights")
+        if not consolidated:
+            consolidated = self.consolidator.consolidate(scoring_results)["consolidated_insights"]
+        return consolidated
     
-    def recommend(self, scoring_results):
+    @staticmethod
+    def _price_bucket(price, bucket_pct=RECOMMENDATION_PRICE_BUCKET_PCT):
         """
-        Generate investment recommendation for a stock.
+        Bucket a price on a log scale so small moves reuse the same recommendation.
+        
+        Args:
+            price (float): Current price
+            bucket_pct (float): Relative width of a bucket; 0 or less keys on the exact price
+            
+        Returns:
+            The bucket, the price itself when not bucketing, or None without a price
+        """
+        if not price or price <= 0:
+            return None
+        if bucket_pct <= 0:
+            return price
+        return math.floor(math.log(price) / math.log1p(bucket_pct))
+    
+    def _cache_key(self, scoring_results):
+        """
+        Build the recommendation cache key.
+        
+        The key hashes the scores and reasoning, the article summaries, the current
+        price bucket, the model and the prompt version.
         
         Args:
             scoring_results (dict): Results from ScoringMechanism
             
         Returns:
-            dict: Detailed recommendation
+            str: Cache key
+        """
+        score = scoring_results["score"]
+        summaries = [item["summary"] for item in self._consolidated(scoring_results).get("summaries", [])]
+        key_source = json.dumps({
+            "ticker": scoring_results["ticker"],
+            "score": score.model_dump() if hasattr(score, "model_dump") else score,
+            "summaries": summaries,
+            "price_bucket": self._price_bucket(scoring_results.get("current_price")),
+            "model": LLM_MODEL,
+            "template": self.template_version
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(key_source.encode('utf-8')).hexdigest()
+    
+    def _load_cached(self, scoring_results):
+        """Return (cache key, cached recommendation text or None)."""
+        if not self.use_cache:
+            return None, None
+        cache_key = self._cache_key(scoring_results)
+        cache_hit, cached = self.cache.get("recommendation", cache_key)
+        if cache_hit:
+            print(f"Reusing cached recommendation for {scoring_results['ticker']}")
+            return cache_key, cached["recommendation"]
+        return cache_key, None
+    
+    def _prepare_inputs(self, scoring_results):
+        """
+        Build the recommendation prompt inputs from scoring results.
+        
+        Args:
+            scoring_results (dict): Results from ScoringMechanism
+            
+        Returns:
+            tuple: (prompt inputs, prompt stats)
         """
         ticker = scoring_results["ticker"]
         company_name = scoring_results["company_name"]
         score = scoring_results["score"]
-        extracted_insights = scoring_results["extracted_insights"]
-        
-        # Format scores
-        scores_text = f"""
-        Financial Health: {score.financial_health_score}/10 - {score.reasoning.get('financial_health_score', '')}
-        Growth Potential: {score.growth_potential_score}/10 - {score.reasoning.get('growth_potential_score', '')}
-        Analyst Sentiment: {score.analyst_sentiment_score}/10 - {score.reasoning.get('analyst_sentiment_score', '')}
-        Momentum: {score.momentum_score}/10 - {score.reasoning.get('momentum_score', '')}
-        Risk Level: {score.risk_score}/10 - {score.reasoning.get('risk_score', '')}
-        
-        OVERALL SCORE: {score.overall_score}/100
-        RECOMMENDATION: {score.investment_recommendation}
-        CONFIDENCE: {score.confidence_level}
-        """
         
-        # Extract key insights from each article
-        key_insights = ""
-        for i, insight in enumerate(extracted_insights[:3], 1):  # Use up to 3 articles
-            key_insights += f"INSIGHT {i}:\n{insight['summary']}\n\n"
+        # Format scores and insights compactly within the token budget
+        scores_text = build_scores_text(score)
+        price_text = build_price_text(scoring_results.get("price_data"))
         
-        # Generate recommendation
-        result = self.recommendation_chain.invoke({
+        consolidated = self._consolidated(scoring_results)
+        
+        key_insights, prompt_stats = build_insights_text(
+            consolidated,
+            max(0, RECOMMENDATION_PROMPT_TOKEN_BUDGET - count_tokens(scores_text + price_text, LLM_MODEL)),
+            LLM_MODEL
+        )
+        inputs = {
             "ticker": ticker,
             "company_name": company_name,
+            "current_price": price_text,
             "scores": scores_text,
             "key_insights": key_insights
-        })
+        }
+        prompt_stats["prompt_tokens"] = count_tokens(self.recommendation_prompt.format(**inputs), LLM_MODEL)
+        print(f"Recommendation prompt for {ticker}: {prompt_stats['prompt_tokens']} tokens "
+              f"({prompt_stats['dropped_lines']} insight lines dropped)")
         
+        return inputs, prompt_stats
+    
+    def _build_results(self, scoring_results, recommendation, prompt_stats, cache_hit=False):
+        """Assemble the recommendation results returned to the workflow."""
         return {
-            "ticker": ticker,
-            "company_name": company_name,
-            "recommendation": result.content,
-            "score": score
+            "ticker": scoring_results["ticker"],
+            "company_name": scoring_results["company_name"],
+            "recommendation": recommendation,
+            "score": scoring_results["score"],
+            "current_price": scoring_results.get("current_price"),
+            "prompt_stats": prompt_stats,
+            "cache_hit": cache_hit
         }
+    
+    def recommend(self, scoring_results, config=None):
+        """
+        Generate investment recommendation for a stock.
+        
+        Args:
+            scoring_results (dict): Results from ScoringMechanism
+            config (dict): Runnable config for the LLM call, e.g. usage callbacks
+            
+        Returns:
+            dict: Detailed recommendation
+        """
+        cache_key, cached = self._load_cached(scoring_results)
+        if cached is not None:
+            return self._build_results(scoring_results, cached, {}, cache_hit=True)
+        
+        inputs, prompt_stats = self._prepare_inputs(scoring_results)
+        
+        # Generate recommendation
+        result = self.recommendation_chain.invoke(inputs, config=config)
+        
+        if cache_key:
+            self.cache.set("recommendation", cache_key, {"recommendation": result.content})
+        
+        return self._build_results(scoring_results, result.content, prompt_stats)
+    
+    def stream_recommendation(self, scoring_results, config=None):
+        """
+        Generate the recommendation, yielding text as the model produces it.
+        
+        Args:
+            scoring_results (dict): Results from ScoringMechanism
+            config (dict): Runnable config for the LLM call, e.g. usage callbacks
+            
+        Yields:
+            str: Recommendation text chunks, followed by the full results dict
+        """
+        cache_key, cached = self._load_cached(scoring_results)
+        if cached is not None:
+            yield cached
+            yield self._build_results(scoring_results, cached, {}, cache_hit=True)
+            return
+        
+        inputs, prompt_stats = self._prepare_inputs(scoring_results)
+        
+        chunks = []
+        for chunk in self.recommendation_chain.stream(inputs, config=config):
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        
+        recommendation = "".join(chunks)
+        if cache_key:
+            self.cache.set("recommendation", cache_key, {"recommendation": recommendation})
+        
+        yield self._build_results(scoring_results, recommendation, prompt_stats)
+    
+    async def astream_recommendation(self, scoring_results, config=None):
+        """
+        Async variant of stream_recommendation.
+        
+        Args:
+            scoring_results (dict): Results from ScoringMechanism
+            config (dict): Runnable config for the LLM call, e.g. usage callbacks
+            
+        Yields:
+            str: Recommendation text chunks, followed by the full results dict
+        """
+        cache_key, cached = self._load_cached(scoring_results)
+        if cached is not None:
+            yield cached
+            yield self._build_results(scoring_results, cached, {}, cache_hit=True)
+            return
+        
+        inputs, prompt_stats = self._prepare_inputs(scoring_results)
+        
+        chunks = []
+        async for chunk in self.recommendation_chain.astream(inputs, config=config):
+            if chunk.content:
+                chunks.append(chunk.content)
+                yield chunk.content
+        
+        recommendation = "".join(chunks)
+        if cache_key:
+            self.cache.set("recommendation", cache_key, {"recommendation": recommendation})
+        
+        yield self._build_results(scoring_results, recommendation, prompt_stats)
 
 # Test the recommendation agent
 # if __name__ == "__main__":
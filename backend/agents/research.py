@@ -7,7 +7,11 @@ import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import OPENAI_API_KEY, TAVILY_API_KEY, LLM_MODEL, MAX_SEARCH_RESULTS
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import OPENAI_API_KEY, TAVILY_API_KEY, LLM_MODEL, MAX_SEARCH_RESULTS, RESEARCH_CACHE_TTL_SECONDS
+from utils.cache import get_cache
+from utils.tracing import set_span_attributes
 
 class ResearchAgent:
     def __init__(self):
@@ -59,30 +63,47 @@ class ResearchAgent:
             verbose=True,
             handle_parsing_errors=True
         )
+        
+        self.cache = get_cache()
+        self.cache.set_ttl("research", RESEARCH_CACHE_TTL_SECONDS)
     
-    def research(self, ticker, company_name):
+    def research(self, ticker, company_name, use_cache=True):
         """
         Research a stock by ticker and company name.
         
         Args:
             ticker (str): Stock ticker symbol
             company_name (str): Company name
+            use_cache (bool): Reuse recent search results for the same stock. The fresh
+                results replace the cached ones either way.
             
         Returns:
-            dict: Search results with metadata
+            dict: Search results with metadata, and the full agent output as raw_results
+                when the search ran rather than coming from the cache
         """
+        cache_key = f"{ticker.upper()}|{company_name.strip().lower()}|{LLM_MODEL}"
+        if use_cache:
+            cache_hit, cached = self.cache.get("research", cache_key)
+            set_span_attributes(cache_hit=cache_hit)
+            if cache_hit:
+                print(f"Reusing cached research for {ticker}")
+                return cached
+        
         # Run the agent
         result = self.agent_executor.invoke({
             "ticker": ticker,
             "company_name": company_name
         })
         
-        return {
+        research_results = {
             "ticker": ticker,
             "company_name": company_name,
-            "search_results": result["output"],
-            "raw_results": result
+            "search_results": result["output"]
         }
+        # Only the search output is shared; the executor's intermediate steps are not JSON
+        self.cache.set("research", cache_key, research_results)
+        
+        return {**research_results, "raw_results": result}
 
 # # Test the agent
 # if __name__ == "__main__":
@@ -0,0 +1,160 @@
+# agents/result_store.py
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# Summary fields returned by the results list, any of which it can be sorted by
+SUMMARY_COLUMNS = ("ticker", "company_name", "overall_score", "risk_score", "investment_recommendation",
+                   "confidence_level", "current_price", "analyzed_at")
+
+
+def _json_default(value):
+    """Serialize pydantic models (e.g. StockScore) and anything else JSON does not know."""
+    if hasattr(value, "model_dump"):
+        return value.model_dump()
+    return str(value)
+
+
+def _field(obj, key, default=None):
+    """Read a field from a dict or an object with attributes."""
+    if isinstance(obj, dict):
+        return obj.get(key, default)
+    return getattr(obj, key, default)
+
+
+class ResultStore:
+    def __init__(self, path, clock=time.time):
+        """
+        Latest completed analysis of every ticker, for listing large watchlists.
+
+        Each row keeps the summary fields the list is sorted and paginated on,
+        next to the detail (scores, recommendation text and sources) that is only
+        read when one ticker is opened.
+
+        Args:
+            path (str): SQLite database path
+            clock (callable): Time source, for tests
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "ticker TEXT PRIMARY KEY, company_name TEXT, overall_score INTEGER, risk_score INTEGER, "
+            "investment_recommendation TEXT, confidence_level TEXT, current_price REAL, "
+            "analyzed_at REAL NOT NULL, detail TEXT NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_overall_score ON results (overall_score)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS results_analyzed_at ON results (analyzed_at)")
+
+    @staticmethod
+    def detail(result):
+        """
+        Reduce an analysis result to what a detail view shows.
+
+        Research and filtering results (search hits, article text) are left out.
+        Batch results without a recommendation keep their scores.
+
+        Returns:
+            dict: Detail with recommendation_results (score, recommendation text) and
+                extraction_results (source URLs and summaries), or None without a score
+        """
+        recommendation_results = result.get("recommendation_results") or {}
+        scoring_results = result.get("scoring_results") or {}
+        score = recommendation_results.get("score") or scoring_results.get("score")
+        if score is None:
+            return None
+        ticker = result.get("ticker") or scoring_results.get("ticker")
+        insights = (result.get("extraction_results") or {}).get("extracted_insights") \
+            or scoring_results.get("extracted_insights") or []
+        return {
+            "ticker": ticker.upper(),
+            "company_name": result.get("company_name") or recommendation_results.get("company_name")
+            or scoring_results.get("company_name"),
+            "run_id": result.get("run_id"),
+            "trace_id": result.get("trace_id"),
+            "recommendation_results": {
+                "ticker": ticker.upper(),
+                "company_name": recommendation_results.get("company_name") or scoring_results.get("company_name"),
+                "score": score,
+                "recommendation": recommendation_results.get("recommendation"),
+                "current_price": recommendation_results.get("current_price", scoring_results.get("current_price"))
+            },
+            "extraction_results": {
+                "extracted_insights": [{"url": insight.get("url"), "summary": insight.get("summary")}
+                                       for insight in insights if isinstance(insight, dict)]
+            },
+            "usage": result.get("usage")
+        }
+
+    def save(self, result):
+        """
+        Store a completed analysis, replacing the ticker's previous one.
+
+        Args:
+            result (dict): Result of analyze_stock, or one entry of analyze_stocks_batch
+
+        Returns:
+            bool: Whether the result had a score and was stored
+        """
+        detail = self.detail(result)
+        if detail is None:
+            return False
+        score = detail["recommendation_results"]["score"]
+        analyzed_at = self.clock()
+        detail["analyzed_at"] = analyzed_at
+        with self.lock:
+            self.conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (detail["ticker"], detail["company_name"], _field(score, "overall_score"),
+                 _field(score, "risk_score"), _field(score, "investment_recommendation"),
+                 _field(score, "confidence_level"), detail["recommendation_results"]["current_price"],
+                 analyzed_at, json.dumps(detail, default=_json_default))
+            )
+        return True
+
+    def list(self, tickers=None, page=1, page_size=50, sort_by="overall_score", descending=True):
+        """
+        Return one page of result summaries.
+
+        Args:
+            tickers (list): Only these tickers; all stored tickers when None
+            page (int): 1-based page number
+            page_size (int): Summaries per page
+            sort_by (str): One of SUMMARY_COLUMNS; missing values sort last
+            descending (bool): Sort order
+
+        Returns:
+            dict: total matching results, page, page_size and the summary items
+        """
+        if sort_by not in SUMMARY_COLUMNS:
+            raise ValueError(f"Unknown sort column '{sort_by}'; expected one of {', '.join(SUMMARY_COLUMNS)}")
+        where, params = "", []
+        if tickers is not None:
+            # One JSON parameter instead of hundreds of placeholders
+            where = "WHERE ticker IN (SELECT value FROM json_each(?))"
+            params.append(json.dumps([ticker.upper() for ticker in tickers]))
+        order = f"{sort_by} IS NULL, {sort_by} {'DESC' if descending else 'ASC'}, ticker"
+        with self.lock:
+            total = self.conn.execute(f"SELECT COUNT(*) FROM results {where}", params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM results {where} ORDER BY {order} LIMIT ? OFFSET ?",
+                params + [page_size, (page - 1) * page_size]
+            ).fetchall()
+        return {
+            "total": total,
+            "page": page,
+            "page_size": page_size,
+            "items": [dict(zip(SUMMARY_COLUMNS, row)) for row in rows]
+        }
+
+    def get(self, ticker):
+        """Return the stored detail of a ticker, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT detail FROM results WHERE ticker = ?", (ticker.upper(),)).fetchone()
+        return json.loads(row[0]) if row else None
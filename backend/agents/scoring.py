@@ -1,38 +1,84 @@
 # agents/scoring.py
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from langchain_openai import ChatOpenAI
 from langchain.chains import LLMChain
 from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
-from typing import Dict
+from langchain_core.output_parsers import JsonOutputParser
+from typing import Dict, List, Literal
+import json
+import numpy as np
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import LLM_MODEL
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (LLM_MODEL, SCORING_MODE, SCORING_MAX_REPAIR_ATTEMPTS, SCORING_PROMPT_TOKEN_BUDGET,
+                    SCORING_BATCH_PROMPT_TOKEN_BUDGET)
+from utils.passages import count_tokens
+from utils.prompt_builder import build_insights_text, build_price_text
+from utils.prices import get_price_service
+from utils.llm_costs import TokenBudgetExceeded
+from utils.tracing import get_tracer, set_span_attributes
+from agents.consolidation import InsightConsolidator
+from agents.quant_scoring import QuantScoringEngine
+
+SCORING_MODES = ("llm", "hybrid", "fast")
 
 class StockScore(BaseModel):
-    financial_health_score: int = Field(description="Score from 1-10 assessing financial health based on metrics")
-    growth_potential_score: int = Field(description="Score from 1-10 assessing growth potential")
-    analyst_sentiment_score: int = Field(description="Score from 1-10 based on analyst opinions")
-    momentum_score: int = Field(description="Score from 1-10 assessing price and trading momentum")
-    risk_score: int = Field(description="Score from 1-10 assessing risk level (1=highest risk, 10=lowest risk)")
-    overall_score: int = Field(description="Overall investment score from 1-100")
+    """Investment score for a stock over a short-term horizon."""
+    financial_health_score: int = Field(ge=1, le=10, description="Score from 1-10 assessing financial health based on metrics")
+    growth_potential_score: int = Field(ge=1, le=10, description="Score from 1-10 assessing growth potential")
+    analyst_sentiment_score: int = Field(ge=1, le=10, description="Score from 1-10 based on analyst opinions")
+    momentum_score: int = Field(ge=1, le=10, description="Score from 1-10 assessing price and trading momentum")
+    risk_score: int = Field(ge=1, le=10, description="Score from 1-10 assessing risk level (1=highest risk, 10=lowest risk)")
+    overall_score: int = Field(ge=1, le=100, description="Overall investment score from 1-100")
     reasoning: Dict[str, str] = Field(description="Brief reasoning for each score component")
-    investment_recommendation: str = Field(description="Investment recommendation: Buy, Hold, or Sell")
-    confidence_level: str = Field(description="Confidence level: High, Medium, or Low")
+    investment_recommendation: Literal["Buy", "Hold", "Sell"] = Field(description="Investment recommendation: Buy, Hold, or Sell")
+    confidence_level: Literal["High", "Medium", "Low"] = Field(description="Confidence level: High, Medium, or Low")
+    
+    @field_validator("investment_recommendation", "confidence_level", mode="before")
+    @classmethod
+    def normalize_label(cls, value):
+        """Accept labels in any case, e.g. 'buy' or 'HIGH'."""
+        return value.strip().capitalize() if isinstance(value, str) else value
+
+class TickerScore(StockScore):
+    """StockScore for one ticker of a batch."""
+    ticker: str = Field(description="Ticker symbol this score belongs to")
+
+class BatchStockScores(BaseModel):
+    """Investment scores for several stocks, scored against each other."""
+    scores: List[TickerScore] = Field(description="One score per ticker")
 
 class ScoringMechanism:
-    def __init__(self):
+    def __init__(self, mode=None, price_service=None):
         """
         Initialize the Scoring Mechanism with necessary components.
+        
+        Args:
+            mode (str): "llm" to score with the LLM, "hybrid" for rule-based scores with
+                LLM reasoning, or "fast" for rule-based scores only. Defaults to SCORING_MODE.
+            price_service (PriceService): Quote source. Defaults to the shared price service.
         """
+        self.mode = mode or SCORING_MODE
+        if self.mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {self.mode}")
+        
+        self.price_service = price_service or get_price_service()
+        
+        # Rule-based engine for the hybrid and fast modes
+        self.quant_engine = QuantScoringEngine()
+        self.consolidator = InsightConsolidator()
+        
         # Initialize LLM
         self.llm = ChatOpenAI(temperature=0, model=LLM_MODEL)
         
-        # Create parser
-        self.parser = PydanticOutputParser(pydantic_object=StockScore)
+        # Bind StockScore as a function so the model returns structured output
+        self.structured_llm = self.llm.with_structured_output(
+            StockScore, method="function_calling", include_raw=True
+        )
         
         # Create scoring prompt
         scoring_template = """
@@ -42,34 +88,228 @@ class ScoringMechanism:
         for a short-term horizon (last 3 months).
         
         Company: {company_name} ({ticker})
+        {price}
         
         INSIGHTS:
         {insights}
         
-        Analyze these insights and provide an investment score using the following format:
-        
-        {format_instructions}
+        Analyze these insights and score the stock with the StockScore function. Component scores
+        are integers from 1-10 (risk_score: 1=highest risk, 10=lowest risk), overall_score is an
+        integer from 1-100, investment_recommendation is Buy, Hold or Sell, and confidence_level
+        is High, Medium or Low.
         """
         
         self.scoring_prompt = PromptTemplate(
-            input_variables=["ticker", "company_name", "insights"],
-            partial_variables={"format_instructions": self.parser.get_format_instructions()},
+            input_variables=["ticker", "company_name", "price", "insights"],
             template=scoring_template
         )
         
+        # Appended to the prompt when a reply fails validation
+        self.repair_template = """
+        
+        Your previous reply could not be accepted:
+        {previous}
+        
+        Validation error:
+        {error}
+        
+        Call the StockScore function again with every field present and within the allowed values.
+        """
+        
         # self.scoring_chain = LLMChain(
         #     llm=self.llm,
         #     prompt=self.scoring_prompt,
         #     output_parser=self.parser
         # )
-        self.scoring_chain = self.scoring_prompt | self.llm | self.parser
+        self.scoring_chain = self.structured_llm
+        
+        # Create batch scoring prompt (all tickers in one call, on a common scale)
+        batch_template = """
+        You are a financial analyst specializing in short-term stock evaluation.
+        
+        Score each of the following stocks for a short-term horizon (last 3 months). Score them
+        against each other on a common scale, so a higher overall_score means a better short-term
+        investment than the other stocks listed.
+        
+        {insights}
+        
+        Call the BatchStockScores function with exactly one entry per ticker. Component scores
+        are integers from 1-10 (risk_score: 1=highest risk, 10=lowest risk), overall_score is an
+        integer from 1-100, investment_recommendation is Buy, Hold or Sell, and confidence_level
+        is High, Medium or Low.
+        """
+        
+        self.batch_prompt = PromptTemplate(input_variables=["insights"], template=batch_template)
+        self.batch_scoring_chain = self.llm.with_structured_output(
+            BatchStockScores, method="function_calling", include_raw=True
+        )
+        
+        # Create reasoning prompt for rule-based scores
+        reasoning_template = """
+        You are a financial analyst specializing in short-term stock evaluation.
+        
+        A rule-based model scored {ticker} ({company_name}) from the insights below.
+        
+        SCORES:
+        {scores}
+        
+        INSIGHTS:
+        {insights}
+        
+        Explain each score in one or two sentences using ONLY these insights. Respond with a JSON
+        object whose keys are financial_health_score, growth_potential_score, analyst_sentiment_score,
+        momentum_score, risk_score and overall_score, and whose values are the explanations.
+        """
+        
+        self.reasoning_chain = PromptTemplate.from_template(reasoning_template) | self.llm | JsonOutputParser()
+    
+    def _llm_score(self, ticker, company_name, price_text, insights_text):
+        """
+        Score with the LLM, repairing invalid replies a bounded number of times.
+        
+        Args:
+            ticker (str): Stock ticker symbol
+            company_name (str): Company name
+            price_text (str): Current price formatted for the prompt
+            insights_text (str): Insights formatted for the prompt
+            
+        Returns:
+            StockScore: Score for the stock, or None if every attempt failed validation
+        """
+        base_prompt = self.scoring_prompt.format(
+            ticker=ticker,
+            company_name=company_name,
+            price=price_text,
+            insights=insights_text
+        )
+        return self._invoke_with_repair(self.scoring_chain, base_prompt)
+    
+    def _invoke_with_repair(self, chain, base_prompt):
+        """
+        Invoke a structured-output chain, re-prompting with the validation error on failure.
+        
+        Args:
+            chain (Runnable): Structured-output chain returning raw/parsed/parsing_error
+            base_prompt (str): Formatted prompt
+            
+        Returns:
+            BaseModel: Parsed output, or None if every attempt failed
+            
+        Raises:
+            TokenBudgetExceeded: If the request's token budget is spent; a repair
+                attempt would only fail the same way
+        """
+        prompt = base_prompt
+        
+        for attempt in range(SCORING_MAX_REPAIR_ATTEMPTS + 1):
+            try:
+                output = chain.invoke(prompt)
+            except TokenBudgetExceeded:
+                raise
+            except Exception as e:
+                print(f"Error in scoring attempt {attempt + 1}: {str(e)}")
+                continue
+            
+            if output["parsed"] is not None and output["parsing_error"] is None:
+                return output["parsed"]
+            
+            error = output["parsing_error"] or "No function call in the reply"
+            print(f"Invalid score in attempt {attempt + 1}: {str(error)}")
+            prompt = base_prompt + self.repair_template.format(
+                previous=self._raw_reply(output["raw"]),
+                error=str(error)
+            )
+        
+        return None
+    
+    @staticmethod
+    def _raw_reply(message):
+        """Return the function arguments (or text) of a model reply for the repair prompt."""
+        tool_calls = getattr(message, "tool_calls", None)
+        if tool_calls:
+            return json.dumps(tool_calls[0].get("args", {}))
+        function_call = getattr(message, "additional_kwargs", {}).get("function_call")
+        if function_call:
+            return function_call.get("arguments", "")
+        return getattr(message, "content", "") or ""
+    
+    def _quant_score(self, extraction_results, consolidated, insights_text, current_price=None, mode=None):
+        """
+        Score with the rule-based engine, adding LLM reasoning in hybrid mode.
+        
+        Args:
+            extraction_results (dict): Results from ExtractionAgent or InsightConsolidator
+            consolidated (dict): Consolidated insights
+            insights_text (str): Insights formatted for the prompt
+            current_price (float): Latest share price, used for analyst target upside
+            mode (str): "hybrid" adds LLM reasoning; defaults to the mechanism's mode
+            
+        Returns:
+            StockScore: Score for the stock
+        """
+        fields = self.quant_engine.score(consolidated, current_price)
+        
+        if (mode or self.mode) == "hybrid":
+            try:
+                reasoning = self.reasoning_chain.invoke(
+                    self._reasoning_inputs(extraction_results, fields, insights_text)
+                )
+                self._apply_reasoning(fields, reasoning)
+            except Exception as e:
+                print(f"Error generating score reasoning: {str(e)}")
+        
+        return StockScore(**fields)
+    
+    @staticmethod
+    def _reasoning_inputs(results, fields, insights_text):
+        """Build the reasoning prompt inputs for rule-based score fields."""
+        return {
+            "ticker": results["ticker"],
+            "company_name": results["company_name"],
+            "scores": "\n".join(f"{name}: {value}" for name, value in fields.items() if name.endswith("_score")),
+            "insights": insights_text
+        }
     
-    def score(self, extraction_results):
+    @staticmethod
+    def _apply_reasoning(fields, reasoning):
+        """Replace the rule-based reasoning of each score component with the LLM's explanation."""
+        fields["reasoning"].update({k: str(v) for k, v in reasoning.items() if k in fields["reasoning"]})
+    
+    def _price_data(self, results_list):
+        """
+        Look up quotes for every ticker in one price service call.
+        
+        Args:
+            results_list (list): Results dicts; a "price_data" entry already present is reused
+            
+        Returns:
+            list: Quote dicts aligned with results_list
+        """
+        missing = [item["ticker"] for item in results_list if not item.get("price_data")]
+        quotes = {}
+        if missing:
+            with get_tracer().start_span("price_quotes", kind="client", attributes={"tickers": ",".join(missing)}):
+                try:
+                    quotes = self.price_service.get_quotes(missing)
+                except Exception as e:
+                    set_span_attributes(**{"error.message": str(e)})
+                    print(f"Error fetching prices: {str(e)}")
+        return [item.get("price_data") or quotes.get(item["ticker"].upper(), {}) for item in results_list]
+    
+    @staticmethod
+    def _current_price(price_data):
+        """Return the quoted price, or None if the quote failed."""
+        if not price_data or price_data.get("error"):
+            return None
+        return price_data.get("price") or None
+    
+    def score(self, extraction_results, mode=None):
         """
         Score a stock based on extracted insights.
         
         Args:
-            extraction_results (dict): Results from ExtractionAgent
+            extraction_results (dict): Results from ExtractionAgent or InsightConsolidator
+            mode (str): Scoring mode for this call; defaults to the mechanism's mode
             
         Returns:
             dict: Scored results including StockScore
@@ -78,55 +318,189 @@ class ScoringMechanism:
         company_name = extraction_results["company_name"]
         extracted_insights = extraction_results["extracted_insights"]
         
-        # Format insights for the prompt
-        insights_text = ""
+        consolidated = extraction_results.get("consolidated_insights")
+        if not consolidated:
+            consolidated = self.consolidator.consolidate(extraction_results)["consolidated_insights"]
         
-        for i, article_insights in enumerate(extracted_insights, 1):
-            insights_text += f"ARTICLE {i}:\n"
-            insights_text += f"URL: {article_insights['url']}\n"
-            insights_text += f"SUMMARY: {article_insights['summary']}\n"
-            
-            structured = article_insights['structured_insights']
-            if structured:
-                if 'financial_metrics' in structured and structured['financial_metrics']:
-                    insights_text += "FINANCIAL METRICS:\n"
-                    for metric in structured['financial_metrics']:
-                        insights_text += f"- {metric.get('metric_name', 'N/A')}: {metric.get('value', 'N/A')} ({metric.get('sentiment', 'N/A')})\n"
-                
-                if 'analyst_opinions' in structured and structured['analyst_opinions']:
-                    insights_text += "ANALYST OPINIONS:\n"
-                    for opinion in structured['analyst_opinions']:
-                        insights_text += f"- {opinion.get('analyst_or_firm', 'N/A')}: Rating: {opinion.get('rating', 'N/A')}, Target: {opinion.get('target_price', 'N/A')}\n"
-                
-                if 'business_developments' in structured and structured['business_developments']:
-                    insights_text += "BUSINESS DEVELOPMENTS:\n"
-                    for dev in structured['business_developments']:
-                        insights_text += f"- {dev.get('event_type', 'N/A')}: {dev.get('description', 'N/A')}\n"
-                
-                if 'market_sentiment' in structured and structured['market_sentiment']:
-                    sentiment = structured['market_sentiment']
-                    insights_text += f"MARKET SENTIMENT: {sentiment.get('overall_sentiment', 'N/A')}\n"
-                
-                if 'risk_factors' in structured and structured['risk_factors']:
-                    insights_text += "RISK FACTORS:\n"
-                    for risk in structured['risk_factors']:
-                        insights_text += f"- {risk.get('risk_type', 'N/A')} ({risk.get('severity', 'N/A')}): {risk.get('description', 'N/A')}\n"
-            
-            insights_text += "\n---\n\n"
+        price_data = self._price_data([extraction_results])[0]
+        current_price = self._current_price(price_data)
+        price_text = build_price_text(price_data)
+        
+        # Format insights for the prompt within the token budget
+        insights_text, prompt_stats = build_insights_text(consolidated, SCORING_PROMPT_TOKEN_BUDGET, LLM_MODEL)
+        prompt_stats["prompt_tokens"] = count_tokens(
+            self.scoring_prompt.format(ticker=ticker, company_name=company_name, price=price_text, insights=insights_text),
+            LLM_MODEL
+        )
+        print(f"Scoring prompt for {ticker}: {prompt_stats['prompt_tokens']} tokens "
+              f"({prompt_stats['dropped_lines']} insight lines dropped)")
         
         # Get score
-        result = self.scoring_chain.invoke({
-            "ticker": ticker,
-            "company_name": company_name,
-            "insights": insights_text
-        })
+        mode = mode or self.mode
+        scoring_method = mode
+        result = None
+        if mode == "llm":
+            try:
+                result = self._llm_score(ticker, company_name, price_text, insights_text)
+            except TokenBudgetExceeded as e:
+                print(f"{str(e)}; scoring {ticker} with rule-based scores")
+            if result is None:
+                # Keep the pipeline going with the rule-based score instead of failing the run
+                print(f"LLM scoring failed for {ticker}, falling back to rule-based scores")
+                scoring_method = "fast_fallback"
+        if result is None:
+            result = self._quant_score(extraction_results, consolidated, insights_text, current_price, mode)
         
         return {
             "ticker": ticker,
             "company_name": company_name,
             "score": result,
-            "extracted_insights": extracted_insights
+            "scoring_method": scoring_method,
+            "current_price": current_price,
+            "price_data": price_data,
+            "extracted_insights": extracted_insights,
+            "consolidated_insights": consolidated,
+            "prompt_stats": prompt_stats
         }
+    
+    @staticmethod
+    def _calibrate(overall_scores):
+        """
+        Rank scores across a batch and calibrate them to the batch distribution.
+        
+        Args:
+            overall_scores (np.ndarray): Overall scores (1-100), one per ticker
+            
+        Returns:
+            tuple: (ranks starting at 1, percentiles 0-100, calibrated scores 1-100)
+        """
+        overall_scores = np.asarray(overall_scores, dtype=float)
+        n = len(overall_scores)
+        
+        # Stable sort so ties keep input order
+        order = np.argsort(-overall_scores, kind="stable")
+        ranks = np.empty(n, dtype=int)
+        ranks[order] = np.arange(1, n + 1)
+        percentiles = (n - ranks) / (n - 1) * 100.0 if n > 1 else np.full(n, 100.0)
+        
+        std = overall_scores.std()
+        z = (overall_scores - overall_scores.mean()) / std if std > 0 else np.zeros(n)
+        calibrated = np.clip(np.rint(50.0 + 20.0 * z), 1, 100).astype(int)
+        
+        return ranks, np.round(percentiles, 1), calibrated
+    
+    def _llm_score_batch(self, items, consolidated_list, price_list):
+        """
+        Score all tickers with a single LLM call.
+        
+        Args:
+            items (list): Consolidation results, one per ticker
+            consolidated_list (list): Consolidated insights aligned with items
+            price_list (list): Quotes aligned with items
+            
+        Returns:
+            dict: StockScore by ticker for the tickers the LLM scored validly
+        """
+        per_ticker_budget = max(150, SCORING_BATCH_PROMPT_TOKEN_BUDGET // len(items))
+        sections = []
+        for item, consolidated, price_data in zip(items, consolidated_list, price_list):
+            insights_text, _ = build_insights_text(consolidated, per_ticker_budget, LLM_MODEL)
+            sections.append(
+                f"=== {item['ticker']} ({item['company_name']}) ===\n{build_price_text(price_data)}\n{insights_text}"
+            )
+        
+        base_prompt = self.batch_prompt.format(insights="\n".join(sections))
+        print(f"Batch scoring prompt for {len(items)} tickers: {count_tokens(base_prompt, LLM_MODEL)} tokens")
+        
+        parsed = self._invoke_with_repair(self.batch_scoring_chain, base_prompt)
+        if parsed is None:
+            return {}
+        
+        return {
+            entry.ticker.upper(): StockScore(**entry.model_dump(exclude={"ticker"}))
+            for entry in parsed.scores
+        }
+    
+    def score_batch(self, consolidation_results, mode=None):
+        """
+        Score several stocks in one pass and rank them against each other.
+        
+        Args:
+            consolidation_results (list): Results from InsightConsolidator, one per ticker
+            mode (str): "llm" for one LLM call across all tickers, "hybrid" for rule-based
+                scores with LLM reasoning per ticker, or "fast" for rule-based scores only.
+                Defaults to the mechanism's mode.
+            
+        Returns:
+            list: Scored results ordered by rank, each with rank, percentile and calibrated_score
+        """
+        if not consolidation_results:
+            return []
+        mode = mode or self.mode
+        if mode not in SCORING_MODES:
+            raise ValueError(f"Unknown scoring mode: {mode}")
+        
+        consolidated_list = [
+            item.get("consolidated_insights") or self.consolidator.consolidate(item)["consolidated_insights"]
+            for item in consolidation_results
+        ]
+        
+        # One quote lookup for all tickers
+        price_list = self._price_data(consolidation_results)
+        current_prices = [self._current_price(price_data) for price_data in price_list]
+        
+        # Rule-based scores for every ticker: the result in fast mode, the fallback otherwise
+        quant_fields = self.quant_engine.score_batch(consolidated_list, current_prices)
+        
+        llm_scores = {}
+        if mode == "llm":
+            try:
+                llm_scores = self._llm_score_batch(consolidation_results, consolidated_list, price_list)
+            except TokenBudgetExceeded as e:
+                print(f"{str(e)}; scoring the batch with rule-based scores")
+        elif mode == "hybrid":
+            # Reasoning for every ticker concurrently; a failed reply keeps the rule-based reasoning
+            replies = self.reasoning_chain.batch([
+                self._reasoning_inputs(
+                    item, fields, build_insights_text(consolidated, SCORING_PROMPT_TOKEN_BUDGET, LLM_MODEL)[0]
+                )
+                for item, fields, consolidated in zip(consolidation_results, quant_fields, consolidated_list)
+            ], return_exceptions=True)
+            for item, fields, reasoning in zip(consolidation_results, quant_fields, replies):
+                if isinstance(reasoning, Exception):
+                    print(f"Error generating score reasoning for {item['ticker']}: {str(reasoning)}")
+                else:
+                    self._apply_reasoning(fields, reasoning)
+        
+        scores, methods = [], []
+        for item, fields in zip(consolidation_results, quant_fields):
+            score = llm_scores.get(item["ticker"].upper())
+            if score is not None:
+                scores.append(score)
+                methods.append("llm_batch")
+            else:
+                scores.append(StockScore(**fields))
+                methods.append("fast_fallback" if mode == "llm" else mode)
+        
+        ranks, percentiles, calibrated = self._calibrate([score.overall_score for score in scores])
+        
+        results = []
+        for i, item in enumerate(consolidation_results):
+            results.append({
+                "ticker": item["ticker"],
+                "company_name": item["company_name"],
+                "score": scores[i],
+                "scoring_method": methods[i],
+                "current_price": current_prices[i],
+                "price_data": price_list[i],
+                "rank": int(ranks[i]),
+                "percentile": float(percentiles[i]),
+                "calibrated_score": int(calibrated[i]),
+                "extracted_insights": item["extracted_insights"],
+                "consolidated_insights": consolidated_list[i]
+            })
+        
+        return sorted(results, key=lambda x: x["rank"])
 
 # # Test the scoring mechanism
 # if __name__ == "__main__":
@@ -1,36 +1,253 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Query
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import FileResponse, StreamingResponse
 from pydantic import BaseModel
-from graph.workflow import analyze_stock
+from typing import List, Optional
+from graph.workflow import analyze_stock, resume_analysis, stream_stock_analysis, analyze_stocks_batch, result_store
+from graph.precompute import PrecomputeScheduler, analysis_cache_key
+from agents.allocation import PortfolioAllocator
+from config import (ANALYSIS_CACHE_TTL_SECONDS, PRECOMPUTE_ENABLED, PROFILING_ENABLED, PROFILE_ADMIN_TOKEN, PROFILE_DIR,
+                    ALLOCATION_MAX_WEIGHT, ALLOCATION_CORRELATION, ALLOCATION_VOLATILITY_RANGE,
+                    ALLOCATION_MAX_EXPECTED_RETURN, ALLOCATION_RISK_AVERSION, RESULTS_MAX_PAGE_SIZE)
+from utils.cache import get_cache
+from utils.metrics_tracker import get_metrics_tracker
+from utils.tracing import get_tracer
+from utils.profiling import list_profiles, profile_path
+from contextlib import asynccontextmanager
 import uvicorn
+import json
 import os
 import logging
+import secrets
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-app = FastAPI(title="Stock Analyzer Agent")
+get_cache().set_ttl("analysis", ANALYSIS_CACHE_TTL_SECONDS)
+
+precompute_scheduler = PrecomputeScheduler()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    if PRECOMPUTE_ENABLED:
+        precompute_scheduler.start()
+    yield
+    precompute_scheduler.stop()
+
+app = FastAPI(title="Stock Analyzer Agent", lifespan=lifespan)
 
 class StockRequest(BaseModel):
     ticker: str
     company_name: str
 
+class BatchRequest(BaseModel):
+    stocks: List[StockRequest]
+    mode: Optional[str] = None
+    include_recommendations: bool = False
+
+class ScoredStock(BaseModel):
+    ticker: str
+    overall_score: float
+    risk_score: float
+    investment_recommendation: str
+
+class AllocationRequest(BaseModel):
+    stocks: List[ScoredStock]
+    method: str = "score"
+    max_weight: float = ALLOCATION_MAX_WEIGHT
+    include_hold: bool = False
+
+def require_admin(token: Optional[str]):
+    """Reject requests without the admin token; profiling is unavailable unless enabled and a token is configured."""
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=403, detail="Profiling is disabled")
+    if not PROFILE_ADMIN_TOKEN or not token or not secrets.compare_digest(token, PROFILE_ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Admin token required")
+
 @app.post("/analyze")
-async def analyze(request: StockRequest):
-    """Endpoint to analyze a stock based on ticker and company name"""
+def analyze(request: StockRequest, profile: bool = False, x_profile: Optional[str] = Header(None),
+            x_admin_token: Optional[str] = Header(None)):
+    """
+    Endpoint to analyze a stock based on ticker and company name.
+    
+    A plain def, like /analyze/batch: the analysis blocks, so FastAPI runs it in
+    its thread pool and concurrent requests don't wait for each other.
+    
+    The response carries the trace_id of the request; render its timeline with
+    python -m utils.trace_viewer <trace_id>.
+    
+    With ?profile=true or an "X-Profile: 1" header (and the admin token), the analysis
+    bypasses the result cache and is CPU and allocation profiled per node; the report
+    is served by /admin/profiles/{profile_id}.
+    """
     logger.info(f"Received analysis request for {request.ticker} ({request.company_name})")
+    profile = profile or (x_profile or "").lower() in ("1", "true", "yes")
+    if profile:
+        require_admin(x_admin_token)
+    with get_tracer().start_span("POST /analyze", kind="server", attributes={"ticker": request.ticker}) as span:
+        cache_key = analysis_cache_key(request.ticker, request.company_name)
+        cache_hit, cached = (False, None) if profile else get_cache().get("analysis", cache_key)
+        span.set_attribute("cache_hit", cache_hit)
+        precompute_scheduler.record_request(request.ticker, request.company_name, cache_hit)
+        if cache_hit:
+            logger.info(f"Serving cached analysis for {request.ticker}")
+            return {**cached, "trace_id": span.trace_id}
+        try:
+            result = jsonable_encoder(analyze_stock(request.ticker, request.company_name, profile=profile))
+            # Share completed analyses across replicas; failed runs are retried
+            if not result.get("error"):
+                get_cache().set("analysis", cache_key, result)
+            return result
+        except Exception as e:
+            logger.error(f"Error analyzing stock {request.ticker}: {str(e)}")
+            raise HTTPException(status_code=500, detail=str(e))
+
+@app.post("/analyze/resume/{run_id}")
+def analyze_resume(run_id: str):
+    """Resume a failed analysis run from its last completed node"""
+    logger.info(f"Received resume request for run {run_id}")
     try:
-        result = analyze_stock(request.ticker, request.company_name)
-        return result
+        result = jsonable_encoder(resume_analysis(run_id))
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e))
     except Exception as e:
-        logger.error(f"Error analyzing stock {request.ticker}: {str(e)}")
+        logger.error(f"Error resuming run {run_id}: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
+    if not result.get("error"):
+        get_cache().set("analysis", analysis_cache_key(result["ticker"], result["company_name"]), result)
+    return result
+
+@app.post("/analyze/stream")
+async def analyze_stream(request: StockRequest):
+    """
+    Analyze a stock and stream the recommendation as newline-delimited JSON events.
+    
+    The "analysis" event carries the results up to scoring, followed by "token" events
+    with recommendation text and a final "recommendation" event (or an "error" event),
+    then a "usage" event with the tokens and estimated cost of the request.
+    """
+    logger.info(f"Received streaming analysis request for {request.ticker} ({request.company_name})")
+    
+    def event_lines():
+        for event in stream_stock_analysis(request.ticker, request.company_name):
+            yield json.dumps(jsonable_encoder(event)) + "\n"
+    
+    return StreamingResponse(event_lines(), media_type="application/x-ndjson")
+
+@app.post("/analyze/batch")
+def analyze_batch(request: BatchRequest):
+    """Analyze several stocks and rank them with a single batch scoring pass"""
+    tickers = [stock.ticker for stock in request.stocks]
+    logger.info(f"Received batch analysis request for {', '.join(tickers)}")
+    try:
+        return analyze_stocks_batch(
+            [stock.model_dump() for stock in request.stocks],
+            mode=request.mode,
+            include_recommendations=request.include_recommendations
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error in batch analysis: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/results")
+def list_results(tickers: Optional[str] = None, page: int = Query(1, ge=1),
+                 page_size: int = Query(50, ge=1, le=RESULTS_MAX_PAGE_SIZE),
+                 sort_by: str = "overall_score", descending: bool = True):
+    """
+    Slim summaries of the latest stored analyses, one page at a time.
+    
+    tickers is a comma-separated watchlist; all stored tickers are listed without it.
+    Details, sources and recommendation text are served by /results/{ticker}.
+    """
+    if result_store is None:
+        raise HTTPException(status_code=404, detail="The result store is disabled")
+    watchlist = [ticker.strip() for ticker in tickers.split(",") if ticker.strip()] if tickers is not None else None
+    try:
+        return result_store.list(watchlist, page, page_size, sort_by, descending)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.get("/results/{ticker}")
+def result_detail(ticker: str):
+    """Scores, recommendation text and sources of a ticker's latest stored analysis"""
+    detail = result_store.get(ticker) if result_store is not None else None
+    if detail is None:
+        raise HTTPException(status_code=404, detail=f"No stored analysis for {ticker}")
+    return detail
+
+@app.post("/allocate")
+def allocate(request: AllocationRequest):
+    """
+    Allocate a portfolio across scored stocks.
+    
+    Methods are "score", "inverse_risk", "risk_parity" and "mean_variance"; every
+    position is capped at max_weight and the remainder is reported as cash. The first
+    three invest fully across the eligible stocks. mean_variance invests fully across
+    those with a positive expected return (overall score above 50) and holds cash
+    instead of stocks expected to lose money.
+    """
+    try:
+        allocator = PortfolioAllocator(
+            max_weight=request.max_weight,
+            correlation=ALLOCATION_CORRELATION,
+            volatility_range=ALLOCATION_VOLATILITY_RANGE,
+            max_expected_return=ALLOCATION_MAX_EXPECTED_RETURN,
+            risk_aversion=ALLOCATION_RISK_AVERSION
+        )
+        return allocator.allocate([stock.model_dump() for stock in request.stocks], request.method,
+                                  request.include_hold)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy"}
 
+@app.get("/metrics")
+async def metrics(detailed: bool = False):
+    """Request latency percentiles, per-stage timings and top tickers, domains and errors"""
+    tracker = get_metrics_tracker()
+    return tracker.get_detailed_report() if detailed else tracker.get_metrics_summary()
+
+@app.get("/precompute/metrics")
+async def precompute_metrics():
+    """Demand, result cache hit rate and spend of the precompute scheduler"""
+    return precompute_scheduler.metrics()
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Cache hit, miss and eviction counters"""
+    return get_cache().get_stats()
+
+@app.get("/admin/profiles")
+async def profiles(x_admin_token: Optional[str] = Header(None)):
+    """Stored request profiles, newest first"""
+    require_admin(x_admin_token)
+    return list_profiles(PROFILE_DIR)
+
+@app.get("/admin/profiles/{profile_id}")
+async def profile_report(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """Top functions and allocation sites per node of a profiled request"""
+    require_admin(x_admin_token)
+    path = profile_path(PROFILE_DIR, profile_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+@app.get("/admin/profiles/{profile_id}/download")
+async def download_profile(profile_id: str, x_admin_token: Optional[str] = Header(None)):
+    """The merged CPU profile of a request in pstats format (snakeviz, python -m pstats)"""
+    require_admin(x_admin_token)
+    path = profile_path(PROFILE_DIR, profile_id, "prof")
+    if path is None:
+        raise HTTPException(status_code=404, detail=f"Unknown profile {profile_id}")
+    return FileResponse(path, media_type="application/octet-stream", filename=f"{profile_id}.prof")
+
 if __name__ == "__main__":
     port = int(os.getenv("PORT", "8080"))
     uvicorn.run(app, host="0.0.0.0", port=port)
\ No newline at end of file
@@ -18,6 +18,88 @@ MAX_SEARCH_RESULTS = 5
 MAX_FILTERED_ARTICLES = 3
 ARTICLE_RECENCY_DAYS = 90  # Only consider articles from the last 30 days
 MAX_RESEARCH_ATTEMPTS = 3  # Maximum number of research retries
+RESEARCH_CACHE_TTL_SECONDS = 60 * 60  # Reuse search results for the same stock within this window
+ARTICLE_CACHE_TTL_SECONDS = 24 * 60 * 60  # Reuse fetched article content across requests and replicas
+
+# Extraction settings
+EXTRACTION_SINGLE_CALL = True  # Return the summary from the extraction call; False uses a separate summary call
+EXTRACTION_MAX_CONCURRENCY = 4  # Maximum articles extracted in parallel
+EXTRACTION_TOKEN_BUDGET = 1000  # Tokens of article passages sent to extraction
+RELEVANCE_TOKEN_BUDGET = 400  # Tokens of article passages sent to the relevance check
+PASSAGE_TOKENS = 150  # Maximum tokens per scored passage
+EXTRACTION_CACHE_ENABLED = True  # Reuse extractions of identical article content
+EXTRACTION_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # Extractions are keyed by content, so they stay valid for long
+
+# Scoring settings
+SCORING_MODE = "llm"  # "llm", "hybrid" (rule-based scores, LLM reasoning) or "fast" (rule-based only)
+SCORING_MAX_REPAIR_ATTEMPTS = 2  # Re-prompts after an invalid structured score before falling back
+SCORING_PROMPT_TOKEN_BUDGET = 1500  # Tokens of insights in the scoring prompt
+SCORING_BATCH_PROMPT_TOKEN_BUDGET = 6000  # Tokens of insights across all tickers in a batch scoring prompt
+BATCH_MAX_CONCURRENCY = 4  # Tickers analyzed in parallel by batch requests
+
+# Recommendation settings
+RECOMMENDATION_PROMPT_TOKEN_BUDGET = 1200  # Tokens of scores and insights in the recommendation prompt
+RECOMMENDATION_CACHE_ENABLED = True  # Reuse recommendations when scores and insights are unchanged
+RECOMMENDATION_PRICE_BUCKET_PCT = 0.02  # Price moves within one bucket reuse the cached recommendation; 0 keys on the exact price
+RECOMMENDATION_CACHE_TTL_SECONDS = 6 * 60 * 60  # Maximum age of a reused recommendation
+
+# API settings
+ANALYSIS_CACHE_TTL_SECONDS = 15 * 60  # Serve repeated /analyze requests for a stock from the shared cache
+
+# LLM cost settings
+LLM_PRICING_USD_PER_1M_TOKENS = {  # Model -> (prompt, completion) USD per million tokens
+    "gpt-4o-mini": (0.15, 0.60),
+    "gpt-4o": (2.50, 10.00),
+    "gpt-4.1-mini": (0.40, 1.60),
+    "gpt-4.1": (2.00, 8.00)
+}
+REQUEST_TOKEN_BUDGET = int(os.getenv("REQUEST_TOKEN_BUDGET", "60000"))  # Tokens one analysis may spend; 0 disables the budget
+BUDGET_SCORING_RESERVE_TOKENS = 3000  # Score with rule-based scores when fewer tokens remain
+BUDGET_RECOMMENDATION_RESERVE_TOKENS = 2500  # Skip the recommendation when fewer tokens remain
+
+# Precompute settings
+PRECOMPUTE_ENABLED = True  # Warm the result cache for the most requested tickers off-peak
+PRECOMPUTE_TOP_K = 20  # Tickers warmed per window
+PRECOMPUTE_MAX_CONCURRENCY = 2  # Analyses run in parallel while warming
+PRECOMPUTE_DAILY_BUDGET_USD = 2.0  # Maximum estimated spend on precomputation per day
+PRECOMPUTE_EST_COST_PER_RUN_USD = 0.02  # Spend reserved per analysis until its measured LLM cost is known
+PRECOMPUTE_WINDOWS = (("07:30", "09:00"), ("18:00", "20:00"))  # Pre-market and off-peak windows (market time, weekdays)
+PRECOMPUTE_TIMEZONE = "America/New_York"  # Timezone of the precompute windows
+PRECOMPUTE_RESULT_TTL_SECONDS = 4 * 60 * 60  # Precomputed results last into the trading session
+PRECOMPUTE_DEMAND_HALF_LIFE_HOURS = 24  # Requests count half after this long when ranking demand
+PRECOMPUTE_MIN_DEMAND = 0.05  # Tickers whose decayed request count falls below this are forgotten
+PRECOMPUTE_POLL_SECONDS = 60  # How often the scheduler checks for an open window
+
+# Article ledger settings
+LEDGER_ENABLED = True  # Reuse verdicts and extractions of articles seen in earlier runs
+LEDGER_DB_PATH = os.getenv("LEDGER_DB_PATH", os.path.join("cache", "article_ledger.sqlite3"))  # Per-ticker article ledger
+LEDGER_LOOKBACK_DAYS = 7  # Merge in relevant articles seen within this many days
+LEDGER_MAX_ARTICLES = 8  # Maximum articles (new, reused and merged) sent to scoring
+
+# Checkpoint settings
+CHECKPOINT_DB_PATH = os.getenv("CHECKPOINT_DB_PATH", os.path.join("cache", "checkpoints.sqlite3"))  # Workflow checkpoints by run id
+CHECKPOINT_KEEP_COMPLETED = False  # Keep checkpoints of successful runs (only failed runs can be resumed otherwise)
+CHECKPOINT_TTL_HOURS = 24  # Checkpoints last saved longer ago are deleted, so failed runs can be resumed for this long
+CHECKPOINT_SWEEP_INTERVAL_SECONDS = 60 * 60  # How often finished runs sweep expired checkpoints
+
+# Result store settings
+RESULT_STORE_ENABLED = True  # Keep the latest completed analysis of every ticker for the watchlist endpoints
+RESULT_STORE_DB_PATH = os.getenv("RESULT_STORE_DB_PATH", os.path.join("cache", "results.sqlite3"))  # Latest result per ticker
+RESULTS_MAX_PAGE_SIZE = 200  # Largest page of summaries the results list returns
+
+# Portfolio allocation settings
+ALLOCATION_MAX_WEIGHT = 0.25  # Default cap on one position's share of the portfolio
+ALLOCATION_CORRELATION = 0.3  # Pairwise correlation assumed between stock returns
+ALLOCATION_VOLATILITY_RANGE = (0.15, 0.60)  # Annual volatility assumed for risk_score 10 (lowest risk) and 1
+ALLOCATION_MAX_EXPECTED_RETURN = 0.20  # Expected annual return assumed for an overall score of 100 (negative below 50)
+ALLOCATION_RISK_AVERSION = 3.0  # Variance penalty of mean-variance allocation
+
+# Profiling settings
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() == "true"  # Let admin requests ask for a CPU and allocation profile
+PROFILE_ADMIN_TOKEN = os.getenv("PROFILE_ADMIN_TOKEN")  # X-Admin-Token required to profile and to download profiles
+PROFILE_DIR = os.getenv("PROFILE_DIR", os.path.join("cache", "profiles"))  # Stored profile reports and pstats files
+PROFILE_TOP_N = 15  # Functions and allocation sites reported per node
+PROFILE_MAX_STORED = 50  # Oldest profiles are deleted beyond this many
 
 # File paths
 CACHE_DIR = "cache"
\ No newline at end of file
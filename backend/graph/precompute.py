@@ -0,0 +1,305 @@
+# graph/precompute.py
+import math
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from zoneinfo import ZoneInfo
+import sys
+import os
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (PRECOMPUTE_TOP_K, PRECOMPUTE_MAX_CONCURRENCY,
+                    PRECOMPUTE_DAILY_BUDGET_USD, PRECOMPUTE_EST_COST_PER_RUN_USD, PRECOMPUTE_WINDOWS,
+                    PRECOMPUTE_TIMEZONE, PRECOMPUTE_RESULT_TTL_SECONDS, PRECOMPUTE_DEMAND_HALF_LIFE_HOURS,
+                    PRECOMPUTE_POLL_SECONDS, PRECOMPUTE_MIN_DEMAND)
+from utils.cache import get_cache
+
+def analysis_cache_key(ticker, company_name):
+    """Key of a stock's analysis in the "analysis" cache namespace."""
+    return f"{ticker.upper()}|{company_name.strip().lower()}"
+
+class DemandTracker:
+    def __init__(self, half_life_hours=PRECOMPUTE_DEMAND_HALF_LIFE_HOURS, cache=None,
+                 min_demand=PRECOMPUTE_MIN_DEMAND, clock=time.time):
+        """
+        Track exponentially decayed request counts per ticker, shared by all replicas.
+
+        Counts live in a scored set of the cache. Rather than decaying every count,
+        each request adds 2 ** (hours since the period start / half life), and reads
+        divide by the same factor for now. Periods last 32 half lives, so the weights
+        stay small, and the previous period is read too.
+
+        Args:
+            half_life_hours (float): Hours after which a request counts half
+            cache (TieredCache): Cache holding the counts. Defaults to the shared cache.
+            min_demand (float): Decayed counts below this are dropped
+            clock (callable): Time source, for tests
+        """
+        self.half_life = half_life_hours * 3600.0
+        self.period = 32 * self.half_life
+        self.cache = cache or get_cache()
+        self.min_demand = min_demand
+        self.clock = clock
+
+    def _periods(self, now):
+        """(key, decay factor now) for the current and previous period."""
+        current = int(now // self.period)
+        return [(f"p{p}", 2.0 ** ((now - p * self.period) / self.half_life)) for p in (current, current - 1)]
+
+    def record(self, ticker, company_name):
+        """Count one request for a ticker."""
+        ticker = ticker.upper()
+        (key, weight), _ = self._periods(self.clock())
+        self.cache.incr_score("precompute_demand", key, ticker, weight, ttl=int(2 * self.period))
+        self.cache.set("precompute_company", ticker, company_name, ttl=int(2 * self.period))
+
+    def top(self, k):
+        """
+        Return the k most requested tickers, dropping those below min_demand.
+
+        Args:
+            k (int): Number of tickers
+
+        Returns:
+            list: (ticker, company_name, decayed count) tuples, most requested first
+        """
+        demand = {}
+        for key, factor in self._periods(self.clock()):
+            # Keeps the sets bounded by the tickers requested recently
+            self.cache.remove_scores_below("precompute_demand", key, self.min_demand * factor)
+            for ticker, score in self.cache.scores("precompute_demand", key).items():
+                demand[ticker] = demand.get(ticker, 0.0) + score / factor
+        ranked = sorted(demand.items(), key=lambda item: item[1], reverse=True)[:k]
+        return [(ticker, self.cache.get("precompute_company", ticker)[1] or ticker, count)
+                for ticker, count in ranked]
+
+class PrecomputeScheduler:
+    def __init__(self, analyze_fn=None, cache=None, tracker=None, top_k=PRECOMPUTE_TOP_K,
+                 max_concurrency=PRECOMPUTE_MAX_CONCURRENCY, daily_budget_usd=PRECOMPUTE_DAILY_BUDGET_USD,
+                 est_cost_per_run_usd=PRECOMPUTE_EST_COST_PER_RUN_USD, windows=PRECOMPUTE_WINDOWS,
+                 timezone=PRECOMPUTE_TIMEZONE, result_ttl=PRECOMPUTE_RESULT_TTL_SECONDS, clock=time.time):
+        """
+        Re-run analyses for the most requested tickers off-peak so their results are warm.
+
+        Args:
+            analyze_fn (callable): analyze_stock-compatible function returning JSON-ready results.
+                Defaults to the workflow's analyze_stock.
+            cache (TieredCache): Result cache, also holding the demand counts, the daily
+                spend and the precomputed markers shared by all replicas. Defaults to the shared cache.
+            tracker (DemandTracker): Request frequency tracker
+            top_k (int): Tickers warmed per window
+            max_concurrency (int): Analyses run in parallel
+            daily_budget_usd (float): Maximum estimated spend per day, across replicas
+            est_cost_per_run_usd (float): Spend reserved before each analysis, replaced by
+                the measured LLM cost once the analysis reports its usage
+            windows (tuple): ("HH:MM", "HH:MM") start/end pairs in the market timezone
+            timezone (str): Market timezone for the windows
+            result_ttl (int): TTL of precomputed results, long enough to last into the session
+            clock (callable): Time source, for tests
+        """
+        self.analyze_fn = analyze_fn
+        self.cache = cache or get_cache()
+        self.tracker = tracker or DemandTracker(cache=self.cache, clock=clock)
+        self.top_k = top_k
+        self.max_concurrency = max_concurrency
+        self.daily_budget_usd = daily_budget_usd
+        self.est_cost_per_run_usd = est_cost_per_run_usd
+        self.windows = windows
+        self.timezone = ZoneInfo(timezone)
+        self.result_ttl = result_ttl
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.stop_event = threading.Event()
+        self.thread = None
+        # Counters of this replica
+        self.counters = {
+            "requests": 0, "cache_hits": 0, "precomputed_hits": 0,
+            "runs": 0, "failures": 0, "skipped_budget": 0, "spend_usd_total": 0.0
+        }
+        self.last_run = {}
+
+    def _analyze(self, ticker, company_name):
+        if self.analyze_fn is None:
+            # Imported lazily so the scheduler does not build the agents on import
+            from fastapi.encoders import jsonable_encoder
+            from graph.workflow import analyze_stock
+            self.analyze_fn = lambda t, c: jsonable_encoder(analyze_stock(t, c))
+        return self.analyze_fn(ticker, company_name)
+
+    def record_request(self, ticker, company_name, cache_hit):
+        """
+        Record an /analyze request for demand tracking and hit-rate metrics.
+
+        Args:
+            ticker (str): Stock ticker symbol
+            company_name (str): Company name
+            cache_hit (bool): Whether the result was served from the cache
+        """
+        self.tracker.record(ticker, company_name)
+        precomputed = cache_hit and self.cache.get("precomputed", analysis_cache_key(ticker, company_name))[0]
+        with self.lock:
+            self.counters["requests"] += 1
+            if cache_hit:
+                self.counters["cache_hits"] += 1
+                if precomputed:
+                    self.counters["precomputed_hits"] += 1
+
+    def current_window(self):
+        """Return an id for the precompute window in progress, or None outside the windows."""
+        now = datetime.fromtimestamp(self.clock(), self.timezone)
+        if now.weekday() >= 5:
+            return None
+        hhmm = now.strftime("%H:%M")
+        for start, end in self.windows:
+            if start <= hhmm < end:
+                return f"{now.date().isoformat()}@{start}"
+        return None
+
+    def _add_spend(self, amount):
+        """Add to today's spend of all replicas; returns the new total, or None if the cache failed."""
+        today = datetime.fromtimestamp(self.clock(), self.timezone).date().isoformat()
+        return self.cache.incr_score("precompute_spend", today, "usd", amount, ttl=2 * 24 * 60 * 60)
+
+    def spend_usd_today(self):
+        """Today's spend of all replicas."""
+        today = datetime.fromtimestamp(self.clock(), self.timezone).date().isoformat()
+        return self.cache.scores("precompute_spend", today).get("usd", 0.0)
+
+    def _reserve_budget(self):
+        """Reserve the estimated cost of one run; returns False when the daily budget is spent."""
+        # Increment first and undo on overshoot, so concurrent replicas can't both take the last share
+        spend = self._add_spend(self.est_cost_per_run_usd)
+        if spend is None or spend > self.daily_budget_usd + 1e-9:
+            if spend is not None:
+                self._add_spend(-self.est_cost_per_run_usd)
+            with self.lock:
+                self.counters["skipped_budget"] += 1
+            return False
+        with self.lock:
+            self.counters["spend_usd_total"] += self.est_cost_per_run_usd
+        return True
+
+    def _settle_cost(self, result):
+        """Replace the reserved estimate with the measured cost of a run, when the result reports it."""
+        cost = (result.get("usage") or {}).get("cost_usd")
+        if cost is None:
+            return
+        delta = cost - self.est_cost_per_run_usd
+        self._add_spend(delta)
+        with self.lock:
+            self.counters["spend_usd_total"] += delta
+
+    def _warm(self, ticker, company_name):
+        """Run one analysis and store it in the result cache."""
+        result = self._analyze(ticker, company_name)
+        self._settle_cost(result)
+        if result.get("error"):
+            raise RuntimeError(result["error"])
+        key = analysis_cache_key(ticker, company_name)
+        self.cache.set("analysis", key, result, ttl=self.result_ttl)
+        self.cache.set("precomputed", key, True, ttl=self.result_ttl)
+
+    def run_once(self, window=None):
+        """
+        Warm the top-K tickers within the concurrency and budget limits.
+
+        Args:
+            window (str): Window id recorded with the run
+
+        Returns:
+            dict: Summary of the run
+        """
+        started = self.clock()
+        candidates = self.tracker.top(self.top_k)
+        warmed, failed = [], {}
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            futures = {}
+            for ticker, company_name, _ in candidates:
+                if not self._reserve_budget():
+                    print(f"Precompute budget reached, skipping {ticker}")
+                    continue
+                futures[executor.submit(self._warm, ticker, company_name)] = ticker
+
+            for future in as_completed(futures):
+                ticker = futures[future]
+                try:
+                    future.result()
+                    warmed.append(ticker)
+                except Exception as e:
+                    failed[ticker] = str(e)
+
+        with self.lock:
+            self.counters["runs"] += len(warmed)
+            self.counters["failures"] += len(failed)
+            self.last_run = {
+                "window": window,
+                "started_at": datetime.fromtimestamp(started, self.timezone).isoformat(),
+                "duration_seconds": round(self.clock() - started, 2),
+                "warmed": sorted(warmed),
+                "failed": failed
+            }
+            return dict(self.last_run)
+
+    def tick(self):
+        """Run the current window once across all replicas; returns the run summary or None."""
+        window = self.current_window()
+        if window is None:
+            return None
+        # The first replica to claim the window runs it
+        window_seconds = 24 * 60 * 60
+        if not self.cache.add("precompute_lock", window, {"claimed_at": self.clock()}, ttl=window_seconds):
+            return None
+        print(f"Precomputing top {self.top_k} tickers for window {window}.....")
+        return self.run_once(window)
+
+    def _loop(self, poll_seconds):
+        while not self.stop_event.wait(poll_seconds):
+            try:
+                self.tick()
+            except Exception as e:
+                print(f"Error in precompute scheduler: {str(e)}")
+
+    def start(self, poll_seconds=PRECOMPUTE_POLL_SECONDS):
+        """Start the background thread."""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_event.clear()
+        self.thread = threading.Thread(target=self._loop, args=(poll_seconds,), name="precompute", daemon=True)
+        self.thread.start()
+
+    def stop(self):
+        """Stop the background thread."""
+        self.stop_event.set()
+        if self.thread:
+            self.thread.join(timeout=5)
+
+    def metrics(self):
+        """
+        Report demand, hit rate and spend.
+
+        Returns:
+            dict: Scheduler metrics
+        """
+        top = self.tracker.top(self.top_k)
+        spend_usd_today = self.spend_usd_today()
+        with self.lock:
+            counters = dict(self.counters)
+            requests = counters["requests"]
+            return {
+                **counters,
+                "hit_rate": round(counters["cache_hits"] / requests, 4) if requests else 0.0,
+                "precomputed_hit_rate": round(counters["precomputed_hits"] / requests, 4) if requests else 0.0,
+                "spend_usd_total": round(counters["spend_usd_total"], 4),
+                "spend_usd_today": round(spend_usd_today, 4),
+                "daily_budget_usd": self.daily_budget_usd,
+                "running": bool(self.thread and self.thread.is_alive()),
+                "current_window": self.current_window(),
+                "last_run": dict(self.last_run),
+                "top_tickers": [{"ticker": t, "company_name": c, "demand": round(d, 3)} for t, c, d in top]
+            }
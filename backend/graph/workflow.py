@@ -1,16 +1,38 @@
 from langgraph.graph import StateGraph, END, START
+from langgraph.checkpoint.sqlite import SqliteSaver
+from langchain_core.runnables import RunnableConfig, RunnableLambda
 from typing import TypedDict, List, Dict, Any
+from datetime import datetime, timezone
+import contextlib
+import functools
+import sqlite3
+import threading
+import time
+import uuid
 import sys
 import os
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from config import MAX_RESEARCH_ATTEMPTS
+# Add project root to path for shared utils
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+from config import (MAX_RESEARCH_ATTEMPTS, BATCH_MAX_CONCURRENCY, CHECKPOINT_DB_PATH, CHECKPOINT_KEEP_COMPLETED,
+                    CHECKPOINT_TTL_HOURS, CHECKPOINT_SWEEP_INTERVAL_SECONDS,
+                    LEDGER_ENABLED, LEDGER_DB_PATH, LLM_MODEL, LLM_PRICING_USD_PER_1M_TOKENS, REQUEST_TOKEN_BUDGET,
+                    BUDGET_SCORING_RESERVE_TOKENS, BUDGET_RECOMMENDATION_RESERVE_TOKENS, PROFILE_DIR, PROFILE_TOP_N,
+                    PROFILE_MAX_STORED, RESULT_STORE_ENABLED, RESULT_STORE_DB_PATH)
 from agents.research import ResearchAgent
+from agents.article_ledger import ArticleLedger
+from agents.result_store import ResultStore
 from agents.filtering import FilteringSystem
 from agents.extraction import ExtractionAgent
-from agents.scoring import ScoringMechanism
+from agents.consolidation import InsightConsolidator
+from agents.scoring import ScoringMechanism, SCORING_MODES
 from agents.recommendation import RecommendationAgent
+from utils.metrics_tracker import get_metrics_tracker
+from utils.llm_costs import RequestCostTracker, find_cost_tracker
+from utils.tracing import get_tracer, use_span, TracingCallbackHandler
+from utils.profiling import RequestProfiler, current_profiler
 
 # Define the state
 class StockAnalysisState(TypedDict):
@@ -19,19 +41,57 @@ class StockAnalysisState(TypedDict):
     research_results: Dict[str, Any]
     filtered_results: Dict[str, Any]
     extraction_results: Dict[str, Any]
+    consolidation_results: Dict[str, Any]
     scoring_results: Dict[str, Any]
     recommendation_results: Dict[str, Any]
     error: str
+    failed_stage: str
     research_attempts: int
 
+# Node that precedes each stage, used to resume a run at the stage that failed
+PREVIOUS_STAGE = {
+    "filter": "research",
+    "extract": "filter",
+    "consolidate": "extract",
+    "score": "consolidate",
+    "recommend": "score"
+}
+
 # Initialize agents
 research_agent = ResearchAgent()
-filtering_system = FilteringSystem()
-extraction_agent = ExtractionAgent()
+article_ledger = ArticleLedger(LEDGER_DB_PATH) if LEDGER_ENABLED else None
+result_store = ResultStore(RESULT_STORE_DB_PATH) if RESULT_STORE_ENABLED else None
+filtering_system = FilteringSystem(ledger=article_ledger)
+extraction_agent = ExtractionAgent(ledger=article_ledger)
+insight_consolidator = InsightConsolidator()
 scoring_mechanism = ScoringMechanism()
 recommendation_agent = RecommendationAgent()
+metrics_tracker = get_metrics_tracker()
+tracer = get_tracer()
+tracing_callback = TracingCallbackHandler(tracer)
+
+def timed_stage(stage):
+    """
+    Run a node in a trace span, profiled when the request is, and record its duration,
+    and whether it returned an error, as a workflow stage.
+    """
+    def decorator(node):
+        @functools.wraps(node)
+        def wrapper(state, *args, **kwargs):
+            start = time.perf_counter()
+            profiler = current_profiler()
+            with tracer.start_span(f"node {stage}", attributes={"ticker": state.get("ticker")}) as span, \
+                    (profiler.node(stage) if profiler else contextlib.nullcontext()):
+                result = node(state, *args, **kwargs)
+                if result.get("error"):
+                    span.set_error(result["error"])
+            metrics_tracker.record_stage(stage, time.perf_counter() - start, not result.get("error"))
+            return result
+        return wrapper
+    return decorator
 
 # Define node functions
+@timed_stage("research")
 def research_node(state: StockAnalysisState) -> StockAnalysisState:
     """Research node that fetches information about the stock."""
     print("Entering Research node.....")
@@ -41,14 +101,16 @@ def research_node(state: StockAnalysisState) -> StockAnalysisState:
         
         research_attempts = state.get("research_attempts", 0) + 1
 
-        research_results = research_agent.research(ticker, company_name)
+        # Retries search again instead of reusing the cached results that fell short
+        research_results = research_agent.research(ticker, company_name, use_cache=research_attempts == 1)
         
         return {"research_results": research_results,
                 "research_attempts": research_attempts
             }
     except Exception as e:
-        return {"error": f"Error in research node: {str(e)}"}
+        return {"error": f"Error in research node: {str(e)}", "failed_stage": "research"}
 
+@timed_stage("filter")
 def filter_node(state: StockAnalysisState) -> StockAnalysisState:
     """Filtering node that identifies relevant articles."""
     print("Entering Filter node.....")
@@ -61,8 +123,9 @@ def filter_node(state: StockAnalysisState) -> StockAnalysisState:
         
         return {"filtered_results": filtered_results}
     except Exception as e:
-        return {"error": f"Error in filter node: {str(e)}"}
+        return {"error": f"Error in filter node: {str(e)}", "failed_stage": "filter"}
 
+@timed_stage("extract")
 def extract_node(state: StockAnalysisState) -> StockAnalysisState:
     """Extraction node that pulls insights from filtered articles."""
     print("Entering Extract node.....")
@@ -73,31 +136,71 @@ def extract_node(state: StockAnalysisState) -> StockAnalysisState:
         
         return {"extraction_results": extraction_results}
     except Exception as e:
-        return {"error": f"Error in extract node: {str(e)}"}
+        return {"error": f"Error in extract node: {str(e)}", "failed_stage": "extract"}
 
-def score_node(state: StockAnalysisState) -> StockAnalysisState:
-    """Scoring node that evaluates the stock based on extracted insights."""
-    print("Entering Score node.....")
+@timed_stage("consolidate")
+def consolidate_node(state: StockAnalysisState) -> StockAnalysisState:
+    """Consolidation node that merges duplicate insights across articles."""
+    print("Entering Consolidate node.....")
     try:
         extraction_results = state["extraction_results"]
         
-        scoring_results = scoring_mechanism.score(extraction_results)
+        consolidation_results = insight_consolidator.consolidate(extraction_results)
+        
+        return {"consolidation_results": consolidation_results}
+    except Exception as e:
+        return {"error": f"Error in consolidate node: {str(e)}", "failed_stage": "consolidate"}
+
+@timed_stage("score")
+def score_node(state: StockAnalysisState, config: RunnableConfig) -> StockAnalysisState:
+    """Scoring node that evaluates the stock based on consolidated insights."""
+    print("Entering Score node.....")
+    try:
+        consolidation_results = state["consolidation_results"]
+        
+        # Fall back to rule-based scores when the token budget is nearly spent
+        mode = None
+        cost_tracker = find_cost_tracker(config)
+        if (cost_tracker and scoring_mechanism.mode != "fast"
+                and cost_tracker.remaining_tokens() < BUDGET_SCORING_RESERVE_TOKENS):
+            print(f"Token budget nearly spent, scoring {state['ticker']} with rule-based scores")
+            cost_tracker.note_degradation("score", "rule-based scores")
+            mode = "fast"
+        
+        scoring_results = scoring_mechanism.score(consolidation_results, mode=mode)
         
         return {"scoring_results": scoring_results}
     except Exception as e:
-        return {"error": f"Error in score node: {str(e)}"}
+        return {"error": f"Error in score node: {str(e)}", "failed_stage": "score"}
 
-def recommend_node(state: StockAnalysisState) -> StockAnalysisState:
+@timed_stage("recommend")
+def recommend_node(state: StockAnalysisState, config: RunnableConfig) -> StockAnalysisState:
     """Recommendation node that generates the final investment recommendation."""
     print("Entering Recommend node.....")
     try:
         scoring_results = state["scoring_results"]
         
+        # The scores stand on their own; skip the write-up when the token budget is spent
+        cost_tracker = find_cost_tracker(config)
+        if cost_tracker and cost_tracker.remaining_tokens() < BUDGET_RECOMMENDATION_RESERVE_TOKENS:
+            print(f"Token budget spent, skipping the recommendation for {state['ticker']}")
+            cost_tracker.note_degradation("recommend", "skipped")
+            return {"recommendation_results": {
+                "ticker": scoring_results["ticker"],
+                "company_name": scoring_results["company_name"],
+                "recommendation": "Detailed recommendation skipped: the analysis reached its token budget.",
+                "score": scoring_results["score"],
+                "current_price": scoring_results.get("current_price"),
+                "prompt_stats": {},
+                "cache_hit": False,
+                "skipped": True
+            }}
+        
         recommendation_results = recommendation_agent.recommend(scoring_results)
         
         return {"recommendation_results": recommendation_results}
     except Exception as e:
-        return {"error": f"Error in recommend node: {str(e)}"}
+        return {"error": f"Error in recommend node: {str(e)}", "failed_stage": "recommend"}
 
 # Define routing logic
 def route_after_research(state: StockAnalysisState) -> str:
@@ -128,6 +231,12 @@ def route_after_filter(state: StockAnalysisState) -> str:
 
 def route_after_extract(state: StockAnalysisState) -> str:
     """Decide what to do after extraction."""
+    if "error" in state and state["error"]:
+        return "end"
+    return "consolidate"
+
+def route_after_consolidate(state: StockAnalysisState) -> str:
+    """Decide what to do after consolidation."""
     if "error" in state and state["error"]:
         return "end"
     return "score"
@@ -145,8 +254,19 @@ def route_after_recommend(state: StockAnalysisState) -> str:
     return "end"  # Always end after recommendation
 
 # Build workflow
-def build_stock_analysis_graph():
-    """Build the LangGraph workflow for stock analysis."""
+def build_stock_analysis_graph(include_recommendation=True, include_scoring=True, checkpointer=None):
+    """
+    Build the LangGraph workflow for stock analysis.
+    
+    Args:
+        include_recommendation (bool): Add the recommend node. Streaming callers
+            leave it out and generate the recommendation themselves.
+        include_scoring (bool): Add the score node. Batch callers leave it out and
+            score all tickers together; implies include_recommendation=False.
+        checkpointer: LangGraph checkpointer that saves the state after every node
+    """
+    include_recommendation = include_recommendation and include_scoring
+    
     # Initialize the graph
     graph = StateGraph(StockAnalysisState)
     
@@ -154,8 +274,11 @@ def build_stock_analysis_graph():
     graph.add_node("research", research_node)
     graph.add_node("filter", filter_node)
     graph.add_node("extract", extract_node)
-    graph.add_node("score", score_node)
-    graph.add_node("recommend", recommend_node)
+    graph.add_node("consolidate", consolidate_node)
+    if include_scoring:
+        graph.add_node("score", score_node)
+    if include_recommendation:
+        graph.add_node("recommend", recommend_node)
     
     # Add conditional edges with error handling integrated
     graph.add_edge(START, "research")
@@ -183,63 +306,382 @@ def build_stock_analysis_graph():
         "extract",
         route_after_extract,
         {
-            "score": "score",
+            "consolidate": "consolidate",
             "end": END
         }
     )
     
     graph.add_conditional_edges(
-        "score",
-        route_after_score,
+        "consolidate",
+        route_after_consolidate,
         {
-            "recommend": "recommend",
+            "score": "score" if include_scoring else END,
             "end": END
         }
     )
     
-    graph.add_conditional_edges(
-        "recommend",
-        route_after_recommend,
-        {
-            "end": END
-        }
-    )
+    if include_scoring:
+        graph.add_conditional_edges(
+            "score",
+            route_after_score,
+            {
+                "recommend": "recommend" if include_recommendation else END,
+                "end": END
+            }
+        )
     
-    return graph.compile()
+    if include_recommendation:
+        graph.add_conditional_edges(
+            "recommend",
+            route_after_recommend,
+            {
+                "end": END
+            }
+        )
+    
+    return graph.compile(checkpointer=checkpointer)
 
 # Function to execute the workflow
-def analyze_stock(ticker, company_name):
-    """
-    Analyze a stock using the workflow.
-    
-    Args:
-        ticker (str): Stock ticker symbol
-        company_name (str): Company name
-        
-    Returns:
-        dict: Complete analysis results
-    """
-    # Build the graph
-    graph = build_stock_analysis_graph()
-    
-    # Initialize the state
-    initial_state = StockAnalysisState(
+def _initial_state(ticker, company_name):
+    """Create the initial workflow state for a stock."""
+    return StockAnalysisState(
         ticker=ticker,
         company_name=company_name,
         research_results={},
         filtered_results={},
         extraction_results={},
+        consolidation_results={},
         scoring_results={},
         recommendation_results={},
         error="",
+        failed_stage="",
         research_attempts=0  # Start with 0 attempts
     )
+
+_checkpointer = None
+_checkpointer_lock = threading.Lock()
+_last_checkpoint_sweep = 0.0
+
+def get_checkpointer():
+    """Return the SQLite checkpointer shared by checkpointed runs."""
+    global _checkpointer
+    with _checkpointer_lock:
+        if _checkpointer is None:
+            directory = os.path.dirname(os.path.abspath(CHECKPOINT_DB_PATH))
+            os.makedirs(directory, exist_ok=True)
+            conn = sqlite3.connect(CHECKPOINT_DB_PATH, check_same_thread=False)
+            _checkpointer = SqliteSaver(conn)
+        return _checkpointer
+
+def sweep_checkpoints(checkpointer, max_age_hours=CHECKPOINT_TTL_HOURS, now=None):
+    """
+    Delete the checkpoints of runs last saved more than max_age_hours ago.
     
-    # Execute the graph
-    result = graph.invoke(initial_state)
+    Failed runs keep their checkpoints to be resumed; without the sweep they
+    would stay in the database forever.
     
+    Args:
+        checkpointer (SqliteSaver): Checkpointer to sweep
+        max_age_hours (float): Age of the latest checkpoint after which a run is dropped
+        now (float): Current time, for tests
+        
+    Returns:
+        int: Number of runs deleted
+    """
+    cutoff = datetime.fromtimestamp((now or time.time()) - max_age_hours * 3600, timezone.utc)
+    with checkpointer.cursor(transaction=False) as cur:
+        cur.execute("SELECT DISTINCT thread_id FROM checkpoints")
+        thread_ids = [row[0] for row in cur.fetchall()]
+    
+    deleted = 0
+    for thread_id in thread_ids:
+        latest = checkpointer.get_tuple({"configurable": {"thread_id": thread_id}})
+        if latest is not None and datetime.fromisoformat(latest.checkpoint["ts"]) < cutoff:
+            checkpointer.delete_thread(thread_id)
+            deleted += 1
+    return deleted
+
+def _maybe_sweep_checkpoints(checkpointer):
+    """Sweep expired checkpoints at most once per CHECKPOINT_SWEEP_INTERVAL_SECONDS."""
+    global _last_checkpoint_sweep
+    with _checkpointer_lock:
+        if time.time() - _last_checkpoint_sweep < CHECKPOINT_SWEEP_INTERVAL_SECONDS:
+            return
+        _last_checkpoint_sweep = time.time()
+    try:
+        deleted = sweep_checkpoints(checkpointer)
+        if deleted:
+            print(f"Deleted the checkpoints of {deleted} expired runs")
+    except Exception as e:
+        print(f"Error sweeping checkpoints: {str(e)}")
+
+def _cost_tracker(ticker):
+    """Create the callback accounting the LLM usage of one request within the token budget."""
+    return RequestCostTracker(ticker, REQUEST_TOKEN_BUDGET, LLM_PRICING_USD_PER_1M_TOKENS, LLM_MODEL)
+
+def _callbacks(cost_tracker=None):
+    """LangChain callbacks of a run: tracing, and usage accounting when given."""
+    return [tracing_callback, cost_tracker] if cost_tracker else [tracing_callback]
+
+def _usage_config(cost_tracker, node, span=None):
+    """Runnable config attributing LLM calls made outside the graph to a node, and to a trace span."""
+    metadata = {"langgraph_node": node}
+    if span:
+        metadata.update({"trace_id": span.trace_id, "parent_span_id": span.span_id})
+    return {"callbacks": _callbacks(cost_tracker), "metadata": metadata}
+
+def _run_config(run_id, cost_tracker=None):
+    return {"configurable": {"thread_id": run_id}, "callbacks": _callbacks(cost_tracker)}
+
+def _store_result(result):
+    """Keep a completed analysis in the result store."""
+    if result_store is None or result.get("error"):
+        return
+    try:
+        result_store.save(result)
+    except Exception as e:
+        print(f"Error storing result for {result.get('ticker')}: {str(e)}")
+
+def _finish_run(graph, run_id, result, cost_tracker=None, span=None):
+    """
+    Attach the run id, LLM usage and trace id, store completed results and drop
+    the checkpoints of runs that completed, and of failed runs past their TTL.
+    """
+    result = {**result, "run_id": run_id}
+    if cost_tracker:
+        result["usage"] = cost_tracker.summary()
+        metrics_tracker.record_usage(result["usage"])
+    if span:
+        result["trace_id"] = span.trace_id
+        span.set_attributes({"run_id": run_id, "total_tokens": result.get("usage", {}).get("total_tokens")})
+        if result.get("error"):
+            span.set_error(result["error"])
+    _store_result(result)
+    if not result.get("error") and not CHECKPOINT_KEEP_COMPLETED:
+        try:
+            graph.checkpointer.delete_thread(run_id)
+        except Exception as e:
+            print(f"Error deleting checkpoints for run {run_id}: {str(e)}")
+    _maybe_sweep_checkpoints(graph.checkpointer)
+    return result
+
+def _save_profile(profiler, profiled):
+    """Store a request's profile and return the summary included in its result."""
+    if not profiled:
+        return {"error": "Another request is being profiled; this one ran unprofiled"}
+    try:
+        report = profiler.save(PROFILE_DIR, PROFILE_MAX_STORED)
+    except Exception as e:
+        print(f"Error saving profile {profiler.profile_id}: {str(e)}")
+        return {"profile_id": profiler.profile_id, "error": str(e)}
+    return {
+        "profile_id": profiler.profile_id,
+        "cpu_seconds": {node: stats["cpu_seconds"] for node, stats in report["nodes"].items()},
+        "wall_seconds": {node: stats["wall_seconds"] for node, stats in report["nodes"].items()}
+    }
+
+def analyze_stock(ticker, company_name, run_id=None, profile=False):
+    """
+    Analyze a stock using the workflow.
+    
+    The state is checkpointed after every node under the run id, so a failed
+    run can be resumed with resume_analysis.
+    
+    Args:
+        ticker (str): Stock ticker symbol
+        company_name (str): Company name
+        run_id (str): Run id for the checkpoints; generated if not given
+        profile (bool): Capture a CPU profile and allocation snapshot per node, stored
+            in PROFILE_DIR under the run id
+        
+    Returns:
+        dict: Complete analysis results, including run_id, the LLM usage and the trace id,
+            and a "profile" summary when profiled
+    """
+    run_id = run_id or uuid.uuid4().hex
+    cost_tracker = _cost_tracker(ticker)
+    profiler = RequestProfiler(run_id, ticker, PROFILE_TOP_N) if profile else None
+    
+    # Build the graph
+    graph = build_stock_analysis_graph(checkpointer=get_checkpointer())
+    
+    # Execute the graph
+    with tracer.start_span("analyze_stock", attributes={"ticker": ticker, "company_name": company_name}) as span, \
+            (profiler.session() if profiler else contextlib.nullcontext()) as profiled:
+        start_time = metrics_tracker.start_request()
+        try:
+            result = graph.invoke(_initial_state(ticker, company_name), _run_config(run_id, cost_tracker))
+        except Exception as e:
+            metrics_tracker.end_request(start_time, {"ticker": ticker, "error": str(e)}, success=False)
+            metrics_tracker.record_usage(cost_tracker.summary())
+            raise
+        metrics_tracker.end_request(start_time, result, success=not result.get("error"))
+        
+        result = _finish_run(graph, run_id, result, cost_tracker, span)
+    if profiler:
+        result["profile"] = _save_profile(profiler, profiled)
     return result
 
+def resume_analysis(run_id):
+    """
+    Resume a failed or interrupted run from its last completed node.
+    
+    Args:
+        run_id (str): Run id returned by analyze_stock
+        
+    Returns:
+        dict: Complete analysis results, including run_id, and the LLM usage and trace id
+            of the resumed part
+        
+    Raises:
+        KeyError: If there are no checkpoints for the run
+    """
+    graph = build_stock_analysis_graph(checkpointer=get_checkpointer())
+    
+    snapshot = graph.get_state(_run_config(run_id))
+    if not snapshot.values:
+        raise KeyError(f"No checkpoints for run {run_id}")
+    
+    state = snapshot.values
+    with tracer.start_span("resume_analysis", attributes={"ticker": state["ticker"]}) as span:
+        cost_tracker = _cost_tracker(state["ticker"])
+        config = _run_config(run_id, cost_tracker)
+        if snapshot.next:
+            # Interrupted mid-run: continue with the pending nodes
+            print(f"Resuming run {run_id} at {', '.join(snapshot.next)}.....")
+            result = graph.invoke(None, config)
+        elif state.get("error"):
+            failed_stage = state.get("failed_stage")
+            previous_stage = PREVIOUS_STAGE.get(failed_stage)
+            print(f"Resuming run {run_id} at the failed {failed_stage or 'unknown'} stage.....")
+            if previous_stage:
+                # Record the cleared error as the predecessor's output, so its router picks the failed stage again
+                graph.update_state(config, {"error": "", "failed_stage": ""}, as_node=previous_stage)
+                result = graph.invoke(None, config)
+            else:
+                # Nothing completed before the failure: start over on the same run
+                result = graph.invoke(_initial_state(state["ticker"], state["company_name"]), config)
+        else:
+            # Already complete
+            result = state
+        
+        return _finish_run(graph, run_id, result, cost_tracker, span)
+
+def stream_stock_analysis(ticker, company_name):
+    """
+    Analyze a stock, streaming the recommendation as it is generated.
+    
+    Args:
+        ticker (str): Stock ticker symbol
+        company_name (str): Company name
+        
+    Yields:
+        dict: Events with "event" set to "analysis" (state up to scoring),
+            "token" (recommendation text), "recommendation" (final results) or "error",
+            followed by a "usage" event with the LLM usage and trace id of the request
+    """
+    cost_tracker = _cost_tracker(ticker)
+    graph = build_stock_analysis_graph(include_recommendation=False)
+    
+    # The span is only made current around the graph run: the context does not carry across yields
+    span = tracer.begin_span("stream_stock_analysis", attributes={"ticker": ticker, "company_name": company_name})
+    try:
+        with use_span(span):
+            result = graph.invoke(_initial_state(ticker, company_name), {"callbacks": _callbacks(cost_tracker)})
+        
+        if "error" in result and result["error"]:
+            span.set_error(result["error"])
+            yield {"event": "error", "data": result["error"]}
+        else:
+            yield {"event": "analysis", "data": result}
+            
+            print("Entering Recommend node (streaming).....")
+            try:
+                for item in recommendation_agent.stream_recommendation(
+                    result["scoring_results"], config=_usage_config(cost_tracker, "recommend", span)
+                ):
+                    if isinstance(item, str):
+                        yield {"event": "token", "data": item}
+                    else:
+                        _store_result({**result, "recommendation_results": item})
+                        yield {"event": "recommendation", "data": item}
+            except Exception as e:
+                span.set_error(str(e), type(e).__name__)
+                yield {"event": "error", "data": f"Error in recommend node: {str(e)}"}
+        
+        usage = cost_tracker.summary()
+        metrics_tracker.record_usage(usage)
+        yield {"event": "usage", "data": {**usage, "trace_id": span.trace_id}}
+    finally:
+        tracer.end_span(span)
+
+def analyze_stocks_batch(stocks, mode=None, include_recommendations=False):
+    """
+    Analyze several stocks and score them together for portfolio-relative ranking.
+    
+    Args:
+        stocks (list): Dicts with "ticker" and "company_name"
+        mode (str): Batch scoring mode ("llm", "hybrid" or "fast"); defaults to SCORING_MODE
+        include_recommendations (bool): Also generate a recommendation per ticker
+        
+    Returns:
+        dict: Ranked results with per-ticker LLM usage, per-ticker errors, the
+            usage of the shared scoring pass and the trace id
+    """
+    if mode and mode not in SCORING_MODES:
+        raise ValueError(f"Unknown scoring mode: {mode}")
+    
+    tickers = ",".join(stock["ticker"] for stock in stocks)
+    with tracer.start_span("analyze_stocks_batch", attributes={"tickers": tickers}) as span:
+        # Research through consolidation for every ticker, in parallel
+        cost_trackers = {stock["ticker"]: _cost_tracker(stock["ticker"]) for stock in stocks}
+        graph = build_stock_analysis_graph(include_scoring=False)
+        states = graph.batch(
+            [_initial_state(stock["ticker"], stock["company_name"]) for stock in stocks],
+            config=[{"max_concurrency": BATCH_MAX_CONCURRENCY, "callbacks": _callbacks(cost_trackers[stock["ticker"]])}
+                    for stock in stocks],
+            return_exceptions=True
+        )
+        
+        consolidation_results = []
+        errors = {}
+        for stock, state in zip(stocks, states):
+            if isinstance(state, Exception):
+                errors[stock["ticker"]] = str(state)
+            elif state.get("error"):
+                errors[stock["ticker"]] = state["error"]
+            else:
+                consolidation_results.append(state["consolidation_results"])
+        
+        # One scoring pass across all tickers, accounted separately as it is shared
+        print(f"Batch scoring {len(consolidation_results)} tickers.....")
+        scoring_tracker = _cost_tracker(None)
+        ranked = RunnableLambda(lambda items: scoring_mechanism.score_batch(items, mode=mode)).invoke(
+            consolidation_results, _usage_config(scoring_tracker, "score")
+        )
+        
+        results = []
+        for scoring_results in ranked:
+            entry = {"ticker": scoring_results["ticker"], "scoring_results": scoring_results}
+            cost_tracker = cost_trackers.get(scoring_results["ticker"])
+            if include_recommendations:
+                try:
+                    entry["recommendation_results"] = recommendation_agent.recommend(
+                        scoring_results, config=_usage_config(cost_tracker, "recommend")
+                    )
+                except Exception as e:
+                    entry["error"] = f"Error in recommend node: {str(e)}"
+            if cost_tracker:
+                entry["usage"] = cost_tracker.summary()
+            _store_result(entry)
+            results.append(entry)
+        
+        for cost_tracker in [*cost_trackers.values(), scoring_tracker]:
+            metrics_tracker.record_usage(cost_tracker.summary())
+        
+        return {"results": results, "errors": errors, "usage": {"batch_scoring": scoring_tracker.summary()},
+                "trace_id": span.trace_id}
+
 # Test the workflow
 if __name__ == "__main__":
     result = analyze_stock("BAJAJHFL", "Bajaj housing finance limited")
@@ -1,11 +1,15 @@
 import streamlit as st
 import pandas as pd
 import plotly.graph_objects as go
-from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import closing
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
 import sys
 import os
 import time
 import json
+import sqlite3
 import requests
 
 
@@ -13,6 +17,36 @@ import requests
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 # from backend.graph.workflow import analyze_stock
 
+# Get backend URL from environment variable or use localhost for development
+API_URL = os.getenv("BACKEND_API_URL", "http://localhost:8080")
+# Analyses requested from the backend at once
+MAX_CONCURRENT_ANALYSES = int(os.getenv("MAX_CONCURRENT_ANALYSES", "4"))
+# Local store of analysis results, one per ticker and day, reloaded on startup
+RESULTS_DB_PATH = os.getenv("RESULTS_DB_PATH", os.path.join("cache", "frontend_results.sqlite3"))
+RESULTS_RELOAD_DAYS = int(os.getenv("RESULTS_RELOAD_DAYS", "7"))  # Reload results analyzed within this many days
+
+ALLOCATION_METHODS = {
+    "Score weighted": "score",
+    "Inverse risk score": "inverse_risk",
+    "Risk parity": "risk_parity",
+    "Mean-variance": "mean_variance"
+}
+
+# Watchlist summary columns the backend sorts by
+WATCHLIST_SORT_COLUMNS = {
+    "Overall Score": "overall_score",
+    "Risk Score": "risk_score",
+    "Ticker": "ticker",
+    "Recommendation": "investment_recommendation",
+    "Confidence": "confidence_level",
+    "Analyzed": "analyzed_at"
+}
+WATCHLIST_PAGE_SIZES = [25, 50, 100, 200]
+
+SCORE_CATEGORIES = ['Financial Health', 'Growth Potential', 'Analyst Sentiment', 'Momentum', 'Risk Level']
+SCORE_FIELDS = ["financial_health_score", "growth_potential_score", "analyst_sentiment_score",
+                "momentum_score", "risk_score"]
+
 # Helper function to get value from either a dictionary or an object
 def get_value(obj, key, default=None):
     """Get a value from an object regardless of whether it's a dict or an object with attributes"""
@@ -20,6 +54,442 @@ def get_value(obj, key, default=None):
         return obj.get(key, default)
     return getattr(obj, key, default)
 
+@st.cache_resource
+def get_http_session():
+    """HTTP session shared by all reruns and users, keeping connections to the backend open"""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=1, pool_maxsize=MAX_CONCURRENT_ANALYSES)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+def _results_db():
+    """Open the results store, creating it on first use; callers close the connection"""
+    os.makedirs(os.path.dirname(os.path.abspath(RESULTS_DB_PATH)), exist_ok=True)
+    conn = sqlite3.connect(RESULTS_DB_PATH)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS results ("
+        "ticker TEXT NOT NULL, analysis_date TEXT NOT NULL, saved_at REAL NOT NULL, result TEXT NOT NULL, "
+        "PRIMARY KEY (ticker, analysis_date))"
+    )
+    return conn
+
+def save_result(ticker, result):
+    """Store a ticker's result under today's date, replacing an earlier one from the same day"""
+    try:
+        with closing(_results_db()) as conn, conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                (ticker, datetime.now().strftime("%Y-%m-%d"), time.time(), json.dumps(result))
+            )
+    except (sqlite3.Error, TypeError, ValueError) as e:
+        st.error(f"Error saving result for {ticker}: {str(e)}")
+
+def load_saved_results(days=RESULTS_RELOAD_DAYS):
+    """
+    Load the latest stored result of every ticker analyzed within the last days.
+    
+    Returns:
+        dict: Ticker -> result, most recently saved first
+    """
+    since = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+    try:
+        with closing(_results_db()) as conn:
+            rows = conn.execute(
+                "SELECT ticker, result FROM results WHERE analysis_date >= ? ORDER BY saved_at DESC", (since,)
+            ).fetchall()
+    except sqlite3.Error as e:
+        st.error(f"Error loading saved results: {str(e)}")
+        return {}
+    results = {}
+    for ticker, result in rows:
+        if ticker not in results:
+            results[ticker] = json.loads(result)
+    return results
+
+def clear_saved_results():
+    """Delete every stored result"""
+    try:
+        with closing(_results_db()) as conn, conn:
+            conn.execute("DELETE FROM results")
+    except sqlite3.Error as e:
+        st.error(f"Error clearing saved results: {str(e)}")
+
+def score_summary(ticker, result):
+    """Flat row of a result's scores, the input of the cached tables and charts"""
+    recommendation = result["recommendation_results"]
+    score = recommendation["score"]
+    return {
+        "Ticker": ticker,
+        "Company": recommendation.get("company_name", "Unknown"),
+        "Overall Score": get_value(score, "overall_score", 0),
+        "Financial Health": get_value(score, "financial_health_score", 0),
+        "Growth Potential": get_value(score, "growth_potential_score", 0),
+        "Analyst Sentiment": get_value(score, "analyst_sentiment_score", 0),
+        "Momentum": get_value(score, "momentum_score", 0),
+        "Risk Level": get_value(score, "risk_score", 0),
+        "Recommendation": get_value(score, "investment_recommendation", "N/A"),
+        "Confidence": get_value(score, "confidence_level", "N/A")
+    }
+
+# Figures and tables are memoized on their inputs, so reruns only rebuild what changed
+@st.cache_data(max_entries=500)
+def build_radar_figure(ticker, values):
+    """Radar chart of a stock's score components"""
+    # Close the loop for the radar chart
+    categories = SCORE_CATEGORIES + [SCORE_CATEGORIES[0]]
+    values = list(values) + [values[0]]
+    
+    fig = go.Figure()
+    fig.add_trace(go.Scatterpolar(
+        r=values,
+        theta=categories,
+        fill='toself',
+        name=ticker
+    ))
+    
+    fig.update_layout(
+        polar=dict(
+            radialaxis=dict(
+                visible=True,
+                range=[0, 10]
+            )
+        ),
+        height=400,
+        margin=dict(l=10, r=10, t=30, b=10)
+    )
+    return fig
+
+@st.cache_data(max_entries=50)
+def build_scores_df(score_rows):
+    """Scores table of all analyzed stocks"""
+    return pd.DataFrame(list(score_rows))
+
+@st.cache_data(max_entries=50)
+def build_rankings_figure(scores_df):
+    """Horizontal bar chart of overall scores, colored by recommendation"""
+    bar_data = scores_df.sort_values("Overall Score")
+    
+    fig = go.Figure()
+    
+    # Add color based on recommendation
+    colors = bar_data["Recommendation"].map({
+        "Buy": "green",
+        "Hold": "orange",
+        "Sell": "red"
+    }).fillna("gray")
+    
+    fig.add_trace(go.Bar(
+        x=bar_data["Overall Score"],
+        y=bar_data["Ticker"],
+        orientation='h',
+        marker_color=colors,
+        text=bar_data["Overall Score"],
+        textposition='auto'
+    ))
+    
+    fig.update_layout(
+        title="Stock Rankings",
+        xaxis_title="Overall Score",
+        yaxis_title="Stock",
+        height=max(400, 22 * len(bar_data))
+    )
+    return fig
+
+@st.cache_data(max_entries=100)
+def fetch_allocation(allocation_inputs, method, max_weight, include_hold):
+    """
+    Ask the backend for a portfolio allocation.
+    
+    Args:
+        allocation_inputs (tuple): Dicts with ticker, overall_score, risk_score and investment_recommendation
+        method (str): One of ALLOCATION_METHODS
+        max_weight (float): Position cap
+        include_hold (bool): Also allocate to Hold recommendations
+        
+    Returns:
+        dict: Allocation from /allocate, or a dict with an error
+    """
+    try:
+        response = get_http_session().post(
+            f"{API_URL}/allocate",
+            json={"stocks": list(allocation_inputs), "method": method, "max_weight": max_weight,
+                  "include_hold": include_hold},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return {"error": f"API Error: {str(e)}"}
+
+@st.cache_data(max_entries=100)
+def build_allocation_figure(allocation):
+    """Allocation pie chart and table, including any cash the position cap leaves"""
+    allocation_df = pd.DataFrame(allocation["allocations"])
+    allocation_df = allocation_df[allocation_df["weight"] > 0]
+    if allocation["cash_weight"] > 0:
+        allocation_df = pd.concat([allocation_df, pd.DataFrame([{
+            "ticker": "Cash", "weight": allocation["cash_weight"], "risk_contribution": 0.0
+        }])], ignore_index=True)
+    allocation_df = allocation_df.sort_values("weight", ascending=False)
+    
+    # Create pie chart
+    fig = go.Figure(data=[go.Pie(
+        labels=allocation_df["ticker"],
+        values=allocation_df["weight"],
+        hole=.3,
+        textinfo='label+percent'
+    )])
+    
+    fig.update_layout(title="Recommended Portfolio Allocation")
+    
+    # Allocation table
+    table = pd.DataFrame({
+        "Ticker": allocation_df["ticker"],
+        "Allocation": (allocation_df["weight"] * 100).round(2).astype(str) + "%",
+        "Risk Contribution": (allocation_df["risk_contribution"] * 100).round(2).astype(str) + "%"
+    }).set_index("Ticker")
+    return table, fig
+
+def render_stock_result(ticker, result):
+    """Show a stock's scores, recommendation and sources"""
+    recommendation = result["recommendation_results"]
+    score = recommendation["score"]
+    
+    # Display score and recommendation
+    col1, col2 = st.columns([1, 2])
+    
+    with col1:
+        # Score card - using the get_value helper function
+        overall_score = get_value(score, "overall_score", 0)
+        investment_recommendation = get_value(score, "investment_recommendation", "N/A")
+        confidence_level = get_value(score, "confidence_level", "N/A")
+        
+        st.subheader(f"{ticker} - {overall_score}/100")
+        st.write(f"**Recommendation:** {investment_recommendation}")
+        st.write(f"**Confidence:** {confidence_level}")
+        
+        # Radar chart for score components
+        values = tuple(get_value(score, field, 0) for field in SCORE_FIELDS)
+        st.plotly_chart(build_radar_figure(ticker, values), key=f"radar_{ticker}")
+        
+        # Display reasoning
+        st.subheader("Score Reasoning")
+        reasoning = get_value(score, "reasoning", {})
+        
+        # Handle reasoning depending on whether it's a dict or an object
+        if isinstance(reasoning, dict):
+            for category, reason in reasoning.items():
+                st.write(f"**{category}:** {reason}")
+        else:
+            # Try accessing as attributes
+            for category in ["financial_health_score", "growth_potential_score", 
+                           "analyst_sentiment_score", "momentum_score", "risk_score", "overall_score"]:
+                reason = get_value(reasoning, category, None)
+                if reason:
+                    st.write(f"**{category}:** {reason}")
+    
+    with col2:
+        # Detailed recommendation
+        st.subheader("Investment Recommendation")
+        st.markdown(recommendation.get("recommendation") or "No recommendation was generated for this analysis.")
+        
+        # Show sources
+        st.subheader("Information Sources")
+        extraction_results = result.get("extraction_results") or {}
+        for i, insight in enumerate(extraction_results.get("extracted_insights", [])):
+            with st.expander(f"Source {i+1}: {insight.get('url', 'N/A')}"):
+                st.write("**Summary:**")
+                st.write(insight.get("summary", "No summary available"))
+
+def call_stock_analysis_api(ticker, company_name, session=None):
+    """
+    Call the backend API to analyze a stock.
+    
+    Runs in worker threads, so it reports failures in the returned dict
+    instead of through Streamlit.
+    """
+    try:
+        response = (session or get_http_session()).post(
+            f"{API_URL}/analyze",
+            json={"ticker": ticker, "company_name": company_name},
+            timeout=180  # Longer timeout since analysis takes time
+        )
+        
+        # Check if the request was successful
+        response.raise_for_status()
+        
+        # Return the JSON response
+        return response.json()
+        
+    except requests.exceptions.RequestException as e:
+        return {"error": f"API Error: {str(e)}"}
+
+def analyze_stocks_concurrently(stocks):
+    """
+    Analyze stocks in parallel, yielding each result as soon as it arrives.
+    
+    Args:
+        stocks (list): Dicts with ticker and company_name
+        
+    Yields:
+        tuple: (stock, result, seconds taken) in completion order
+    """
+    # Fetched here: cached resources need the script thread
+    session = get_http_session()
+    
+    def timed_call(stock):
+        start = time.perf_counter()
+        result = call_stock_analysis_api(stock["ticker"], stock["company_name"], session)
+        return result, time.perf_counter() - start
+    
+    with ThreadPoolExecutor(max_workers=MAX_CONCURRENT_ANALYSES) as executor:
+        futures = {executor.submit(timed_call, stock): stock for stock in stocks}
+        for future in as_completed(futures):
+            result, seconds = future.result()
+            yield futures[future], result, seconds
+
+def parse_watchlist_csv(file):
+    """
+    Read a watchlist from an uploaded CSV file.
+    
+    Needs a "ticker" or "symbol" column; "company_name", "company" or "name" is
+    optional and defaults to the ticker. Tickers are upper-cased and deduplicated.
+    
+    Returns:
+        list: Dicts with ticker and company_name, in file order
+    """
+    df = pd.read_csv(file, dtype=str, keep_default_na=False)
+    columns = {column.strip().lower(): column for column in df.columns}
+    ticker_column = next((columns[name] for name in ("ticker", "symbol") if name in columns), None)
+    if ticker_column is None:
+        raise ValueError("The CSV needs a 'ticker' or 'symbol' column.")
+    name_column = next((columns[name] for name in ("company_name", "company", "name") if name in columns), None)
+    
+    stocks, seen = [], set()
+    for row in df.to_dict("records"):
+        ticker = row[ticker_column].strip().upper()
+        if not ticker or ticker in seen:
+            continue
+        seen.add(ticker)
+        company_name = row[name_column].strip() if name_column else ""
+        stocks.append({"ticker": ticker, "company_name": company_name or ticker})
+    return stocks
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_results_page(tickers, page, page_size, sort_by, descending):
+    """One page of result summaries for the watchlist, from the backend"""
+    try:
+        response = get_http_session().get(
+            f"{API_URL}/results",
+            params={"tickers": ",".join(tickers), "page": page, "page_size": page_size,
+                    "sort_by": sort_by, "descending": descending},
+            timeout=30
+        )
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return {"error": f"API Error: {str(e)}"}
+
+@st.cache_data(max_entries=200, show_spinner=False)
+def fetch_result_detail(ticker, analyzed_at):
+    """
+    Scores, recommendation and sources of one ticker, fetched when its row is opened.
+    
+    analyzed_at is part of the cache key, so a new analysis is fetched again.
+    """
+    try:
+        response = get_http_session().get(f"{API_URL}/results/{ticker}", timeout=30)
+        response.raise_for_status()
+        return response.json()
+    except requests.exceptions.RequestException as e:
+        return {"error": f"API Error: {str(e)}"}
+
+def render_watchlist():
+    """Large watchlist mode: CSV import, a paginated summary table and details on demand"""
+    if "watchlist" not in st.session_state:
+        st.session_state.watchlist = []
+    
+    st.sidebar.header("Watchlist")
+    uploaded = st.sidebar.file_uploader("Import tickers from CSV", type="csv",
+                                        help="A 'ticker' or 'symbol' column and an optional 'company_name' column")
+    # Parse each upload once, not on every rerun
+    if uploaded is not None and st.session_state.get("watchlist_file") != uploaded.file_id:
+        try:
+            st.session_state.watchlist = parse_watchlist_csv(uploaded)
+            st.session_state.watchlist_file = uploaded.file_id
+        except (ValueError, pd.errors.ParserError) as e:
+            st.sidebar.error(str(e))
+    
+    watchlist = st.session_state.watchlist
+    if not watchlist:
+        st.info("Import a CSV file with a 'ticker' column to start a watchlist.")
+        return
+    st.sidebar.write(f"{len(watchlist)} tickers in the watchlist")
+    
+    if st.sidebar.button("Analyze Watchlist"):
+        progress = st.progress(0.0)
+        status = st.empty()
+        errors = []
+        for done, (stock, result, seconds) in enumerate(analyze_stocks_concurrently(watchlist), start=1):
+            if "error" in result:
+                errors.append(f"{stock['ticker']}: {result['error']}")
+            progress.progress(done / len(watchlist))
+            status.write(f"Analyzed {done} of {len(watchlist)} tickers ({len(errors)} failed)")
+        if errors:
+            with st.expander(f"{len(errors)} analyses failed"):
+                st.write("\n".join(f"- {error}" for error in errors))
+        # The backend stored the new results
+        fetch_results_page.clear()
+    
+    tickers = tuple(stock["ticker"] for stock in watchlist)
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        sort_label = st.selectbox("Sort by", list(WATCHLIST_SORT_COLUMNS))
+    with col2:
+        descending = st.toggle("Descending", value=sort_label != "Ticker")
+    with col3:
+        page_size = st.selectbox("Rows per page", WATCHLIST_PAGE_SIZES, index=1)
+    
+    # The page number input sits below the table, so clamp the remembered page first
+    page = st.session_state.get("watchlist_page", 1)
+    results_page = fetch_results_page(tickers, page, page_size, WATCHLIST_SORT_COLUMNS[sort_label], descending)
+    if "error" in results_page:
+        st.error(results_page["error"])
+        return
+    total = results_page["total"]
+    pages = max(1, -(-total // page_size))
+    if page > pages:
+        st.session_state.watchlist_page = pages
+        st.rerun()
+    
+    if not total:
+        st.info("No results yet. Analyze the watchlist to fill the table.")
+        return
+    
+    items = results_page["items"]
+    table = pd.DataFrame(items).rename(columns={
+        "ticker": "Ticker", "company_name": "Company", "overall_score": "Overall Score",
+        "risk_score": "Risk Score", "investment_recommendation": "Recommendation",
+        "confidence_level": "Confidence", "current_price": "Price", "analyzed_at": "Analyzed"
+    })
+    table["Analyzed"] = pd.to_datetime(table["Analyzed"], unit="s")
+    first = (page - 1) * page_size + 1
+    st.caption(f"Showing {first}-{first + len(items) - 1} of {total} analyzed tickers "
+               f"({len(tickers) - total} not analyzed yet). Select a row for its details.")
+    selection = st.dataframe(table, hide_index=True, on_select="rerun", selection_mode="single-row",
+                             key=f"watchlist_table_{page}_{page_size}_{sort_label}_{descending}")
+    st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key="watchlist_page")
+    
+    if selection.selection.rows:
+        item = items[selection.selection.rows[0]]
+        detail = fetch_result_detail(item["ticker"], item["analyzed_at"])
+        if "error" in detail:
+            st.error(detail["error"])
+        else:
+            st.divider()
+            render_stock_result(item["ticker"], detail)
+
 def create_streamlit_app():
     st.set_page_config(
         page_title="AI Stock Analyst",
@@ -30,6 +500,13 @@ def create_streamlit_app():
     st.title("AI Stock Analyst")
     st.subheader("Intelligent stock analysis for short-term investments")
     
+    # A handful of stocks in detail, or a large watchlist page by page
+    mode = st.sidebar.radio("Mode", ["Portfolio", "Watchlist"], horizontal=True)
+    if mode == "Watchlist":
+        render_watchlist()
+        st.sidebar.write(f"Last update: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
+        return
+    
     # Sidebar for inputs
     st.sidebar.header("Enter Stock Information")
     
@@ -47,36 +524,12 @@ def create_streamlit_app():
         st.session_state.stocks = default_stocks[:1]  # Start with just Apple
     
     if "results" not in st.session_state:
-        st.session_state.results = {}
+        # Survive browser refreshes: start from the stored results
+        st.session_state.results = load_saved_results()
     
     if "current_analysis" not in st.session_state:
         st.session_state.current_analysis = None
     
-    # Function to call the backend API
-    def call_stock_analysis_api(ticker, company_name):
-        """Call the backend API to analyze a stock"""
-        try:
-            # Get backend URL from environment variable or use localhost for development
-            api_url = os.getenv("BACKEND_API_URL", "http://localhost:8080")
-            
-            st.info(f"Calling API at {api_url} for stock analysis...")
-            
-            response = requests.post(
-                f"{api_url}/analyze",
-                json={"ticker": ticker, "company_name": company_name},
-                timeout=180  # Longer timeout since analysis takes time
-            )
-            
-            # Check if the request was successful
-            response.raise_for_status()
-            
-            # Return the JSON response
-            return response.json()
-            
-        except requests.exceptions.RequestException as e:
-            st.error(f"API Error: {str(e)}")
-            return {"error": str(e)}
-        
     # Function to add a stock
     def add_stock():
         st.session_state.stocks.append({"ticker": "", "company_name": ""})
@@ -87,7 +540,7 @@ def create_streamlit_app():
     
     # Function to analyze stocks
     def start_analysis():
-        st.session_state.current_analysis = 0
+        st.session_state.current_analysis = True
         st.session_state.results = {}
     
     # Display stock inputs
@@ -114,8 +567,13 @@ def create_streamlit_app():
                 st.rerun()
     
     # Add stock button
-    if len(st.session_state.stocks) < 10:
-        st.sidebar.button("Add Stock", on_click=add_stock)
+    st.sidebar.button("Add Stock", on_click=add_stock)
+    
+    # Clear saved results button
+    if st.session_state.results and st.sidebar.button("Clear Saved Results"):
+        clear_saved_results()
+        st.session_state.results = {}
+        st.rerun()
     
     # Analyze button
     if st.sidebar.button("Analyze Stocks"):
@@ -139,51 +597,32 @@ def create_streamlit_app():
             # Display progress
             st.header("Analysis Progress")
             
-            total_stocks = len(st.session_state.stocks)
-            current_index = st.session_state.current_analysis
+            stocks = st.session_state.stocks
+            st.write(f"Analyzing {len(stocks)} stocks, {min(len(stocks), MAX_CONCURRENT_ANALYSES)} at a time "
+                     f"via {API_URL}...")
+            progress_bar = st.progress(0.0)
             
-            if current_index < total_stocks:
-                # Still analyzing
-                progress = current_index / total_stocks
-                st.progress(progress)
-                
-                current_stock = st.session_state.stocks[current_index]
-                st.write(f"Analyzing {current_stock['ticker']} ({current_stock['company_name']})...")
-                
-                # Perform the analysis
-                ticker = current_stock["ticker"]
-                company_name = current_stock["company_name"]
-                
-                try:
-                    # Display the process steps
-                    process_status = st.empty()
-                    
-                    # Research step
-                    process_status.write("Step 1: Researching stock information...")
-                    
-                    # Start the analysis
-                    # result = analyze_stock(ticker, company_name)
-                    result = call_stock_analysis_api(ticker, company_name)
-                    
+            # One status line per ticker, updated as its result arrives
+            status_lines = {}
+            for stock in stocks:
+                status_lines[stock["ticker"]] = st.empty()
+                status_lines[stock["ticker"]].write(f"⏳ {stock['ticker']} ({stock['company_name']}): analyzing...")
+            
+            try:
+                for done, (stock, result, seconds) in enumerate(analyze_stocks_concurrently(stocks), start=1):
+                    ticker = stock["ticker"]
                     if "error" in result and result["error"]:
-                        st.error(f"Error analyzing {ticker}: {result['error']}")
+                        status_lines[ticker].error(f"{ticker}: {result['error']}")
                     else:
                         st.session_state.results[ticker] = result
-                        st.success(f"Analysis of {ticker} complete!")
-                    
-                    # Move to the next stock
-                    st.session_state.current_analysis += 1
-                    time.sleep(1)  # Give the user time to see the success message
-                    st.rerun()
-                    
-                except Exception as e:
-                    st.error(f"Error: {str(e)}")
-                    st.session_state.current_analysis = None
-            
-            else:
-                # All stocks analyzed
+                        save_result(ticker, result)
+                        status_lines[ticker].success(f"{ticker}: analysis complete in {seconds:.1f}s")
+                    progress_bar.progress(done / len(stocks))
+                
                 st.success("All stocks analyzed!")
-                st.session_state.current_analysis = None
+            except Exception as e:
+                st.error(f"Error: {str(e)}")
+            st.session_state.current_analysis = None
         
         else:
             st.info("Click 'Analyze Stocks' to start the analysis.")
@@ -197,89 +636,7 @@ def create_streamlit_app():
             
             for i, ticker in enumerate(st.session_state.results.keys()):
                 with stock_tabs[i]:
-                    result = st.session_state.results[ticker]
-                    recommendation = result["recommendation_results"]
-                    score = recommendation["score"]
-                    
-                    # Display score and recommendation
-                    col1, col2 = st.columns([1, 2])
-                    
-                    with col1:
-                        # Score card - using the get_value helper function
-                        overall_score = get_value(score, "overall_score", 0)
-                        investment_recommendation = get_value(score, "investment_recommendation", "N/A")
-                        confidence_level = get_value(score, "confidence_level", "N/A")
-                        
-                        st.subheader(f"{ticker} - {overall_score}/100")
-                        st.write(f"**Recommendation:** {investment_recommendation}")
-                        st.write(f"**Confidence:** {confidence_level}")
-                        
-                        # Radar chart for score components
-                        categories = ['Financial Health', 'Growth Potential', 
-                                      'Analyst Sentiment', 'Momentum', 'Risk Level']
-                        
-                        # Use the get_value helper function for all scores
-                        values = [
-                            get_value(score, "financial_health_score", 0),
-                            get_value(score, "growth_potential_score", 0),
-                            get_value(score, "analyst_sentiment_score", 0),
-                            get_value(score, "momentum_score", 0),
-                            get_value(score, "risk_score", 0)
-                        ]
-                        
-                        # Close the loop for the radar chart
-                        categories = categories + [categories[0]]
-                        values = values + [values[0]]
-                        
-                        fig = go.Figure()
-                        fig.add_trace(go.Scatterpolar(
-                            r=values,
-                            theta=categories,
-                            fill='toself',
-                            name=ticker
-                        ))
-                        
-                        fig.update_layout(
-                            polar=dict(
-                                radialaxis=dict(
-                                    visible=True,
-                                    range=[0, 10]
-                                )
-                            ),
-                            height=400,
-                            margin=dict(l=10, r=10, t=30, b=10)
-                        )
-                        
-                        st.plotly_chart(fig)
-                        
-                        # Display reasoning
-                        st.subheader("Score Reasoning")
-                        reasoning = get_value(score, "reasoning", {})
-                        
-                        # Handle reasoning depending on whether it's a dict or an object
-                        if isinstance(reasoning, dict):
-                            for category, reason in reasoning.items():
-                                st.write(f"**{category}:** {reason}")
-                        else:
-                            # Try accessing as attributes
-                            for category in ["financial_health_score", "growth_potential_score", 
-                                           "analyst_sentiment_score", "momentum_score", "risk_score", "overall_score"]:
-                                reason = get_value(reasoning, category, None)
-                                if reason:
-                                    st.write(f"**{category}:** {reason}")
-                    
-                    with col2:
-                        # Detailed recommendation
-                        st.subheader("Investment Recommendation")
-                        st.markdown(recommendation["recommendation"])
-                        
-                        # Show sources
-                        st.subheader("Information Sources")
-                        extraction_results = result["extraction_results"]
-                        for i, insight in enumerate(extraction_results.get("extracted_insights", [])):
-                            with st.expander(f"Source {i+1}: {insight.get('url', 'N/A')}"):
-                                st.write("**Summary:**")
-                                st.write(insight.get("summary", "No summary available"))
+                    render_stock_result(ticker, st.session_state.results[ticker])
         
         else:
             st.info("Analysis results will appear here after processing.")
@@ -289,96 +646,46 @@ def create_streamlit_app():
             st.header("Portfolio View")
             
             # Create a DataFrame with stock scores
-            scores_data = []
-            for ticker, result in st.session_state.results.items():
-                recommendation = result["recommendation_results"]
-                score = recommendation["score"]
-                
-                scores_data.append({
-                    "Ticker": ticker,
-                    "Company": result["recommendation_results"].get("company_name", "Unknown"),
-                    "Overall Score": get_value(score, "overall_score", 0),
-                    "Financial Health": get_value(score, "financial_health_score", 0),
-                    "Growth Potential": get_value(score, "growth_potential_score", 0),
-                    "Analyst Sentiment": get_value(score, "analyst_sentiment_score", 0),
-                    "Momentum": get_value(score, "momentum_score", 0),
-                    "Risk Level": get_value(score, "risk_score", 0),
-                    "Recommendation": get_value(score, "investment_recommendation", "N/A"),
-                    "Confidence": get_value(score, "confidence_level", "N/A")
-                })
-            
-            scores_df = pd.DataFrame(scores_data)
+            scores_df = build_scores_df(tuple(
+                score_summary(ticker, result) for ticker, result in st.session_state.results.items()
+            ))
             
             # Display scores table
             st.dataframe(scores_df.sort_values("Overall Score", ascending=False))
             
             # Create a horizontal bar chart of overall scores
-            bar_data = scores_df.sort_values("Overall Score")
-            
-            fig = go.Figure()
-            
-            # Add color based on recommendation
-            colors = bar_data["Recommendation"].map({
-                "Buy": "green",
-                "Hold": "orange",
-                "Sell": "red"
-            }).fillna("gray")
-            
-            fig.add_trace(go.Bar(
-                x=bar_data["Overall Score"],
-                y=bar_data["Ticker"],
-                orientation='h',
-                marker_color=colors,
-                text=bar_data["Overall Score"],
-                textposition='auto'
-            ))
-            
-            fig.update_layout(
-                title="Stock Rankings",
-                xaxis_title="Overall Score",
-                yaxis_title="Stock",
-                height=400
-            )
-            
-            st.plotly_chart(fig, use_container_width=True)
+            st.plotly_chart(build_rankings_figure(scores_df), use_container_width=True)
             
             # Portfolio allocation suggestion
             st.subheader("Portfolio Allocation Suggestion")
             
-            # Simple allocation strategy based on scores
-            scores = scores_df[["Ticker", "Overall Score"]].copy()
-            scores["Normalized"] = scores["Overall Score"] / scores["Overall Score"].sum()
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                method_label = st.selectbox("Allocation method", list(ALLOCATION_METHODS))
+            with col2:
+                max_weight = st.slider("Maximum position", min_value=0.05, max_value=1.0, value=0.25, step=0.05)
+            with col3:
+                include_hold = st.checkbox("Include Hold recommendations")
             
-            # Only allocate to stocks with positive recommendations
-            buy_stocks = scores_df[scores_df["Recommendation"] == "Buy"]
+            allocation_inputs = tuple(
+                {"ticker": row["Ticker"], "overall_score": row["Overall Score"], "risk_score": row["Risk Level"],
+                 "investment_recommendation": row["Recommendation"]}
+                for row in scores_df.to_dict("records")
+            )
+            allocation = fetch_allocation(allocation_inputs, ALLOCATION_METHODS[method_label], max_weight, include_hold)
             
-            if len(buy_stocks) > 0:
-                buy_tickers = buy_stocks["Ticker"].tolist()
-                scores["Allocation"] = scores.apply(
-                    lambda x: x["Normalized"] / sum(scores[scores["Ticker"].isin(buy_tickers)]["Normalized"]) * 100 
-                    if x["Ticker"] in buy_tickers else 0,
-                    axis=1
-                )
-                
-                # Create pie chart
-                fig = go.Figure(data=[go.Pie(
-                    labels=scores["Ticker"],
-                    values=scores["Allocation"],
-                    hole=.3,
-                    textinfo='label+percent'
-                )])
-                
-                fig.update_layout(title="Recommended Portfolio Allocation")
+            if allocation.get("error"):
+                st.error(f"Error computing the allocation: {allocation['error']}")
+            elif allocation["cash_weight"] >= 1.0:
+                st.warning("No 'Buy' recommendations found for portfolio allocation.")
+            else:
+                table, fig = build_allocation_figure(allocation)
                 st.plotly_chart(fig)
+                st.caption(f"Expected return {allocation['expected_return']:.1%}, volatility "
+                           f"{allocation['volatility']:.1%} (estimated from the scores)")
                 
                 # Display allocation table
-                allocation_df = scores[["Ticker", "Allocation"]].copy()
-                allocation_df["Allocation"] = allocation_df["Allocation"].round(2).astype(str) + "%"
-                allocation_df = allocation_df.sort_values("Allocation", ascending=False)
-                
-                st.table(allocation_df.set_index("Ticker"))
-            else:
-                st.warning("No 'Buy' recommendations found for portfolio allocation.")
+                st.table(table)
         
         else:
             st.info("Portfolio view will appear here after analysis.")
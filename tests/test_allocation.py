@@ -0,0 +1,83 @@
+# tests/test_allocation.py
+import unittest
+import numpy as np
+from agents.allocation import PortfolioAllocator, cap_weights
+
+def stock(ticker, overall, risk, recommendation="Buy"):
+    return {"ticker": ticker, "overall_score": overall, "risk_score": risk, "investment_recommendation": recommendation}
+
+STOCKS = [stock("AAPL", 80, 9), stock("TSLA", 70, 2), stock("MSFT", 60, 6), stock("INTC", 30, 4, "Sell"),
+          stock("IBM", 55, 8, "Hold")]
+
+def weights(allocation):
+    return {row["ticker"]: row["weight"] for row in allocation["allocations"]}
+
+class TestCapWeights(unittest.TestCase):
+    def test_excess_is_redistributed(self):
+        np.testing.assert_allclose(cap_weights([5, 1, 1, 1], 0.4), [0.4, 0.2, 0.2, 0.2])
+        np.testing.assert_allclose(cap_weights([3, 2, 1], 1.0), [0.5, 1 / 3, 1 / 6])
+
+    def test_infeasible_cap_leaves_cash(self):
+        np.testing.assert_allclose(cap_weights([1, 2, 0], 0.25), [0.25, 0.25, 0.0])
+
+class TestPortfolioAllocator(unittest.TestCase):
+    def test_score_weighted_matches_buy_scores(self):
+        allocation = PortfolioAllocator(max_weight=1.0).allocate(STOCKS, "score")
+        self.assertAlmostEqual(weights(allocation)["AAPL"], 80 / 210, places=5)
+        self.assertEqual(weights(allocation)["INTC"], 0.0)
+        self.assertEqual(weights(allocation)["IBM"], 0.0)
+        self.assertEqual(allocation["cash_weight"], 0.0)
+
+    def test_include_hold(self):
+        allocation = PortfolioAllocator(max_weight=1.0).allocate(STOCKS, "score", include_hold=True)
+        self.assertGreater(weights(allocation)["IBM"], 0.0)
+
+    def test_inverse_risk_favors_low_risk(self):
+        w = weights(PortfolioAllocator(max_weight=1.0).allocate(STOCKS, "inverse_risk"))
+        self.assertGreater(w["AAPL"], w["MSFT"])
+        self.assertGreater(w["MSFT"], w["TSLA"])
+
+    def test_risk_parity_equalizes_risk_contributions(self):
+        allocation = PortfolioAllocator(max_weight=1.0).allocate(STOCKS, "risk_parity")
+        contributions = [row["risk_contribution"] for row in allocation["allocations"] if row["weight"] > 0]
+        np.testing.assert_allclose(contributions, [1 / 3] * 3, atol=1e-5)
+
+    def test_mean_variance_respects_caps_and_beats_alternatives(self):
+        allocator = PortfolioAllocator(max_weight=0.5)
+        allocation = allocator.allocate(STOCKS, "mean_variance")
+        w = np.array([row["weight"] for row in allocation["allocations"]])
+        self.assertAlmostEqual(w.sum(), 1.0, places=4)
+        self.assertLessEqual(w.max(), 0.5 + 1e-9)
+
+        def utility(result):
+            return result["expected_return"] - allocator.risk_aversion / 2 * result["volatility"] ** 2
+        for method in ("score", "inverse_risk", "risk_parity"):
+            self.assertGreaterEqual(utility(allocation) + 1e-9, utility(allocator.allocate(STOCKS, method)))
+
+    def test_mean_variance_holds_cash_instead_of_losing_stocks(self):
+        allocator = PortfolioAllocator(max_weight=0.5)
+        all_losing = allocator.allocate([stock(f"T{i}", 20, 5) for i in range(6)], "mean_variance")
+        self.assertEqual(all_losing["cash_weight"], 1.0)
+        self.assertEqual(all_losing["expected_return"], 0.0)
+
+        mixed = allocator.allocate([stock("WIN", 80, 8), stock("LOSE", 20, 8)], "mean_variance")
+        self.assertEqual(weights(mixed), {"WIN": 0.5, "LOSE": 0.0})
+        self.assertEqual(mixed["cash_weight"], 0.5)
+        self.assertGreater(mixed["expected_return"], 0.0)
+
+    def test_hundreds_of_tickers(self):
+        rng = np.random.default_rng(0)
+        stocks = [stock(f"T{i}", int(rng.integers(30, 95)), int(rng.integers(1, 11))) for i in range(500)]
+        allocator = PortfolioAllocator(max_weight=0.02)
+        for method in ("score", "inverse_risk", "risk_parity", "mean_variance"):
+            allocation = allocator.allocate(stocks, method)
+            w = np.array([row["weight"] for row in allocation["allocations"]])
+            self.assertAlmostEqual(w.sum(), 1.0, places=3)
+            self.assertLessEqual(w.max(), 0.02 + 1e-9)
+
+    def test_rejects_unknown_method(self):
+        with self.assertRaises(ValueError):
+            PortfolioAllocator().allocate(STOCKS, "kelly")
+
+if __name__ == "__main__":
+    unittest.main()
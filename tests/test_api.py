@@ -0,0 +1,86 @@
+# tests/test_api.py
+import json
+import os
+import unittest
+from fastapi.testclient import TestClient
+
+# The agents build their OpenAI and Tavily clients on import; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+import config
+
+# Config may have been loaded by an earlier test module, before the keys were set
+config.OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
+config.TAVILY_API_KEY = os.environ["TAVILY_API_KEY"]
+
+import api
+from graph import workflow
+
+class FakeAgents:
+    """Stand-ins for the workflow's agents, streaming a two-chunk recommendation."""
+
+    mode = "fast"
+
+    def __init__(self, fail_scoring=False):
+        self.fail_scoring = fail_scoring
+
+    def research(self, ticker, company_name, use_cache=True):
+        return {"ticker": ticker, "search_results": []}
+
+    def filter(self, research_results, ticker, company_name):
+        return {"ticker": ticker, "company_name": company_name,
+                "filtered_articles": [{"url": "https://a.com"}, {"url": "https://b.com"}]}
+
+    def process(self, filtered_results):
+        return {"ticker": filtered_results["ticker"], "company_name": filtered_results["company_name"],
+                "extracted_insights": []}
+
+    def score(self, consolidation_results, mode=None):
+        if self.fail_scoring:
+            raise RuntimeError("scoring service unavailable")
+        return {"ticker": consolidation_results["ticker"], "company_name": consolidation_results["company_name"],
+                "score": {"overall_score": 60}}
+
+    def stream_recommendation(self, scoring_results, config=None):
+        yield "Hold "
+        yield "for now."
+        yield {"ticker": scoring_results["ticker"], "recommendation": "Hold for now."}
+
+class TestAnalyzeStream(unittest.TestCase):
+    AGENTS = ("research_agent", "filtering_system", "extraction_agent", "scoring_mechanism", "recommendation_agent")
+
+    def setUp(self):
+        self.saved = {name: getattr(workflow, name) for name in (*self.AGENTS, "result_store")}
+        workflow.result_store = None
+        self.client = TestClient(api.app)
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(workflow, name, value)
+
+    def stream(self, agents):
+        for name in self.AGENTS:
+            setattr(workflow, name, agents)
+        response = self.client.post("/analyze/stream", json={"ticker": "AAPL", "company_name": "Apple Inc."})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers["content-type"], "application/x-ndjson")
+        return [json.loads(line) for line in response.text.splitlines()]
+
+    def test_events_arrive_in_order(self):
+        events = self.stream(FakeAgents())
+
+        self.assertEqual([event["event"] for event in events], ["analysis", "token", "token", "recommendation", "usage"])
+        self.assertEqual(events[0]["data"]["scoring_results"]["score"], {"overall_score": 60})
+        self.assertEqual("".join(event["data"] for event in events[1:3]), "Hold for now.")
+        self.assertEqual(events[3]["data"]["recommendation"], "Hold for now.")
+        self.assertIn("trace_id", events[4]["data"])
+
+    def test_failed_analysis_streams_error_then_usage(self):
+        events = self.stream(FakeAgents(fail_scoring=True))
+
+        self.assertEqual([event["event"] for event in events], ["error", "usage"])
+        self.assertIn("scoring service unavailable", events[0]["data"])
+
+if __name__ == "__main__":
+    unittest.main()
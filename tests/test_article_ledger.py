@@ -0,0 +1,48 @@
+# tests/test_article_ledger.py
+import os
+import tempfile
+import unittest
+from agents.article_ledger import ArticleLedger
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestArticleLedger(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.ledger = ArticleLedger(os.path.join(self.tmpdir.name, "ledger.sqlite3"), clock=self.clock)
+        self.hash = ArticleLedger.content_hash("Apple beats estimates")
+        self.ledger.record_verdict("aapl", "https://a.com", self.hash, True, "Earnings")
+        self.ledger.record_extraction("AAPL", "https://a.com", self.hash, {"url": "https://a.com", "summary": "s"})
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_verdict_and_extraction_round_trip(self):
+        entry = self.ledger.lookup("AAPL", "https://a.com")
+        self.assertTrue(entry["relevant"])
+        self.assertEqual(entry["content_hash"], ArticleLedger.content_hash("Apple  beats\nestimates"))
+        self.assertEqual(entry["extraction"]["summary"], "s")
+        self.assertIsNone(self.ledger.lookup("MSFT", "https://a.com"))
+
+    def test_changed_content_clears_extraction(self):
+        new_hash = ArticleLedger.content_hash("Apple misses estimates")
+        self.ledger.record_verdict("AAPL", "https://a.com", new_hash, True, "Earnings")
+        self.ledger.record_extraction("AAPL", "https://a.com", self.hash, {"stale": True})
+        self.assertIsNone(self.ledger.lookup("AAPL", "https://a.com")["extraction"])
+
+    def test_recent_extractions_respect_lookback_and_exclusions(self):
+        self.assertEqual(len(self.ledger.recent_extractions("AAPL", 3600)), 1)
+        self.assertEqual(self.ledger.recent_extractions("AAPL", 3600, exclude_urls=["https://a.com"]), [])
+        self.clock.now += 7200
+        self.assertEqual(self.ledger.recent_extractions("AAPL", 3600), [])
+        self.ledger.mark_seen("AAPL", "https://a.com")
+        self.assertEqual(len(self.ledger.recent_extractions("AAPL", 3600)), 1)
+
+if __name__ == "__main__":
+    unittest.main()
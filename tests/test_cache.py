@@ -0,0 +1,151 @@
+# tests/test_cache.py
+import os
+import tempfile
+import unittest
+from utils.cache import TieredCache, RedisTier, InMemoryRedis
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestTieredCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmpdir.name, "cache.sqlite3")
+        self.clock = FakeClock()
+        self.cache = TieredCache(path=self.path, memory_max_bytes=100,
+                                 namespace_ttls={"short": 60}, clock=self.clock)
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_namespace_ttl_expires_entries(self):
+        self.cache.set("short", "k", {"v": 1})
+        self.cache.set("long", "k", {"v": 2})
+        self.clock.now += 61
+        self.assertEqual(self.cache.get("short", "k"), (False, None))
+        self.assertEqual(self.cache.get("long", "k"), (True, {"v": 2}))
+
+    def test_lru_evicts_by_size_and_shared_tier_refills(self):
+        for i in range(10):
+            self.cache.set("ns", f"k{i}", "x" * 20)
+        stats = self.cache.get_stats()
+        self.assertLessEqual(stats["memory_bytes"], 100)
+        self.assertGreater(stats["evictions"], 0)
+
+        self.assertEqual(self.cache.get("ns", "k0"), (True, "x" * 20))
+        self.assertEqual(self.cache.get_stats()["shared_hits"], 1)
+        self.assertEqual(self.cache.get("ns", "k0"), (True, "x" * 20))
+        self.assertEqual(self.cache.get_stats()["memory_hits"], 1)
+
+    def test_entries_survive_restart(self):
+        self.cache.set("ns", "k", [1, 2, 3])
+        reopened = TieredCache(path=self.path, clock=self.clock)
+        self.assertEqual(reopened.get("ns", "k"), (True, [1, 2, 3]))
+
+    def test_get_or_compute_computes_once(self):
+        calls = []
+        compute = lambda: calls.append(1) or {"value": len(calls)}
+        self.assertEqual(self.cache.get_or_compute("ns", "k", compute), {"value": 1})
+        self.assertEqual(self.cache.get_or_compute("ns", "k", compute), {"value": 1})
+        self.assertEqual(len(calls), 1)
+
+    def test_add_only_stores_absent_keys(self):
+        self.assertTrue(self.cache.add("short", "lock", "a"))
+        self.assertFalse(TieredCache(path=self.path, clock=self.clock).add("short", "lock", "b"))
+        self.clock.now += 61
+        self.assertTrue(self.cache.add("short", "lock", "c"))
+
+    def test_scores_add_up_and_prune(self):
+        self.cache.incr_score("short", "demand", "AAPL", 2.0)
+        replica = TieredCache(path=self.path, namespace_ttls={"short": 60}, clock=self.clock)
+        self.assertEqual(replica.incr_score("short", "demand", "AAPL"), 3.0)
+        self.cache.incr_score("short", "demand", "MSFT", 0.5)
+        self.assertEqual(self.cache.remove_scores_below("short", "demand", 1.0), 1)
+        self.assertEqual(self.cache.scores("short", "demand"), {"AAPL": 3.0})
+        self.clock.now += 61
+        self.assertEqual(self.cache.scores("short", "demand"), {})
+        self.assertEqual(self.cache.incr_score("short", "demand", "AAPL"), 1.0)
+
+    def test_max_age_rejects_old_entries(self):
+        self.cache.set("ns", "k", 1)
+        self.clock.now += 120
+        self.assertEqual(self.cache.get("ns", "k", max_age=60), (False, None))
+        self.assertEqual(self.cache.get("ns", "k"), (True, 1))
+
+class TestRedisTier(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.server = InMemoryRedis(clock=self.clock)
+        self.replicas = [
+            TieredCache(shared=RedisTier(self.server, prefix="app:"), namespace_ttls={"short": 60},
+                        compress_min_bytes=100, clock=self.clock)
+            for _ in range(2)
+        ]
+
+    def test_entries_are_shared_across_replicas(self):
+        self.replicas[0].set("short", "k", {"v": 1})
+        self.assertEqual(self.replicas[1].get("short", "k"), (True, {"v": 1}))
+        self.assertEqual(self.replicas[1].get_stats()["shared_hits"], 1)
+
+        self.clock.now += 61
+        self.assertEqual(self.replicas[1].get("short", "k"), (False, None))
+
+    def test_large_values_are_compressed(self):
+        value = "quarterly results " * 100
+        self.replicas[0].set("articles", "url", value)
+        stored = self.server.get("app:articles:url")
+        self.assertLess(len(stored), len(value) // 4)
+        self.assertEqual(self.replicas[1].get("articles", "url"), (True, value))
+
+    def test_add_is_exclusive_across_replicas(self):
+        self.assertTrue(self.replicas[0].add("short", "lock", 1))
+        self.assertFalse(self.replicas[1].add("short", "lock", 2))
+        self.assertEqual(self.replicas[1].get("short", "lock"), (True, 1))
+
+    def test_scores_are_shared_across_replicas(self):
+        self.replicas[0].incr_score("short", "demand", "AAPL", 2.0)
+        self.assertEqual(self.replicas[1].incr_score("short", "demand", "AAPL", -0.5), 1.5)
+        self.replicas[1].incr_score("short", "demand", "MSFT", 0.1)
+        self.assertEqual(self.replicas[0].remove_scores_below("short", "demand", 1.0), 1)
+        self.assertEqual(self.replicas[0].scores("short", "demand"), {"AAPL": 1.5})
+        self.clock.now += 61
+        self.assertEqual(self.replicas[1].scores("short", "demand"), {})
+
+    def test_memory_copies_pick_up_other_replicas_writes(self):
+        self.replicas[0].set("long", "k", 1)
+        self.assertEqual(self.replicas[1].get("long", "k"), (True, 1))
+        self.replicas[0].set("long", "k", 2)
+        self.assertEqual(self.replicas[1].get("long", "k"), (True, 1))
+        self.clock.now += self.replicas[1].memory_ttl + 1
+        self.assertEqual(self.replicas[1].get("long", "k"), (True, 2))
+
+    def test_add_fails_closed_when_the_shared_tier_is_down(self):
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        self.server.set = fail
+        self.assertFalse(self.replicas[0].add("short", "lock", 1))
+        self.assertEqual(self.replicas[0].get_stats()["errors"], 1)
+
+    def test_delete_and_clear_survive_a_shared_tier_outage(self):
+        self.replicas[0].set("short", "k", 1)
+        def fail(*args, **kwargs):
+            raise ConnectionError("redis is down")
+        self.server.delete = self.server.scan_iter = fail
+
+        self.replicas[0].delete("short", "k")
+        self.replicas[0].clear()
+        self.assertEqual(self.replicas[0].get_stats()["errors"], 2)
+        self.assertEqual(self.replicas[0].memory.size, 0)
+
+    def test_clear_removes_only_one_namespace(self):
+        self.replicas[0].set("a", "k", 1)
+        self.replicas[0].set("b", "k", 2)
+        self.replicas[0].clear("a")
+        self.assertEqual(sorted(self.server.scan_iter("app:*")), ["app:b:k"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+# tests/test_consolidation.py
+import unittest
+from agents.consolidation import InsightConsolidator
+
+class TestInsightConsolidator(unittest.TestCase):
+    def setUp(self):
+        def article(url, eps, target, severity):
+            return {
+                "url": url,
+                "summary": f"Summary from {url}",
+                "structured_insights": {
+                    "financial_metrics": [{"metric_name": "Quarterly EPS", "value": eps, "sentiment": "positive"}],
+                    "analyst_opinions": [{"analyst_or_firm": "Morgan Stanley", "rating": "Overweight", "target_price": target}],
+                    "business_developments": [{"event_type": "Product", "description": "Launched the new iPhone lineup in September"}],
+                    "market_sentiment": {"overall_sentiment": "bullish"},
+                    "risk_factors": [{"risk_type": "Regulatory", "description": f"EU probe ({url})", "severity": severity}]
+                }
+            }
+
+        self.extraction_results = {
+            "ticker": "AAPL",
+            "company_name": "Apple Inc.",
+            "extracted_insights": [
+                article("https://a.com", "$1.40", "$250", "low"),
+                article("https://b.com", "$1.40", "$250", "high"),
+                article("https://c.com", "$1.45", "$260", "medium")
+            ]
+        }
+        self.consolidated = InsightConsolidator().consolidate(self.extraction_results)["consolidated_insights"]
+
+    def test_duplicate_metrics_are_merged_with_most_cited_value(self):
+        metrics = self.consolidated["financial_metrics"]
+        self.assertEqual(len(metrics), 1)
+        self.assertEqual(metrics[0]["value"], "$1.40")
+        self.assertEqual(metrics[0]["mentions"], 3)
+        self.assertEqual(metrics[0]["sources"], ["https://a.com", "https://b.com", "https://c.com"])
+
+    def test_analyst_opinions_merge_by_firm(self):
+        opinions = self.consolidated["analyst_opinions"]
+        self.assertEqual(len(opinions), 1)
+        self.assertEqual(opinions[0]["target_price"], "$250")
+
+    def test_merged_opinion_comes_from_one_report(self):
+        opinion = lambda rating, target: {"analyst_or_firm": "Goldman Sachs", "rating": rating, "target_price": target}
+        extraction_results = {
+            "ticker": "AAPL",
+            "company_name": "Apple Inc.",
+            "extracted_insights": [
+                {"url": url, "summary": "", "structured_insights": {"analyst_opinions": [item]}}
+                for url, item in (("https://a.com", opinion("Hold", "$200")),
+                                  ("https://b.com", opinion("Buy", "")),
+                                  ("https://c.com", opinion("Buy", "")))
+            ]
+        }
+        opinions = InsightConsolidator().consolidate(extraction_results)["consolidated_insights"]["analyst_opinions"]
+        self.assertEqual(len(opinions), 1)
+        self.assertEqual((opinions[0]["rating"], opinions[0]["target_price"]), ("Buy", ""))
+        self.assertEqual(opinions[0]["mentions"], 3)
+
+    def test_developments_and_sentiment(self):
+        self.assertEqual(len(self.consolidated["business_developments"]), 1)
+        self.assertEqual(self.consolidated["market_sentiment"]["counts"], {"bullish": 3})
+
+    def test_risks_keep_highest_severity(self):
+        risks = self.consolidated["risk_factors"]
+        self.assertEqual(len(risks), 1)
+        self.assertEqual(risks[0]["severity"], "high")
+        self.assertEqual(risks[0]["description"], "EU probe (https://b.com)")
+        self.assertEqual(risks[0]["mentions"], 3)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_extraction.py
+import asyncio
+import itertools
+import json
+import os
+import unittest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# The agent builds its OpenAI client on init; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from agents.extraction import ExtractionAgent
+
+ARTICLE = {"url": "https://example.com/aapl", "content": "Apple beat estimates as iPhone revenue grew 8%."}
+
+def function_call(arguments):
+    """Chat model reply calling extract_stock_insights with the given arguments."""
+    message = AIMessage(content="", additional_kwargs={"function_call": {
+        "name": "extract_stock_insights", "arguments": json.dumps(arguments)
+    }})
+    return GenericFakeChatModel(messages=itertools.cycle([message]))
+
+class TestExtractionCacheKey(unittest.TestCase):
+    def test_key_depends_on_company_name(self):
+        agent = ExtractionAgent(use_cache=True)
+        content = "Shares rose after the quarterly report."
+        self.assertEqual(agent._cache_key(content, "META", "Meta Platforms"),
+                         agent._cache_key(content, "META", "Meta Platforms"))
+        self.assertNotEqual(agent._cache_key(content, "META", "Meta Platforms"),
+                            agent._cache_key(content, "META", "Meta Materials"))
+
+class TestSingleCallExtraction(unittest.TestCase):
+    def test_summary_comes_from_the_extraction_call(self):
+        agent = ExtractionAgent(single_call=True, use_cache=False)
+        calls = []
+        llm = function_call({
+            "summary": "Apple beat estimates.",
+            "financial_metrics": [{"metric_name": "iPhone revenue", "value": "+8%", "sentiment": "positive"}]
+        })
+        agent.combined_chain = RunnableLambda(lambda inputs: calls.append(inputs) or "prompt") | llm | agent.parser
+        agent.summary_chain = RunnableLambda(lambda inputs: self.fail("single-call extraction made a summary call"))
+
+        insights = agent.extract(ARTICLE, "AAPL", "Apple Inc.")
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(insights["summary"], "Apple beat estimates.")
+        self.assertNotIn("summary", insights["structured_insights"])
+        self.assertEqual(insights["structured_insights"]["financial_metrics"][0]["value"], "+8%")
+
+class TestBatchExtraction(unittest.TestCase):
+    def setUp(self):
+        self.agent = ExtractionAgent(use_cache=False)
+
+        def extract(article, ticker, company_name):
+            if "broken" in article["url"]:
+                raise ValueError("malformed article")
+            return {"url": article["url"], "structured_insights": {}, "summary": f"Summary of {article['url']}"}
+
+        self.agent.extract = extract
+        self.filtered_results = {
+            "ticker": "AAPL",
+            "company_name": "Apple Inc.",
+            "filtered_articles": [{"url": url, "content": "text"}
+                                  for url in ("https://a.com", "https://broken.com", "https://c.com")]
+        }
+
+    def check_results(self, results):
+        self.assertEqual([i["url"] for i in results["extracted_insights"]], ["https://a.com", "https://c.com"])
+        self.assertEqual(len(results["errors"]), 1)
+        self.assertIn("https://broken.com", results["errors"][0])
+
+    def test_one_failure_does_not_sink_the_batch(self):
+        self.check_results(self.agent.process(self.filtered_results))
+
+    def test_one_failure_does_not_sink_the_async_batch(self):
+        self.check_results(asyncio.run(self.agent.aprocess(self.filtered_results)))
+
+if __name__ == "__main__":
+    unittest.main()
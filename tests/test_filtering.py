@@ -0,0 +1,66 @@
+# tests/test_filtering.py
+import os
+import tempfile
+import unittest
+
+# The agent builds its OpenAI client on init; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from agents.article_ledger import ArticleLedger
+from agents.filtering import FilteringSystem
+from config import MAX_FILTERED_ARTICLES, LEDGER_MAX_ARTICLES
+
+class TestParseVerdict(unittest.TestCase):
+    def test_not_relevant_is_not_relevant(self):
+        self.assertEqual(FilteringSystem.parse_verdict("NOT_RELEVANT - The article is about a lawsuit."),
+                         (False, "The article is about a lawsuit."))
+        self.assertFalse(FilteringSystem.parse_verdict("**Not relevant**: no financial details.")[0])
+
+    def test_relevant_verdicts(self):
+        self.assertEqual(FilteringSystem.parse_verdict('"RELEVANT". Covers Q2 earnings.'),
+                         (True, "Covers Q2 earnings."))
+        self.assertTrue(FilteringSystem.parse_verdict("relevant: analyst raised the target")[0])
+
+    def test_unparseable_reply_is_not_relevant(self):
+        self.assertFalse(FilteringSystem.parse_verdict("This is IRRELEVANT to investors.")[0])
+
+class TestFilterCaps(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.ledger = ArticleLedger(os.path.join(self.tmpdir.name, "ledger.sqlite3"))
+        self.contents = {}
+        for i in range(LEDGER_MAX_ARTICLES + 4):
+            self.add_article(f"https://reused.com/{i}", "Earnings beat", seen=True)
+        for i in range(2):
+            self.add_article(f"https://changed.com/{i}", "Guidance raised", seen=True)
+            self.contents[f"https://changed.com/{i}"] = "Guidance cut"
+        for i in range(MAX_FILTERED_ARTICLES + 2):
+            self.add_article(f"https://new.com/{i}", "Buyback announced", seen=False)
+
+        self.filtering = FilteringSystem(ledger=self.ledger)
+        self.filtering.fetch_article_content = lambda url: (self.contents[url], None)
+        self.checked = []
+        self.filtering.check_relevance = lambda content, ticker, name: self.checked.append(content) or (True, "ok")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def add_article(self, url, content, seen):
+        self.contents[url] = content
+        if seen:
+            self.ledger.record_verdict("AAPL", url, ArticleLedger.content_hash(content), True, "Earnings")
+
+    def test_reused_and_changed_articles_count_against_the_caps(self):
+        urls = [url for url in self.contents if "changed" in url] + \
+               [url for url in self.contents if "new" in url] + \
+               [url for url in self.contents if "reused" in url]
+        results = self.filtering.filter({"search_results": [{"url": url} for url in urls]}, "AAPL", "Apple Inc.")
+
+        # Changed articles use up new-article slots, and only that many relevance calls are made
+        self.assertEqual(len(self.checked), MAX_FILTERED_ARTICLES)
+        self.assertEqual(results["new_articles"], MAX_FILTERED_ARTICLES)
+        self.assertEqual(len(results["filtered_articles"]), LEDGER_MAX_ARTICLES)
+        self.assertEqual(results["reused_articles"], LEDGER_MAX_ARTICLES - MAX_FILTERED_ARTICLES)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,64 @@
+# tests/test_frontend.py
+import io
+import os
+import sys
+import tempfile
+import unittest
+
+# The frontend is a Streamlit script rather than a package
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "frontend"))
+import app
+
+RESULT = {
+    "ticker": "AAPL",
+    "recommendation_results": {
+        "company_name": "Apple Inc.",
+        "score": {"overall_score": 72, "financial_health_score": 8, "growth_potential_score": 7,
+                  "analyst_sentiment_score": 8, "momentum_score": 6, "risk_score": 5,
+                  "investment_recommendation": "Buy", "confidence_level": "High"}
+    }
+}
+
+class TestResultsStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.saved_path = app.RESULTS_DB_PATH
+        app.RESULTS_DB_PATH = os.path.join(self.tmpdir.name, "results.sqlite3")
+
+    def tearDown(self):
+        app.RESULTS_DB_PATH = self.saved_path
+        self.tmpdir.cleanup()
+
+    def test_saved_results_load_back(self):
+        app.save_result("AAPL", RESULT)
+        app.save_result("AAPL", {**RESULT, "ticker": "AAPL", "rerun": True})  # Same day: replaces the first
+        app.save_result("MSFT", {"ticker": "MSFT"})
+
+        self.assertEqual(app.load_saved_results(), {"AAPL": {**RESULT, "rerun": True}, "MSFT": {"ticker": "MSFT"}})
+        app.clear_saved_results()
+        self.assertEqual(app.load_saved_results(), {})
+
+class TestScoreSummary(unittest.TestCase):
+    def test_flattens_scores(self):
+        row = app.score_summary("AAPL", RESULT)
+        self.assertEqual(row["Company"], "Apple Inc.")
+        self.assertEqual((row["Overall Score"], row["Risk Level"], row["Recommendation"]), (72, 5, "Buy"))
+
+    def test_missing_fields_get_defaults(self):
+        row = app.score_summary("X", {"recommendation_results": {"score": {}}})
+        self.assertEqual((row["Company"], row["Overall Score"], row["Confidence"]), ("Unknown", 0, "N/A"))
+
+class TestParseWatchlistCsv(unittest.TestCase):
+    def test_reads_tickers_and_names(self):
+        csv = io.StringIO("Symbol,Company\n aapl ,Apple Inc.\nMSFT,\nAAPL,Duplicate\n,Blank\n")
+        self.assertEqual(app.parse_watchlist_csv(csv), [
+            {"ticker": "AAPL", "company_name": "Apple Inc."},
+            {"ticker": "MSFT", "company_name": "MSFT"}
+        ])
+
+    def test_requires_a_ticker_column(self):
+        with self.assertRaises(ValueError):
+            app.parse_watchlist_csv(io.StringIO("name\nApple\n"))
+
+if __name__ == "__main__":
+    unittest.main()
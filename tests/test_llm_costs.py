@@ -0,0 +1,73 @@
+# tests/test_llm_costs.py
+import itertools
+import unittest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from utils.llm_costs import (RequestCostTracker, TokenBudgetExceeded, estimate_cost,
+                             find_cost_tracker, price_for)
+
+PRICING = {"gpt-4o-mini": (0.15, 0.60), "gpt-4o": (2.50, 10.00)}
+
+def fake_llm(input_tokens=100, output_tokens=20):
+    reply = AIMessage(content="ok", usage_metadata={
+        "input_tokens": input_tokens, "output_tokens": output_tokens,
+        "total_tokens": input_tokens + output_tokens
+    })
+    return GenericFakeChatModel(messages=itertools.cycle([reply]))
+
+class TestPricing(unittest.TestCase):
+    def test_dated_model_uses_longest_prefix(self):
+        self.assertEqual(price_for("gpt-4o-mini-2024-07-18", PRICING), (0.15, 0.60))
+        self.assertEqual(price_for("gpt-4o-2024-08-06", PRICING), (2.50, 10.00))
+        self.assertIsNone(price_for("claude", PRICING))
+
+    def test_estimate_cost(self):
+        self.assertAlmostEqual(estimate_cost("gpt-4o-mini", 1_000_000, 100_000, PRICING), 0.21)
+        self.assertEqual(estimate_cost("unknown", 1000, 1000, PRICING), 0.0)
+
+class TestRequestCostTracker(unittest.TestCase):
+    def test_attributes_usage_to_nodes(self):
+        tracker = RequestCostTracker("aapl", pricing=PRICING)
+        llm = fake_llm()
+        llm.invoke("hello", {"callbacks": [tracker], "metadata": {"langgraph_node": "filter"}})
+        # Nested calls inherit the callbacks and node metadata of the enclosing run
+        RunnableLambda(lambda _: llm.invoke("hi")).batch(
+            [1, 2], {"callbacks": [tracker], "metadata": {"langgraph_node": "extract"}}
+        )
+
+        usage = tracker.summary()
+        self.assertEqual(usage["ticker"], "AAPL")
+        self.assertEqual(usage["llm_calls"], 3)
+        self.assertEqual(usage["total_tokens"], 360)
+        self.assertEqual(usage["by_node"]["filter"]["calls"], 1)
+        self.assertEqual(usage["by_node"]["extract"]["prompt_tokens"], 200)
+        self.assertAlmostEqual(usage["cost_usd"], (300 * 0.15 + 60 * 0.60) / 1_000_000)
+
+    def test_budget_stops_calls(self):
+        tracker = RequestCostTracker("AAPL", token_budget=250, pricing=PRICING)
+        llm = fake_llm()
+        config = {"callbacks": [tracker]}
+        llm.invoke("first", config)
+        llm.invoke("second", config)
+        self.assertEqual(tracker.remaining_tokens(), 10)
+        with self.assertRaises(TokenBudgetExceeded):
+            llm.invoke("a prompt longer than the ten tokens left in the budget", config)
+        usage = tracker.summary()
+        self.assertTrue(usage["budget_exceeded"])
+        self.assertEqual(usage["llm_calls"], 2)
+
+    def test_no_budget(self):
+        tracker = RequestCostTracker()
+        self.assertEqual(tracker.remaining_tokens(), float("inf"))
+        tracker.note_degradation("recommend", "skipped")
+        self.assertEqual(tracker.summary()["degraded_stages"], {"recommend": "skipped"})
+
+    def test_find_cost_tracker(self):
+        tracker = RequestCostTracker()
+        found = RunnableLambda(lambda _, config: find_cost_tracker(config)).invoke(1, {"callbacks": [tracker]})
+        self.assertIs(found, tracker)
+        self.assertIsNone(find_cost_tracker({}))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,134 @@
+# tests/test_metrics_tracker.py
+import random
+import threading
+import unittest
+from utils.metrics_tracker import (QuantileSketch, SpaceSavingCounter, DistinctCounter,
+                                   ResearchMetricsTracker)
+
+class TestQuantileSketch(unittest.TestCase):
+    def test_quantiles_within_relative_accuracy(self):
+        sketch = QuantileSketch(relative_accuracy=0.01)
+        rng = random.Random(7)
+        values = [rng.lognormvariate(1, 1) for _ in range(20000)]
+        for value in values:
+            sketch.add(value)
+        values.sort()
+        for q in (0.5, 0.95, 0.99):
+            exact = values[int(q * (len(values) - 1))]
+            self.assertAlmostEqual(sketch.quantile(q) / exact, 1, delta=0.02)
+
+    def test_bucket_count_is_bounded(self):
+        sketch = QuantileSketch(max_buckets=50)
+        for i in range(1, 10000):
+            sketch.add(i * 0.37)
+        self.assertLessEqual(len(sketch.buckets), 50)
+        self.assertAlmostEqual(sketch.quantile(0.99) / (9900 * 0.37), 1, delta=0.03)
+
+class TestSpaceSavingCounter(unittest.TestCase):
+    def test_keeps_heavy_hitters_in_fixed_space(self):
+        counter = SpaceSavingCounter(capacity=10)
+        for i in range(5000):
+            counter.add("reuters.com" if i % 3 == 0 else f"blog{i}.example")
+        self.assertEqual(len(counter.counts), 10)
+        key, count = counter.top(1)[0]
+        self.assertEqual(key, "reuters.com")
+        self.assertGreaterEqual(count, 1667)
+
+class TestDistinctCounter(unittest.TestCase):
+    def test_estimates_cardinality(self):
+        counter = DistinctCounter()
+        for i in range(5000):
+            counter.add(f"T{i % 2000}")
+        self.assertAlmostEqual(counter.count() / 2000, 1, delta=0.1)
+
+class TestResearchMetricsTracker(unittest.TestCase):
+    def test_summary(self):
+        tracker = ResearchMetricsTracker()
+        start = tracker.start_request()
+        tracker.end_request(start, {
+            "ticker": "aapl",
+            "filtered_results": {"filtered_articles": [
+                {"url": "https://www.reuters.com/a"}, {"url": "https://www.reuters.com/b"}
+            ]}
+        })
+        start = tracker.start_request()
+        tracker.end_request(start, {"ticker": "MSFT", "error": "Error in research node: timeout"}, success=False)
+        tracker.record_stage("research", 1.5)
+        tracker.record_stage("research", 2.5, success=False)
+
+        summary = tracker.get_metrics_summary()
+        self.assertEqual(summary["requests"], 2)
+        self.assertEqual(summary["in_flight"], 0)
+        self.assertEqual(summary["success_rate"], 50)
+        self.assertEqual(summary["unique_stocks_researched"], 1)
+        self.assertEqual(summary["top_source_domains"], {"www.reuters.com": 2})
+        self.assertEqual(summary["top_error_types"], {"Error in research node": 1})
+        self.assertEqual(summary["latency_seconds"]["count"], 2)
+        self.assertEqual(summary["stages"]["research"]["calls"], 2)
+        self.assertEqual(summary["stages"]["research"]["failures"], 1)
+
+    def test_stage_context_records_failures(self):
+        tracker = ResearchMetricsTracker()
+        with self.assertRaises(ValueError):
+            with tracker.stage("fetch"):
+                raise ValueError("boom")
+        with tracker.stage("fetch"):
+            pass
+        self.assertEqual(tracker.get_metrics_summary()["stages"]["fetch"]["failures"], 1)
+
+    def test_memory_is_bounded(self):
+        tracker = ResearchMetricsTracker(recent_capacity=16, top_k_capacity=8)
+        for i in range(2000):
+            start = tracker.start_request()
+            tracker.end_request(start, {"ticker": f"T{i}", "error": f"Error {i}: x"}, success=i % 2 == 0)
+        self.assertEqual(len(tracker.recent), 16)
+        self.assertEqual(len(tracker.tickers.counts), 8)
+        self.assertEqual(len(tracker.error_types.counts), 8)
+        self.assertEqual(tracker.get_metrics_summary()["requests"], 2000)
+
+    def test_concurrent_updates(self):
+        tracker = ResearchMetricsTracker()
+
+        def work():
+            for _ in range(500):
+                start = tracker.start_request()
+                tracker.record_stage("score", 0.01)
+                tracker.end_request(start, {"ticker": "AAPL"})
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        summary = tracker.get_metrics_summary()
+        self.assertEqual(summary["requests"], 4000)
+        self.assertEqual(summary["latency_seconds"]["count"], 4000)
+        self.assertEqual(summary["stages"]["score"]["calls"], 4000)
+        self.assertEqual(summary["top_tickers"], {"AAPL": 4000})
+
+    def test_record_usage(self):
+        tracker = ResearchMetricsTracker()
+        for ticker, cost in (("AAPL", 0.002), ("MSFT", 0.001), ("AAPL", 0.003)):
+            tracker.record_usage({
+                "ticker": ticker, "cost_usd": cost, "budget_exceeded": ticker == "MSFT",
+                "degraded_stages": {"recommend": "skipped"} if ticker == "MSFT" else {},
+                "by_node": {"extract": {"calls": 2, "prompt_tokens": 800, "completion_tokens": 200, "cost_usd": cost}}
+            })
+        usage = tracker.get_metrics_summary()["llm_usage"]
+        self.assertEqual(usage["calls"], 6)
+        self.assertEqual(usage["prompt_tokens"], 2400)
+        self.assertAlmostEqual(usage["cost_usd"], 0.006)
+        self.assertEqual(usage["by_node"]["extract"]["completion_tokens"], 600)
+        self.assertEqual(usage["top_tickers_by_cost_usd"], {"AAPL": 0.005, "MSFT": 0.001})
+        self.assertEqual(usage["cost_per_request_usd"]["count"], 3)
+        self.assertEqual(usage["budget_exceeded_requests"], 1)
+        self.assertEqual(usage["degraded_stages"], {"recommend": 1})
+
+    def test_reset(self):
+        tracker = ResearchMetricsTracker()
+        tracker.end_request(tracker.start_request(), {"ticker": "AAPL"})
+        tracker.reset()
+        self.assertEqual(tracker.get_metrics_summary()["requests"], 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,37 @@
+# tests/test_passages.py
+import unittest
+from utils.passages import count_tokens, split_passages, score_passage, select_passages
+
+class TestPassages(unittest.TestCase):
+    def setUp(self):
+        boilerplate = "\n".join(["Subscribe to our newsletter. Accept cookie settings. Sign in."] * 40)
+        self.signal = "Apple (AAPL) reported Q3 revenue of $94.9 billion, up 5%, and analysts raised the price target."
+        self.text = boilerplate + "\n" + self.signal + "\n" + boilerplate
+
+    def test_count_tokens(self):
+        self.assertEqual(count_tokens(""), 0)
+        self.assertGreater(count_tokens(self.signal), 10)
+
+    def test_split_respects_passage_size(self):
+        passages = split_passages(self.text, max_tokens=60)
+        self.assertGreater(len(passages), 1)
+        for passage in passages:
+            self.assertLessEqual(count_tokens(passage), 60)
+
+    def test_signal_scores_above_boilerplate(self):
+        boilerplate = "Subscribe to our newsletter. Accept cookie settings. Sign in."
+        self.assertGreater(
+            score_passage(self.signal, "AAPL", "Apple Inc."),
+            score_passage(boilerplate, "AAPL", "Apple Inc.")
+        )
+
+    def test_select_keeps_signal_within_budget(self):
+        selected = select_passages(self.text, "AAPL", "Apple Inc.", token_budget=80, passage_tokens=40)
+        self.assertIn("price target", selected)
+        self.assertLessEqual(count_tokens(selected), 80 + 5)  # Allow for passage separators
+
+    def test_short_text_is_returned_unchanged(self):
+        self.assertEqual(select_passages(self.signal, "AAPL", "Apple Inc.", token_budget=500), self.signal)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,120 @@
+# tests/test_precompute.py
+import unittest
+from datetime import datetime
+from zoneinfo import ZoneInfo
+from utils.cache import TieredCache, RedisTier, InMemoryRedis
+from graph.precompute import DemandTracker, PrecomputeScheduler
+
+# Monday 2024-06-03 08:00 New York time, inside the pre-market window
+PRE_MARKET = datetime(2024, 6, 3, 8, 0, tzinfo=ZoneInfo("America/New_York")).timestamp()
+
+class FakeClock:
+    def __init__(self, now):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+class TestDemandTracker(unittest.TestCase):
+    def test_recent_requests_outrank_old_ones(self):
+        clock = FakeClock(PRE_MARKET)
+        tracker = DemandTracker(half_life_hours=1, clock=clock)
+        for _ in range(4):
+            tracker.record("AAPL", "Apple Inc.")
+        clock.now += 3 * 3600  # AAPL decays to 0.5
+        tracker.record("msft", "Microsoft")
+        self.assertEqual([t for t, _, _ in tracker.top(2)], ["MSFT", "AAPL"])
+
+    def test_faded_tickers_are_dropped(self):
+        clock = FakeClock(PRE_MARKET)
+        cache = TieredCache(clock=clock)
+        tracker = DemandTracker(half_life_hours=1, cache=cache, min_demand=0.1, clock=clock)
+        tracker.record("AAPL", "Apple Inc.")
+        clock.now += 5 * 3600  # Decays to 1/32
+        tracker.record("MSFT", "Microsoft")
+        self.assertEqual(tracker.top(5), [("MSFT", "Microsoft", 1.0)])
+        self.assertEqual(sum(len(cache.scores("precompute_demand", key)) for key, _ in tracker._periods(clock())), 1)
+
+    def test_counts_carry_over_into_the_next_period(self):
+        clock = FakeClock(PRE_MARKET)
+        tracker = DemandTracker(half_life_hours=1, cache=TieredCache(clock=clock), clock=clock)
+        clock.now = (clock.now // tracker.period + 1) * tracker.period - 1800
+        tracker.record("AAPL", "Apple Inc.")
+        clock.now += 3600
+        (_, _, count), = tracker.top(1)
+        self.assertAlmostEqual(count, 0.5)
+
+class TestPrecomputeScheduler(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(PRE_MARKET)
+        self.calls = []
+        self.cache = TieredCache(clock=self.clock)
+
+        def analyze(ticker, company_name):
+            self.calls.append(ticker)
+            return {"ticker": ticker, "error": "failed" if ticker == "BAD" else ""}
+
+        self.scheduler = PrecomputeScheduler(
+            analyze_fn=analyze, cache=self.cache, tracker=DemandTracker(clock=self.clock),
+            top_k=3, max_concurrency=2, daily_budget_usd=0.05, est_cost_per_run_usd=0.02, clock=self.clock
+        )
+        for ticker, count in (("AAPL", 3), ("MSFT", 2), ("BAD", 1), ("NVDA", 1)):
+            for _ in range(count):
+                self.scheduler.record_request(ticker, ticker.lower(), cache_hit=False)
+
+    def test_run_warms_top_tickers_within_budget(self):
+        summary = self.scheduler.run_once()
+        # Budget allows two runs of the top three tickers
+        self.assertEqual(sorted(self.calls), ["AAPL", "MSFT"])
+        self.assertEqual(summary["warmed"], ["AAPL", "MSFT"])
+        self.assertEqual(self.scheduler.metrics()["skipped_budget"], 1)
+        self.assertTrue(self.cache.get("analysis", "AAPL|aapl")[0])
+
+        self.scheduler.record_request("AAPL", "aapl", cache_hit=True)
+        metrics = self.scheduler.metrics()
+        self.assertEqual(metrics["precomputed_hits"], 1)
+        self.assertAlmostEqual(metrics["spend_usd_today"], 0.04)
+
+    def test_measured_cost_replaces_estimate(self):
+        self.scheduler.analyze_fn = lambda ticker, company_name: {"ticker": ticker, "usage": {"cost_usd": 0.005}}
+        self.scheduler.top_k = 2
+        self.scheduler.run_once()
+        metrics = self.scheduler.metrics()
+        self.assertAlmostEqual(metrics["spend_usd_today"], 0.01)
+        self.assertAlmostEqual(metrics["spend_usd_total"], 0.01)
+
+    def test_tick_runs_each_window_once(self):
+        self.assertIsNotNone(self.scheduler.tick())
+        self.assertIsNone(self.scheduler.tick())
+        self.clock.now += 4 * 3600  # Noon: outside the windows
+        self.assertIsNone(self.scheduler.current_window())
+
+class TestSharedPrecomputeState(unittest.TestCase):
+    def test_replicas_share_demand_and_budget(self):
+        clock = FakeClock(PRE_MARKET)
+        server = InMemoryRedis(clock=clock)
+        calls = []
+        replicas = [
+            PrecomputeScheduler(
+                analyze_fn=lambda ticker, company_name: calls.append(ticker) or {"ticker": ticker},
+                cache=TieredCache(shared=RedisTier(server), clock=clock),
+                top_k=2, daily_budget_usd=0.05, est_cost_per_run_usd=0.02, clock=clock
+            )
+            for _ in range(2)
+        ]
+        replicas[0].record_request("AAPL", "aapl", cache_hit=False)
+        for _ in range(2):
+            replicas[1].record_request("MSFT", "msft", cache_hit=False)
+        self.assertEqual([t for t, _, _ in replicas[0].tracker.top(2)], ["MSFT", "AAPL"])
+
+        self.assertIsNotNone(replicas[0].tick())
+        self.assertEqual(sorted(calls), ["AAPL", "MSFT"])
+        # The other replica sees the spend and the precomputed results
+        self.assertIsNone(replicas[1].tick())
+        self.assertEqual(replicas[1].run_once()["warmed"], [])
+        self.assertAlmostEqual(replicas[1].metrics()["spend_usd_today"], 0.04)
+        replicas[1].record_request("AAPL", "aapl", cache_hit=True)
+        self.assertEqual(replicas[1].metrics()["precomputed_hits"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
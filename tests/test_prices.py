@@ -0,0 +1,79 @@
+# tests/test_prices.py
+import unittest
+from utils.prices import AlphaVantageProvider, FakePriceProvider, PriceService, RateLimiter
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+class TestPriceService(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1_700_000_000.0)
+        self.provider = FakePriceProvider({"AAPL": 190.5})
+        self.service = PriceService(self.provider, ttl_seconds=60, closed_ttl_seconds=60, clock=self.clock)
+
+    def test_batch_lookup_fetches_missing_tickers_once(self):
+        quotes = self.service.get_quotes(["aapl", "MSFT", "AAPL"])
+        self.assertEqual(set(quotes), {"AAPL", "MSFT"})
+        self.assertEqual(quotes["AAPL"]["price"], 190.5)
+        self.assertEqual(self.provider.calls, [["AAPL", "MSFT"]])
+
+        self.service.get_quotes(["AAPL", "MSFT", "NVDA"])
+        self.assertEqual(self.provider.calls[-1], ["NVDA"])
+
+    def test_quotes_expire_after_ttl(self):
+        self.service.get_quote("AAPL")
+        self.clock.now += 30
+        self.service.get_quote("AAPL")
+        self.assertEqual(len(self.provider.calls), 1)
+
+        self.clock.now += 31
+        self.service.get_quote("AAPL")
+        self.assertEqual(len(self.provider.calls), 2)
+
+    def test_failed_quotes_are_cached_briefly(self):
+        provider = AlphaVantageProvider(api_key="key", calls_per_minute=1, max_wait=0)
+        provider.rate_limiter.acquire()
+        service = PriceService(provider, error_ttl_seconds=30, clock=self.clock)
+        quotes = service.get_quotes(["AAPL", "MSFT"])
+        self.assertIn("rate limit", quotes["MSFT"]["error"])
+
+        provider.fetch_quotes = lambda tickers: self.fail("failed quotes were fetched again")
+        service.get_quotes(["AAPL", "MSFT"])
+        self.clock.now += 31
+        provider.fetch_quotes = self.provider.fetch_quotes
+        self.assertEqual(service.get_quote("AAPL")["price"], 190.5)
+
+class TestAlphaVantageProvider(unittest.TestCase):
+    def test_no_api_key_skips_lookups(self):
+        provider = AlphaVantageProvider()
+        provider.api_key = None  # As when ALPHA_VANTAGE_API_KEY is unset
+        provider.session.get = lambda *args, **kwargs: self.fail("quote requested without an API key")
+        self.assertIn("ALPHA_VANTAGE_API_KEY", provider.fetch_quotes(["AAPL"])["AAPL"]["error"])
+
+class TestRateLimiter(unittest.TestCase):
+    def test_waits_once_burst_is_spent(self):
+        clock = FakeClock()
+        limiter = RateLimiter(2, clock=clock, sleep=clock.sleep)
+        limiter.acquire()
+        limiter.acquire()
+        self.assertEqual(clock.now, 0)
+        limiter.acquire()
+        self.assertAlmostEqual(clock.now, 30.0)
+
+    def test_gives_up_past_max_wait(self):
+        clock = FakeClock()
+        limiter = RateLimiter(1, clock=clock, sleep=clock.sleep)
+        self.assertTrue(limiter.acquire(max_wait=0))
+        self.assertFalse(limiter.acquire(max_wait=10))
+        self.assertEqual(clock.now, 0)
+        self.assertTrue(limiter.acquire(max_wait=60))
+
+if __name__ == "__main__":
+    unittest.main()
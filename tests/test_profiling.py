@@ -0,0 +1,65 @@
+# tests/test_profiling.py
+import json
+import os
+import pstats
+import tempfile
+import unittest
+from langchain_core.runnables import RunnableLambda
+from utils.profiling import RequestProfiler, current_profiler, list_profiles, profile_path, profile_thread
+
+def parse_documents(n):
+    return [json.loads(json.dumps({"id": i, "text": "x" * 200})) for i in range(n)]
+
+def extract_worker(n):
+    with profile_thread():
+        return len(parse_documents(n))
+
+class TestRequestProfiler(unittest.TestCase):
+    def test_profiles_nodes_and_worker_threads(self):
+        profiler = RequestProfiler("ab12cd34", "aapl", top_n=30)
+        with profiler.session() as profiled:
+            self.assertTrue(profiled)
+            self.assertIs(current_profiler(), profiler)
+            with profiler.node("filter"):
+                kept = parse_documents(2000)
+            with profiler.node("extract"):
+                RunnableLambda(extract_worker).batch([500, 500, 500])
+        self.assertIsNone(current_profiler())
+
+        report = profiler.report()
+        self.assertEqual(report["ticker"], "AAPL")
+        self.assertEqual(set(report["nodes"]), {"filter", "extract"})
+        filter_functions = [row["function"] for row in report["nodes"]["filter"]["top_functions"]]
+        self.assertTrue(any("json" in name for name in filter_functions))
+        # Worker threads profile into the node that started them
+        extract_functions = [row["function"] for row in report["nodes"]["extract"]["top_functions"]]
+        self.assertTrue(any("test_profiling.py" in name for name in extract_functions))
+        self.assertFalse(any("acquire" in name for name in extract_functions[:3]))
+        sites = report["nodes"]["filter"]["top_allocations"]
+        self.assertTrue(any("test_profiling.py" in site["site"] for site in sites))
+        self.assertGreater(len(kept), 0)
+
+    def test_one_session_at_a_time(self):
+        first, second = RequestProfiler("aaaa0001"), RequestProfiler("aaaa0002")
+        with first.session() as profiled:
+            with second.session() as second_profiled:
+                self.assertTrue(profiled)
+                self.assertFalse(second_profiled)
+
+    def test_save_and_list(self):
+        with tempfile.TemporaryDirectory() as directory:
+            for profile_id in ("0000aaaa", "0000bbbb", "0000cccc"):
+                profiler = RequestProfiler(profile_id, "MSFT")
+                with profiler.session(), profiler.node("score"):
+                    parse_documents(100)
+                profiler.save(directory, max_profiles=2)
+
+            self.assertEqual(len(list_profiles(directory)), 2)
+            self.assertIsNone(profile_path(directory, "0000aaaa"))
+            self.assertIsNone(profile_path(directory, "../secrets"))
+            stats = pstats.Stats(profile_path(directory, "0000cccc", "prof"))
+            self.assertGreater(stats.total_calls, 0)
+            self.assertTrue(os.path.exists(profile_path(directory, "0000cccc")))
+
+if __name__ == "__main__":
+    unittest.main()
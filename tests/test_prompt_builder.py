@@ -0,0 +1,50 @@
+# tests/test_prompt_builder.py
+import unittest
+from utils.prompt_builder import PromptBuilder, build_insights_text
+
+class TestPromptBuilder(unittest.TestCase):
+    def test_budget_drops_lowest_priority_first(self):
+        builder = PromptBuilder(token_budget=40)
+        builder.add_section("RISKS", ["Regulatory probe in the EU could delay launches"] * 3, priority=2)
+        builder.add_section("TARGETS", ["Goldman Sachs | Buy | target $250"], priority=0)
+        text, stats = builder.build()
+
+        self.assertIn("- Goldman Sachs | Buy | target $250\n", text)
+        # The targets fit first; the risks fill what is left of the budget
+        self.assertEqual(text.count("- Regulatory probe"), 2)
+        self.assertEqual(stats["dropped_lines"], 1)
+        self.assertLessEqual(stats["tokens"], 40)
+        # Sections render in insertion order regardless of priority
+        self.assertLess(text.index("RISKS:"), text.index("TARGETS:"))
+
+    def test_rendering_is_deterministic(self):
+        consolidated = {
+            "summaries": [{"url": "u", "summary": "Strong   quarter\n with record sales"}],
+            "financial_metrics": [{"metric_name": "EPS", "value": "$1.40", "sentiment": "positive", "mentions": 2}],
+            "analyst_opinions": [{"analyst_or_firm": "GS", "rating": "Buy", "target_price": "$250", "mentions": 1}],
+            "business_developments": [],
+            "market_sentiment": {"overall_sentiment": "bullish", "counts": {"neutral": 1, "bullish": 2}},
+            "risk_factors": []
+        }
+        first, stats = build_insights_text(consolidated, token_budget=500)
+        second, _ = build_insights_text(consolidated, token_budget=500)
+
+        self.assertEqual(first, second)
+        self.assertEqual(stats["dropped_lines"], 0)
+        self.assertIn("- EPS: $1.40 | positive | x2\n", first)
+        self.assertIn("- GS | Buy | target $250\n", first)
+        self.assertIn("- Strong quarter with record sales\n", first)
+
+    def test_tight_budget_keeps_analyst_targets_over_sentiment(self):
+        consolidated = {
+            "analyst_opinions": [{"analyst_or_firm": "GS", "rating": "Buy", "target_price": "$250"}],
+            "market_sentiment": {"overall_sentiment": "bullish", "counts": {"bullish": 2}}
+        }
+        text, stats = build_insights_text(consolidated, token_budget=15)
+
+        self.assertIn("- GS | Buy | target $250\n", text)
+        self.assertNotIn("MARKET SENTIMENT", text)
+        self.assertEqual(stats["dropped_lines"], 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,81 @@
+# tests/test_quant_scoring.py
+import unittest
+from agents.quant_scoring import QuantScoringEngine, _parse_price, _rating_bucket
+
+def consolidated(rating, sentiment, severity, metric_sentiment):
+    return {
+        "article_count": 3,
+        "financial_metrics": [{"metric_name": "Revenue", "sentiment": metric_sentiment, "mentions": 3}],
+        "analyst_opinions": [{"analyst_or_firm": "GS", "rating": rating, "target_price": "$220", "mentions": 2}],
+        "business_developments": [{"description": "New product", "expected_impact": "Positive boost to sales"}],
+        "market_sentiment": {"overall_sentiment": sentiment, "counts": {sentiment: 3}},
+        "risk_factors": [{"risk_type": "Regulatory", "severity": severity}]
+    }
+
+class TestQuantScoringEngine(unittest.TestCase):
+    def setUp(self):
+        self.engine = QuantScoringEngine()
+        self.bullish = consolidated("Buy", "bullish", "low", "positive")
+        self.bearish = consolidated("Underperform", "bearish", "high", "negative")
+
+    def test_scores_are_in_range(self):
+        for fields in self.engine.score_batch([self.bullish, self.bearish, {}]):
+            for name in ("financial_health_score", "growth_potential_score", "analyst_sentiment_score",
+                         "momentum_score", "risk_score"):
+                self.assertTrue(1 <= fields[name] <= 10)
+            self.assertTrue(1 <= fields["overall_score"] <= 100)
+            self.assertIn(fields["investment_recommendation"], ["Buy", "Hold", "Sell"])
+            self.assertIn(fields["confidence_level"], ["High", "Medium", "Low"])
+
+    def test_bullish_evidence_outscores_bearish(self):
+        bullish, bearish = self.engine.score_batch([self.bullish, self.bearish])
+        self.assertGreater(bullish["overall_score"], bearish["overall_score"])
+        self.assertGreater(bullish["risk_score"], bearish["risk_score"])
+        self.assertEqual(bullish["investment_recommendation"], "Buy")
+        self.assertEqual(bearish["investment_recommendation"], "Sell")
+
+    def test_no_evidence_is_neutral_hold(self):
+        fields = self.engine.score({})
+        for name in ("financial_health_score", "growth_potential_score", "analyst_sentiment_score",
+                     "momentum_score", "risk_score"):
+            self.assertEqual(fields[name], 5)
+        self.assertEqual(fields["overall_score"], 50)
+        self.assertEqual(fields["investment_recommendation"], "Hold")
+        self.assertEqual(fields["confidence_level"], "Low")
+
+        # Risk factors alone are not evidence for a Buy or Sell
+        only_risks = self.engine.score({"risk_factors": [{"risk_type": "Legal", "severity": "high"}] * 5})
+        self.assertEqual(only_risks["investment_recommendation"], "Hold")
+        self.assertLess(only_risks["risk_score"], 5)
+
+    def test_target_upside_uses_current_price(self):
+        below_target = self.engine.score(self.bullish, current_price=150.0)
+        above_target = self.engine.score(self.bullish, current_price=300.0)
+        self.assertGreater(below_target["analyst_sentiment_score"], above_target["analyst_sentiment_score"])
+
+    def test_batch_matches_single_scoring(self):
+        self.assertEqual(self.engine.score_batch([self.bullish])[0], self.engine.score(self.bullish))
+
+class TestParsing(unittest.TestCase):
+    def test_rating_changes_map_to_the_new_rating(self):
+        cases = {
+            "Buy (from Sell)": "buy",
+            "Upgraded to Buy from Sell": "buy",
+            "Hold (from Buy)": "hold",
+            "Downgraded to Hold from Buy": "hold",
+            "Downgraded from Buy to Hold": "hold",
+            "Strong Sell": "sell",
+            "Market Perform": "hold",
+            "Not rated": None
+        }
+        for rating, bucket in cases.items():
+            self.assertEqual(_rating_bucket(rating), bucket, rating)
+
+    def test_price_ignores_numbers_inside_words(self):
+        self.assertEqual(_parse_price("Q3 target $250"), 250.0)
+        self.assertEqual(_parse_price("$1,250.50"), 1250.5)
+        self.assertEqual(_parse_price("FY2025 target 180"), 180.0)
+        self.assertIsNone(_parse_price("Q3"))
+
+if __name__ == "__main__":
+    unittest.main()
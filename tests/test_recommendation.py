@@ -0,0 +1,69 @@
+# tests/test_recommendation.py
+import os
+import unittest
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# The agent builds its OpenAI client on init; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from agents.recommendation import RecommendationAgent
+from utils.cache import TieredCache
+
+def scoring_results(price, overall_score=68):
+    return {
+        "ticker": "AAPL",
+        "company_name": "Apple Inc.",
+        "score": {"overall_score": overall_score, "investment_recommendation": "Buy"},
+        "current_price": price,
+        "price_data": {"price": price},
+        "consolidated_insights": {"summaries": [{"url": "https://a.com", "summary": "Apple beat estimates."}]}
+    }
+
+class TestPriceBucket(unittest.TestCase):
+    def test_zero_width_keys_on_the_exact_price(self):
+        self.assertEqual(RecommendationAgent._price_bucket(101.5, bucket_pct=0), 101.5)
+        self.assertNotEqual(RecommendationAgent._price_bucket(101.5, bucket_pct=0),
+                            RecommendationAgent._price_bucket(101.6, bucket_pct=0))
+        self.assertIsNone(RecommendationAgent._price_bucket(None, bucket_pct=0))
+
+    def test_small_moves_share_a_bucket(self):
+        self.assertEqual(RecommendationAgent._price_bucket(100.0, bucket_pct=0.02),
+                         RecommendationAgent._price_bucket(100.5, bucket_pct=0.02))
+        self.assertNotEqual(RecommendationAgent._price_bucket(100.0, bucket_pct=0.02),
+                            RecommendationAgent._price_bucket(110.0, bucket_pct=0.02))
+
+class TestRecommendationCache(unittest.TestCase):
+    def setUp(self):
+        self.agent = RecommendationAgent(use_cache=True)
+        self.agent.cache = TieredCache()
+        self.calls = []
+        self.agent.recommendation_chain = RunnableLambda(
+            lambda inputs: self.calls.append(inputs) or AIMessage(content=f"Recommendation {len(self.calls)}")
+        )
+        self.agent._prepare_inputs = lambda results: ({"ticker": results["ticker"]}, {})
+
+    def test_hits_within_a_price_bucket(self):
+        first = self.agent.recommend(scoring_results(100.0))
+        second = self.agent.recommend(scoring_results(100.5))
+
+        self.assertFalse(first["cache_hit"])
+        self.assertTrue(second["cache_hit"])
+        self.assertEqual(second["recommendation"], first["recommendation"])
+        self.assertEqual(len(self.calls), 1)
+
+    def test_misses_on_a_new_price_bucket_or_score(self):
+        self.agent.recommend(scoring_results(100.0))
+        self.assertFalse(self.agent.recommend(scoring_results(110.0))["cache_hit"])
+        self.assertFalse(self.agent.recommend(scoring_results(100.0, overall_score=55))["cache_hit"])
+        self.assertEqual(len(self.calls), 3)
+
+    def test_streaming_reuses_the_cache(self):
+        self.agent.recommend(scoring_results(100.0))
+        *chunks, results = self.agent.stream_recommendation(scoring_results(100.5))
+
+        self.assertTrue(results["cache_hit"])
+        self.assertEqual(chunks, ["Recommendation 1"])
+
+if __name__ == "__main__":
+    unittest.main()
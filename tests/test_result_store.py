@@ -0,0 +1,81 @@
+# tests/test_result_store.py
+import os
+import tempfile
+import unittest
+from agents.result_store import ResultStore
+from agents.scoring import StockScore
+
+class FakeClock:
+    def __init__(self, now=1_700_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+def score(overall, recommendation="Buy"):
+    return StockScore(financial_health_score=7, growth_potential_score=6, analyst_sentiment_score=7,
+                      momentum_score=5, risk_score=4, overall_score=overall,
+                      investment_recommendation=recommendation, confidence_level="Medium",
+                      reasoning={"overall_score": "Solid"})
+
+def analysis(ticker, overall, recommendation="Buy"):
+    return {
+        "ticker": ticker,
+        "company_name": f"{ticker} Inc.",
+        "research_results": {"search_results": ["large raw search payload"]},
+        "extraction_results": {"extracted_insights": [{"url": f"https://{ticker}.com", "summary": "s",
+                                                        "structured_insights": {}}]},
+        "recommendation_results": {"ticker": ticker, "company_name": f"{ticker} Inc.", "score": score(overall, recommendation),
+                                   "recommendation": f"{recommendation} {ticker}", "current_price": 100.0}
+    }
+
+class TestResultStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.clock = FakeClock()
+        self.store = ResultStore(os.path.join(self.tmpdir.name, "results.sqlite3"), clock=self.clock)
+        for i, ticker in enumerate(["AAPL", "MSFT", "NVDA", "INTC", "IBM"]):
+            self.clock.now += 1
+            self.store.save(analysis(ticker, 50 + 10 * i, "Sell" if ticker == "INTC" else "Buy"))
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_pages_are_sorted_and_slim(self):
+        first = self.store.list(page=1, page_size=2)
+        self.assertEqual(first["total"], 5)
+        self.assertEqual([item["ticker"] for item in first["items"]], ["IBM", "INTC"])
+        self.assertEqual(set(first["items"][0]), {"ticker", "company_name", "overall_score", "risk_score",
+                                                  "investment_recommendation", "confidence_level",
+                                                  "current_price", "analyzed_at"})
+        last = self.store.list(page=3, page_size=2)
+        self.assertEqual([item["ticker"] for item in last["items"]], ["AAPL"])
+
+        by_ticker = self.store.list(sort_by="ticker", descending=False)
+        self.assertEqual(by_ticker["items"][0]["ticker"], "AAPL")
+        with self.assertRaises(ValueError):
+            self.store.list(sort_by="detail; DROP TABLE results")
+
+    def test_watchlist_filter(self):
+        page = self.store.list(tickers=["msft", "nvda", "TSLA"])
+        self.assertEqual(page["total"], 2)
+        self.assertEqual([item["ticker"] for item in page["items"]], ["NVDA", "MSFT"])
+
+    def test_detail_keeps_recommendation_and_sources_only(self):
+        detail = self.store.get("aapl")
+        self.assertEqual(detail["recommendation_results"]["recommendation"], "Buy AAPL")
+        self.assertEqual(detail["recommendation_results"]["score"]["overall_score"], 50)
+        self.assertEqual(detail["extraction_results"]["extracted_insights"],
+                         [{"url": "https://AAPL.com", "summary": "s"}])
+        self.assertNotIn("research_results", detail)
+        self.assertIsNone(self.store.get("TSLA"))
+
+    def test_batch_entry_without_recommendation_replaces_result(self):
+        self.store.save({"ticker": "AAPL", "scoring_results": {"ticker": "AAPL", "company_name": "Apple Inc.",
+                                                                "score": score(95), "extracted_insights": []}})
+        self.assertEqual(self.store.list()["items"][0]["ticker"], "AAPL")
+        self.assertIsNone(self.store.get("AAPL")["recommendation_results"]["recommendation"])
+        self.assertFalse(self.store.save({"ticker": "MSFT", "error": "failed"}))
+
+if __name__ == "__main__":
+    unittest.main()
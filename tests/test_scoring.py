@@ -0,0 +1,151 @@
+# tests/test_scoring.py
+import itertools
+import os
+import unittest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+# The agents build their OpenAI clients on init; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+
+from agents.scoring import ScoringMechanism, StockScore, TickerScore, BatchStockScores
+from config import SCORING_MAX_REPAIR_ATTEMPTS
+from utils.llm_costs import RequestCostTracker
+from utils.prices import FakePriceProvider, PriceService
+
+EXTRACTION_RESULTS = {
+    "ticker": "AAPL",
+    "company_name": "Apple Inc.",
+    "extracted_insights": [{
+        "url": "https://example.com/aapl",
+        "summary": "Apple beat estimates.",
+        "structured_insights": {
+            "financial_metrics": [{"metric_name": "Revenue", "value": "$90B", "sentiment": "positive"}],
+            "analyst_opinions": [{"analyst_or_firm": "GS", "rating": "Buy", "target_price": "$250"}]
+        }
+    }]
+}
+
+class TestScoringBudget(unittest.TestCase):
+    def test_exhausted_budget_falls_back_without_llm_calls(self):
+        tracker = RequestCostTracker("AAPL", token_budget=50)
+        reply = AIMessage(content="ok", usage_metadata={"input_tokens": 45, "output_tokens": 5, "total_tokens": 50})
+        llm = GenericFakeChatModel(messages=itertools.cycle([reply])).with_config(callbacks=[tracker])
+        llm.invoke("spend the budget")
+
+        scorer = ScoringMechanism(mode="llm", price_service=PriceService(FakePriceProvider()))
+        attempts = []
+        scorer.scoring_chain = RunnableLambda(lambda prompt: attempts.append(prompt) or llm.invoke(prompt))
+        scoring_results = scorer.score(EXTRACTION_RESULTS)
+
+        self.assertEqual(scoring_results["scoring_method"], "fast_fallback")
+        self.assertTrue(1 <= scoring_results["score"].overall_score <= 100)
+        usage = tracker.summary()
+        self.assertTrue(usage["budget_exceeded"])
+        self.assertEqual(usage["llm_calls"], 1)
+        # No repair attempts after the budget ran out
+        self.assertEqual(len(attempts), 1)
+
+VALID_SCORE = StockScore(
+    financial_health_score=7, growth_potential_score=6, analyst_sentiment_score=8, momentum_score=6,
+    risk_score=5, overall_score=68, reasoning={"overall_score": "Beat estimates"},
+    investment_recommendation="Buy", confidence_level="Medium"
+)
+
+def invalid_reply():
+    """Structured-output reply that failed validation."""
+    return {"raw": AIMessage(content="", additional_kwargs={"function_call": {"arguments": '{"overall_score": 250}'}}),
+            "parsed": None, "parsing_error": "overall_score: Input should be less than or equal to 100"}
+
+class TestScoringRepair(unittest.TestCase):
+    def setUp(self):
+        self.scorer = ScoringMechanism(mode="llm", price_service=PriceService(FakePriceProvider()))
+        self.prompts = []
+
+    def chain(self, valid_after):
+        def reply(prompt):
+            self.prompts.append(prompt)
+            if len(self.prompts) > valid_after:
+                return {"raw": AIMessage(content=""), "parsed": VALID_SCORE, "parsing_error": None}
+            return invalid_reply()
+        return RunnableLambda(reply)
+
+    def test_invalid_score_is_repaired(self):
+        self.scorer.scoring_chain = self.chain(valid_after=SCORING_MAX_REPAIR_ATTEMPTS)
+        scoring_results = self.scorer.score(EXTRACTION_RESULTS)
+
+        self.assertEqual(scoring_results["scoring_method"], "llm")
+        self.assertEqual(scoring_results["score"].overall_score, 68)
+        self.assertEqual(len(self.prompts), SCORING_MAX_REPAIR_ATTEMPTS + 1)
+        # Repair prompts carry the rejected reply and the validation error
+        self.assertIn('{"overall_score": 250}', self.prompts[-1])
+        self.assertIn("less than or equal to 100", self.prompts[-1])
+
+    def test_falls_back_after_the_repair_attempts(self):
+        self.scorer.scoring_chain = self.chain(valid_after=SCORING_MAX_REPAIR_ATTEMPTS + 1)
+        scoring_results = self.scorer.score(EXTRACTION_RESULTS)
+
+        self.assertEqual(scoring_results["scoring_method"], "fast_fallback")
+        self.assertEqual(len(self.prompts), SCORING_MAX_REPAIR_ATTEMPTS + 1)
+
+def consolidation_results(ticker, rating, sentiment):
+    return {
+        "ticker": ticker,
+        "company_name": ticker.title(),
+        "extracted_insights": [],
+        "consolidated_insights": {
+            "article_count": 2,
+            "analyst_opinions": [{"analyst_or_firm": "GS", "rating": rating, "mentions": 2}],
+            "market_sentiment": {"overall_sentiment": sentiment, "counts": {sentiment: 2}}
+        }
+    }
+
+class TestBatchScoring(unittest.TestCase):
+    def setUp(self):
+        self.scorer = ScoringMechanism(mode="fast", price_service=PriceService(FakePriceProvider()))
+        self.batch = [consolidation_results("BEAR", "Sell", "bearish"), consolidation_results("BULL", "Buy", "bullish")]
+
+    def test_hybrid_batch_adds_llm_reasoning(self):
+        prompts = []
+        self.scorer.reasoning_chain = RunnableLambda(
+            lambda inputs: prompts.append(inputs) or {"overall_score": f"Explained {inputs['ticker']}"}
+        )
+        results = self.scorer.score_batch(self.batch, mode="hybrid")
+
+        self.assertEqual(sorted(inputs["ticker"] for inputs in prompts), ["BEAR", "BULL"])
+        for scoring_results in results:
+            self.assertEqual(scoring_results["scoring_method"], "hybrid")
+            self.assertEqual(scoring_results["score"].reasoning["overall_score"], f"Explained {scoring_results['ticker']}")
+
+    def test_calibration_ranks_against_the_batch(self):
+        ranks, percentiles, calibrated = ScoringMechanism._calibrate([40, 70, 70, 100])
+
+        self.assertEqual(list(ranks), [4, 2, 3, 1])  # Ties keep input order
+        self.assertEqual(list(percentiles), [0.0, 66.7, 33.3, 100.0])
+        self.assertEqual(list(calibrated), [22, 50, 50, 78])  # 50 + 20 z-scores
+        self.assertEqual([list(values) for values in ScoringMechanism._calibrate([55])], [[1], [100.0], [50]])
+
+    def test_fast_batch_is_ranked_and_labelled(self):
+        results = self.scorer.score_batch(self.batch)
+
+        self.assertEqual([r["ticker"] for r in results], ["BULL", "BEAR"])
+        self.assertEqual([r["rank"] for r in results], [1, 2])
+        self.assertEqual([r["percentile"] for r in results], [100.0, 0.0])
+        self.assertGreater(results[0]["calibrated_score"], results[1]["calibrated_score"])
+        self.assertEqual({r["scoring_method"] for r in results}, {"fast"})
+
+    def test_llm_batch_falls_back_per_ticker(self):
+        scored = TickerScore(ticker="bull", **VALID_SCORE.model_dump())
+        self.scorer.batch_scoring_chain = RunnableLambda(
+            lambda prompt: {"raw": AIMessage(content=""), "parsed": BatchStockScores(scores=[scored]), "parsing_error": None}
+        )
+        results = {r["ticker"]: r for r in self.scorer.score_batch(self.batch, mode="llm")}
+
+        self.assertEqual(results["BULL"]["scoring_method"], "llm_batch")
+        self.assertEqual(results["BULL"]["score"].overall_score, 68)
+        # The LLM left BEAR out, so it keeps its rule-based score
+        self.assertEqual(results["BEAR"]["scoring_method"], "fast_fallback")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,86 @@
+# tests/test_tracing.py
+import itertools
+import os
+import tempfile
+import unittest
+from langchain_core.language_models.fake_chat_models import GenericFakeChatModel
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+from utils.tracing import (InMemoryExporter, JsonlExporter, Tracer, TracingCallbackHandler,
+                           current_span, set_span_attributes)
+from utils.trace_viewer import list_traces, load_spans, render_timeline
+
+def fake_llm():
+    reply = AIMessage(content="ok", usage_metadata={"input_tokens": 12, "output_tokens": 3, "total_tokens": 15})
+    return GenericFakeChatModel(messages=itertools.cycle([reply]))
+
+class TestTracer(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = Tracer([self.exporter])
+
+    def test_nested_spans_share_trace(self):
+        with self.tracer.start_span("analyze_stock", attributes={"ticker": "AAPL"}) as root:
+            with self.tracer.start_span("node research") as child:
+                set_span_attributes(cache_hit=True)
+                self.assertIs(current_span(), child)
+        self.assertIsNone(current_span())
+
+        spans = self.exporter.trace(root.trace_id)
+        self.assertEqual([span.name for span in spans], ["node research", "analyze_stock"])
+        self.assertEqual(child.parent_id, root.span_id)
+        self.assertTrue(child.attributes["cache_hit"])
+        self.assertGreaterEqual(root.duration_ms, child.duration_ms)
+
+    def test_exception_marks_span_failed(self):
+        with self.assertRaises(ValueError):
+            with self.tracer.start_span("node score"):
+                raise ValueError("no quotes")
+        span = self.exporter.spans[-1]
+        self.assertEqual(span.status, "error")
+        self.assertEqual(span.attributes["error.type"], "ValueError")
+
+    def test_jsonl_roundtrip_and_timeline(self):
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "traces.jsonl")
+            tracer = Tracer([JsonlExporter(path)])
+            with tracer.start_span("analyze_stock", attributes={"ticker": "MSFT"}) as root:
+                with tracer.start_span("fetch_article", kind="client", attributes={"url": "https://a.example"}):
+                    pass
+
+            spans = load_spans(path, root.trace_id[:8])
+            self.assertEqual(len(spans), 2)
+            self.assertIn(root.trace_id, list_traces(load_spans(path)))
+            timeline = render_timeline(spans)
+            self.assertIn("analyze_stock (ticker=MSFT)", timeline)
+            self.assertIn("  fetch_article (url=https://a.example)", timeline)
+
+class TestTracingCallbackHandler(unittest.TestCase):
+    def setUp(self):
+        self.exporter = InMemoryExporter()
+        self.tracer = Tracer([self.exporter])
+        self.handler = TracingCallbackHandler(self.tracer)
+
+    def test_llm_calls_are_children_of_current_span(self):
+        llm = fake_llm()
+        with self.tracer.start_span("node extract") as node:
+            RunnableLambda(lambda _: llm.invoke("hi")).batch(
+                [1, 2], {"callbacks": [self.handler], "metadata": {"langgraph_node": "extract"}}
+            )
+        llm_spans = [span for span in self.exporter.spans if span.name == "llm"]
+        self.assertEqual(len(llm_spans), 2)
+        for span in llm_spans:
+            self.assertEqual(span.parent_id, node.span_id)
+            self.assertEqual(span.attributes["langgraph.node"], "extract")
+            self.assertEqual(span.attributes["llm.prompt_tokens"], 12)
+            self.assertEqual(span.attributes["llm.completion_tokens"], 3)
+
+    def test_metadata_names_parent_outside_a_span(self):
+        fake_llm().invoke("hi", {"callbacks": [self.handler],
+                                 "metadata": {"trace_id": "ab" * 16, "parent_span_id": "cd" * 8}})
+        span = self.exporter.spans[-1]
+        self.assertEqual(span.trace_id, "ab" * 16)
+        self.assertEqual(span.parent_id, "cd" * 8)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,107 @@
+# tests/test_workflow_checkpoints.py
+import os
+import sqlite3
+import time
+import unittest
+from langgraph.checkpoint.sqlite import SqliteSaver
+
+# The agents build their OpenAI and Tavily clients on import; no request is sent in these tests
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("TAVILY_API_KEY", "test")
+
+import config
+
+# Config may have been loaded by an earlier test module, before the keys were set
+config.OPENAI_API_KEY = os.environ["OPENAI_API_KEY"]
+config.TAVILY_API_KEY = os.environ["TAVILY_API_KEY"]
+
+from graph import workflow
+
+class FakeAgents:
+    """Stand-ins for the workflow's agents, counting calls per stage."""
+
+    mode = "llm"
+
+    def __init__(self, fail_scoring=0):
+        self.calls = {}
+        self.fail_scoring = fail_scoring
+
+    def _call(self, stage):
+        self.calls[stage] = self.calls.get(stage, 0) + 1
+
+    def research(self, ticker, company_name, use_cache=True):
+        self._call("research")
+        return {"ticker": ticker, "search_results": []}
+
+    def filter(self, research_results, ticker, company_name):
+        self._call("filter")
+        return {"ticker": ticker, "company_name": company_name,
+                "filtered_articles": [{"url": "https://a.com"}, {"url": "https://b.com"}]}
+
+    def process(self, filtered_results):
+        self._call("extract")
+        return {"ticker": filtered_results["ticker"], "company_name": filtered_results["company_name"],
+                "extracted_insights": []}
+
+    def score(self, consolidation_results, mode=None):
+        self._call("score")
+        if self.fail_scoring:
+            self.fail_scoring -= 1
+            raise RuntimeError("scoring service unavailable")
+        return {"ticker": consolidation_results["ticker"], "company_name": consolidation_results["company_name"],
+                "score": {"overall_score": 60}}
+
+    def recommend(self, scoring_results):
+        self._call("recommend")
+        return {"ticker": scoring_results["ticker"], "recommendation": "Hold"}
+
+class TestCheckpointedRuns(unittest.TestCase):
+    AGENTS = ("research_agent", "filtering_system", "extraction_agent", "scoring_mechanism",
+              "recommendation_agent", "result_store", "_checkpointer")
+
+    def setUp(self):
+        self.saved = {name: getattr(workflow, name) for name in self.AGENTS}
+        self.agents = FakeAgents(fail_scoring=1)
+        for name in self.AGENTS[:-2]:
+            setattr(workflow, name, self.agents)
+        workflow.result_store = None
+        self.checkpointer = workflow._checkpointer = SqliteSaver(sqlite3.connect(":memory:", check_same_thread=False))
+
+    def tearDown(self):
+        for name, value in self.saved.items():
+            setattr(workflow, name, value)
+
+    def checkpoint(self, run_id):
+        return self.checkpointer.get_tuple({"configurable": {"thread_id": run_id}})
+
+    def test_resume_continues_at_the_failed_stage(self):
+        failed = workflow.analyze_stock("AAPL", "Apple Inc.", run_id="run-1")
+        self.assertEqual(failed["failed_stage"], "score")
+        self.assertIsNotNone(self.checkpoint("run-1"))
+
+        result = workflow.resume_analysis("run-1")
+
+        self.assertFalse(result.get("error"))
+        self.assertEqual(result["recommendation_results"]["recommendation"], "Hold")
+        # Research through consolidation ran once; only the failed stage and the ones after it ran again
+        self.assertEqual(self.agents.calls, {"research": 1, "filter": 1, "extract": 1, "score": 2, "recommend": 1})
+
+    def test_completed_runs_drop_their_checkpoints(self):
+        self.agents.fail_scoring = 0
+        result = workflow.analyze_stock("AAPL", "Apple Inc.", run_id="run-2")
+        self.assertFalse(result.get("error"))
+        self.assertIsNone(self.checkpoint("run-2"))
+
+        with self.assertRaises(KeyError):
+            workflow.resume_analysis("run-2")
+
+    def test_expired_failed_runs_are_swept(self):
+        workflow.analyze_stock("AAPL", "Apple Inc.", run_id="run-3")
+        self.assertEqual(workflow.sweep_checkpoints(self.checkpointer, max_age_hours=24), 0)
+        self.assertIsNotNone(self.checkpoint("run-3"))
+
+        self.assertEqual(workflow.sweep_checkpoints(self.checkpointer, max_age_hours=24, now=time.time() + 25 * 3600), 1)
+        self.assertIsNone(self.checkpoint("run-3"))
+
+if __name__ == "__main__":
+    unittest.main()
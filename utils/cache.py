@@ -0,0 +1,727 @@
+# utils/cache.py
+import os
+import json
+import time
+import zlib
+import struct
+import sqlite3
+import fnmatch
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+try:
+    import redis
+except ImportError:
+    redis = None
+
+DEFAULT_TTL_SECONDS = 24 * 60 * 60
+SQLITE_PURGE_EVERY = 256  # Writes between purges of expired rows
+COMPRESS_MIN_BYTES = 1024  # Shared-tier values at least this large are zlib-compressed
+MEMORY_TTL_SECONDS = 30  # Longest a replica serves its memory copy of a shared entry without re-reading it
+
+# One-byte markers on shared-tier payloads (JSON text never starts with either)
+_RAW = b"j"
+_COMPRESSED = b"z"
+
+
+class CacheStats:
+    """
+    Thread-safe hit/miss/eviction counters, overall and per namespace.
+    """
+
+    FIELDS = ("memory_hits", "shared_hits", "misses", "sets", "evictions", "expired", "errors")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._totals = dict.fromkeys(self.FIELDS, 0)
+        self._namespaces: Dict[str, Dict[str, int]] = {}
+
+    def incr(self, field: str, namespace: Optional[str] = None, amount: int = 1) -> None:
+        with self._lock:
+            self._totals[field] += amount
+            if namespace is not None:
+                counters = self._namespaces.setdefault(namespace, dict.fromkeys(self.FIELDS, 0))
+                counters[field] += amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            totals = dict(self._totals)
+            hits = totals["memory_hits"] + totals["shared_hits"]
+            lookups = hits + totals["misses"]
+            totals["hit_rate"] = round(hits / lookups, 4) if lookups else 0.0
+            return {**totals, "namespaces": {ns: dict(c) for ns, c in self._namespaces.items()}}
+
+
+class MemoryTier:
+    """
+    In-process LRU of serialized values, evicting least recently used entries by total size.
+
+    Keys are "namespace:key" strings, so evictions are counted against their namespace.
+    """
+
+    def __init__(self, max_bytes: int, stats: Optional[CacheStats] = None):
+        self.max_bytes = max_bytes
+        self.stats = stats or CacheStats()
+        self.size = 0
+        self._entries: "OrderedDict[str, Tuple[float, float, bytes]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, now: float) -> Optional[Tuple[float, float, bytes]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[1] <= now:
+                self._remove(key)
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def set(self, key: str, created_at: float, expires_at: float, payload: bytes) -> None:
+        if len(payload) > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (created_at, expires_at, payload)
+            self.size += len(payload)
+            while self.size > self.max_bytes:
+                evicted_key, (_, _, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted)
+                self.stats.incr("evictions", evicted_key.split(":", 1)[0])
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+
+    def clear(self, prefix: str = "") -> None:
+        with self._lock:
+            for key in [k for k in self._entries if k.startswith(prefix)]:
+                self._remove(key)
+
+    def _remove(self, key: str) -> None:
+        _, _, payload = self._entries.pop(key)
+        self.size -= len(payload)
+
+
+class SQLiteTier:
+    """
+    Persistent tier in a SQLite table keyed by the full cache key.
+    """
+
+    def __init__(self, path: str):
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self._lock = threading.Lock()
+        self._writes = 0
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "key TEXT PRIMARY KEY, namespace TEXT NOT NULL, value BLOB NOT NULL, "
+            "created_at REAL NOT NULL, expires_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_expires_at ON cache (expires_at)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS cache_namespace ON cache (namespace)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS scores ("
+            "key TEXT NOT NULL, namespace TEXT NOT NULL, member TEXT NOT NULL, score REAL NOT NULL, "
+            "expires_at REAL NOT NULL, PRIMARY KEY (key, member))"
+        )
+
+    def get(self, key: str, now: float) -> Optional[Tuple[float, float, bytes]]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at, expires_at, value FROM cache WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchone()
+        return row
+
+    def set(self, key: str, namespace: str, payload: bytes, created_at: float, expires_at: float) -> int:
+        """Write one entry in its own transaction; returns the number of expired rows purged."""
+        purged = 0
+        with self._lock:
+            # INSERT OR REPLACE in a single statement is atomic: readers see the old or the new value
+            self._conn.execute(
+                "INSERT OR REPLACE INTO cache (key, namespace, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                (key, namespace, sqlite3.Binary(payload), created_at, expires_at)
+            )
+            self._writes += 1
+            if self._writes % SQLITE_PURGE_EVERY == 0:
+                purged = self._conn.execute("DELETE FROM cache WHERE expires_at <= ?", (created_at,)).rowcount
+        return purged
+
+    def add(self, key: str, namespace: str, payload: bytes, created_at: float, expires_at: float) -> bool:
+        """Write the entry only if no live entry exists; returns whether it was written."""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._conn.execute("DELETE FROM cache WHERE key = ? AND expires_at <= ?", (key, created_at))
+                added = self._conn.execute(
+                    "INSERT OR IGNORE INTO cache (key, namespace, value, created_at, expires_at) VALUES (?, ?, ?, ?, ?)",
+                    (key, namespace, sqlite3.Binary(payload), created_at, expires_at)
+                ).rowcount == 1
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return added
+
+    def incr_score(self, key: str, namespace: str, member: str, amount: float, now: float, expires_at: float) -> float:
+        """Add amount to a member's score in one statement; returns the new score."""
+        with self._lock:
+            # Expired scores restart from zero
+            return float(self._conn.execute(
+                "INSERT INTO scores (key, namespace, member, score, expires_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (key, member) DO UPDATE SET "
+                "score = CASE WHEN expires_at <= ? THEN excluded.score ELSE score + excluded.score END, "
+                "expires_at = excluded.expires_at RETURNING score",
+                (key, namespace, member, amount, expires_at, now)
+            ).fetchone()[0])
+
+    def scores(self, key: str, now: float) -> Dict[str, float]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT member, score FROM scores WHERE key = ? AND expires_at > ?", (key, now)
+            ).fetchall()
+        return dict(rows)
+
+    def remove_scores_below(self, key: str, max_score: float, now: float) -> int:
+        with self._lock:
+            return self._conn.execute(
+                "DELETE FROM scores WHERE key = ? AND (score < ? OR expires_at <= ?)", (key, max_score, now)
+            ).rowcount
+
+    def delete(self, key: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM cache WHERE key = ?", (key,))
+            self._conn.execute("DELETE FROM scores WHERE key = ?", (key,))
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        with self._lock:
+            if namespace is None:
+                self._conn.execute("DELETE FROM cache")
+                self._conn.execute("DELETE FROM scores")
+            else:
+                self._conn.execute("DELETE FROM cache WHERE namespace = ?", (namespace,))
+                self._conn.execute("DELETE FROM scores WHERE namespace = ?", (namespace,))
+
+
+class RedisTier:
+    """
+    Shared tier on a Redis-protocol server, so every replica sees the same entries.
+
+    Keys are "<prefix><namespace>:<key>"; expiry is delegated to the server.
+    """
+
+    _HEADER = struct.Struct(">dd")  # created_at, expires_at
+
+    def __init__(self, client, prefix: str = "stocksage:"):
+        """
+        Args:
+            client: redis.Redis client, or InMemoryRedis for tests
+            prefix (str): Prefix for every key, to share a server between applications
+        """
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, key: str, now: float) -> Optional[Tuple[float, float, bytes]]:
+        raw = self.client.get(self.prefix + key)
+        if raw is None or len(raw) < self._HEADER.size:
+            return None
+        created_at, expires_at = self._HEADER.unpack_from(raw)
+        if expires_at <= now:
+            return None
+        return created_at, expires_at, raw[self._HEADER.size:]
+
+    def set(self, key: str, namespace: str, payload: bytes, created_at: float, expires_at: float) -> int:
+        ttl_ms = max(1, int((expires_at - created_at) * 1000))
+        # SET with PX writes value and expiry in one atomic command
+        self.client.set(self.prefix + key, self._HEADER.pack(created_at, expires_at) + payload, px=ttl_ms)
+        return 0
+
+    def add(self, key: str, namespace: str, payload: bytes, created_at: float, expires_at: float) -> bool:
+        ttl_ms = max(1, int((expires_at - created_at) * 1000))
+        return bool(self.client.set(
+            self.prefix + key, self._HEADER.pack(created_at, expires_at) + payload, px=ttl_ms, nx=True
+        ))
+
+    def incr_score(self, key: str, namespace: str, member: str, amount: float, now: float, expires_at: float) -> float:
+        # Scores live in a sorted set, so increments are atomic on the server
+        score = self.client.zincrby(self.prefix + key, amount, member)
+        self.client.pexpire(self.prefix + key, max(1, int((expires_at - now) * 1000)))
+        return float(score)
+
+    def scores(self, key: str, now: float) -> Dict[str, float]:
+        return {
+            member.decode("utf-8") if isinstance(member, bytes) else member: float(score)
+            for member, score in self.client.zrange(self.prefix + key, 0, -1, withscores=True)
+        }
+
+    def remove_scores_below(self, key: str, max_score: float, now: float) -> int:
+        return self.client.zremrangebyscore(self.prefix + key, "-inf", f"({max_score}")
+
+    def delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        pattern = self.prefix + ("*" if namespace is None else f"{namespace}:*")
+        keys = list(self.client.scan_iter(match=pattern))
+        if keys:
+            self.client.delete(*keys)
+
+
+class InMemoryRedis:
+    """
+    Local stand-in for the subset of the Redis client API used by RedisTier.
+    """
+
+    def __init__(self, clock: Callable[[], float] = time.time):
+        self.clock = clock
+        self._data: Dict[str, Tuple[Optional[float], bytes]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str) -> Optional[bytes]:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return None
+            if entry[0] is not None and entry[0] <= self.clock():
+                del self._data[name]
+                return None
+            return entry[1]
+
+    def set(self, name: str, value: bytes, ex: Optional[int] = None, px: Optional[int] = None,
+            nx: bool = False) -> Optional[bool]:
+        now = self.clock()
+        expires_at = None
+        if px is not None:
+            expires_at = now + px / 1000.0
+        elif ex is not None:
+            expires_at = now + ex
+        with self._lock:
+            if nx:
+                entry = self._data.get(name)
+                if entry is not None and (entry[0] is None or entry[0] > now):
+                    return None
+            self._data[name] = (expires_at, bytes(value))
+        return True
+
+    def _zset(self, name: str) -> Dict[str, float]:
+        entry = self._data.get(name)
+        if entry is None or (entry[0] is not None and entry[0] <= self.clock()):
+            entry = self._data[name] = (None, {})
+        return entry[1]
+
+    def zincrby(self, name: str, amount: float, value: str) -> float:
+        with self._lock:
+            zset = self._zset(name)
+            zset[value] = zset.get(value, 0.0) + amount
+            return zset[value]
+
+    def zrange(self, name: str, start: int, end: int, withscores: bool = False):
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None or (entry[0] is not None and entry[0] <= self.clock()):
+                return []
+            ranked = sorted(entry[1].items(), key=lambda item: (item[1], item[0]))
+        ranked = ranked[start:None if end == -1 else end + 1]
+        return [(member.encode("utf-8"), score) for member, score in ranked] if withscores else \
+            [member.encode("utf-8") for member, _ in ranked]
+
+    def zremrangebyscore(self, name: str, min: str, max: str) -> int:
+        # Supports the ("-inf", "(<score>") form used by RedisTier
+        bound = float(max.lstrip("("))
+        with self._lock:
+            zset = self._zset(name)
+            removed = [member for member, score in zset.items() if score < bound]
+            for member in removed:
+                del zset[member]
+            return len(removed)
+
+    def pexpire(self, name: str, time: int) -> bool:
+        with self._lock:
+            entry = self._data.get(name)
+            if entry is None:
+                return False
+            self._data[name] = (self.clock() + time / 1000.0, entry[1])
+            return True
+
+    def delete(self, *names: str) -> int:
+        with self._lock:
+            return sum(self._data.pop(name, None) is not None for name in names)
+
+    def scan_iter(self, match: str = "*"):
+        with self._lock:
+            keys = [name for name in self._data if fnmatch.fnmatchcase(name, match)]
+        return iter(keys)
+
+    def ping(self) -> bool:
+        return True
+
+
+class TieredCache:
+    """
+    Namespaced cache with an in-memory LRU tier in front of a shared tier.
+
+    The shared tier is SQLite on a single host or Redis across replicas. Values
+    must be JSON-serializable and large ones are compressed in the shared tier.
+    Each namespace has its own TTL; lookups are single-key hash, primary-key or
+    Redis GET reads regardless of cache size.
+    """
+
+    def __init__(self, path: Optional[str] = None, memory_max_bytes: int = 64 * 1024 * 1024,
+                 namespace_ttls: Optional[Dict[str, int]] = None, default_ttl: int = DEFAULT_TTL_SECONDS,
+                 clock: Callable[[], float] = time.time, shared=None,
+                 compress_min_bytes: int = COMPRESS_MIN_BYTES, memory_ttl: Optional[float] = MEMORY_TTL_SECONDS):
+        """
+        Initialize the cache.
+
+        Args:
+            path (str): SQLite database path for the shared tier; ignored when shared is given
+            memory_max_bytes (int): Size limit of the in-memory tier
+            namespace_ttls (Dict[str, int]): TTL in seconds by namespace
+            default_ttl (int): TTL for namespaces without their own
+            clock (Callable): Time source, for tests
+            shared: Shared tier (SQLiteTier or RedisTier); None with no path keeps the cache in memory only
+            compress_min_bytes (int): Compress shared-tier values at least this large
+            memory_ttl (float): With a shared tier, seconds before the memory copy is re-read from it,
+                so overwrites and deletes by other replicas are seen; None keeps copies until they expire
+        """
+        self.stats = CacheStats()
+        self.memory = MemoryTier(memory_max_bytes, self.stats)
+        self.shared = shared if shared is not None else (SQLiteTier(path) if path else None)
+        self.namespace_ttls = dict(namespace_ttls or {})
+        self.default_ttl = default_ttl
+        self.clock = clock
+        self.compress_min_bytes = compress_min_bytes
+        self.memory_ttl = memory_ttl
+        self._compute_locks: Dict[str, threading.Lock] = {}
+        self._compute_locks_lock = threading.Lock()
+        self._add_lock = threading.Lock()
+        self._scores: Dict[str, Tuple[float, Dict[str, float]]] = {}  # Scores without a shared tier
+
+    @staticmethod
+    def _key(namespace: str, key: str) -> str:
+        return f"{namespace}:{key}"
+
+    def _encode(self, payload: bytes) -> bytes:
+        if len(payload) >= self.compress_min_bytes:
+            return _COMPRESSED + zlib.compress(payload, 6)
+        return _RAW + payload
+
+    @staticmethod
+    def _decode(stored: bytes) -> bytes:
+        marker, body = stored[:1], stored[1:]
+        if marker == _COMPRESSED:
+            return zlib.decompress(body)
+        if marker == _RAW:
+            return body
+        raise ValueError(f"Unknown cache payload marker {marker!r}")
+
+    def _remember(self, full_key: str, created_at: float, expires_at: float, payload: bytes, now: float) -> None:
+        """Keep a memory copy, expiring it early when other replicas may change the shared entry."""
+        if self.shared is not None and self.memory_ttl is not None:
+            expires_at = min(expires_at, now + self.memory_ttl)
+        self.memory.set(full_key, created_at, expires_at, payload)
+
+    def set_ttl(self, namespace: str, ttl: int) -> None:
+        """Set the TTL in seconds for a namespace."""
+        self.namespace_ttls[namespace] = ttl
+
+    def ttl(self, namespace: str) -> int:
+        """Return the TTL in seconds for a namespace."""
+        return self.namespace_ttls.get(namespace, self.default_ttl)
+
+    def get(self, namespace: str, key: str, max_age: Optional[float] = None) -> Tuple[bool, Any]:
+        """
+        Look up a value.
+
+        Args:
+            namespace (str): Cache namespace
+            key (str): Key within the namespace
+            max_age (float): Optionally reject entries older than this many seconds
+
+        Returns:
+            Tuple[bool, Any]: (hit, value)
+        """
+        full_key = self._key(namespace, key)
+        now = self.clock()
+
+        entry = self.memory.get(full_key, now)
+        if entry is not None and (max_age is None or entry[0] >= now - max_age):
+            self.stats.incr("memory_hits", namespace)
+            return True, json.loads(entry[2])
+
+        if self.shared is not None:
+            try:
+                row = self.shared.get(full_key, now)
+                if row is not None and (max_age is None or row[0] >= now - max_age):
+                    created_at, expires_at, stored = row
+                    payload = self._decode(bytes(stored))
+                    self._remember(full_key, created_at, expires_at, payload, now)
+                    self.stats.incr("shared_hits", namespace)
+                    return True, json.loads(payload)
+            except Exception as e:
+                # A cache outage degrades to misses instead of failing the request
+                print(f"Cache read error for {full_key}: {str(e)}")
+                self.stats.incr("errors", namespace)
+
+        self.stats.incr("misses", namespace)
+        return False, None
+
+    def set(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> None:
+        """
+        Store a value in both tiers.
+
+        Args:
+            namespace (str): Cache namespace
+            key (str): Key within the namespace
+            value (Any): JSON-serializable value
+            ttl (int): TTL in seconds; defaults to the namespace TTL
+        """
+        payload = json.dumps(value).encode("utf-8")
+        now = self.clock()
+        expires_at = now + (self.ttl(namespace) if ttl is None else ttl)
+        full_key = self._key(namespace, key)
+
+        if self.shared is not None:
+            try:
+                purged = self.shared.set(full_key, namespace, self._encode(payload), now, expires_at)
+                if purged:
+                    self.stats.incr("expired", amount=purged)
+            except Exception as e:
+                print(f"Cache write error for {full_key}: {str(e)}")
+                self.stats.incr("errors", namespace)
+        self._remember(full_key, now, expires_at, payload, now)
+        self.stats.incr("sets", namespace)
+
+    def add(self, namespace: str, key: str, value: Any, ttl: Optional[int] = None) -> bool:
+        """
+        Store a value only if the key has no live entry, atomically across replicas
+        when the shared tier is Redis or SQLite. Useful as a lease or run-once marker.
+
+        Args:
+            namespace (str): Cache namespace
+            key (str): Key within the namespace
+            value (Any): JSON-serializable value
+            ttl (int): TTL in seconds; defaults to the namespace TTL
+
+        Returns:
+            bool: True if this call stored the value; False when the shared tier failed
+        """
+        payload = json.dumps(value).encode("utf-8")
+        now = self.clock()
+        expires_at = now + (self.ttl(namespace) if ttl is None else ttl)
+        full_key = self._key(namespace, key)
+
+        with self._add_lock:
+            if self.shared is not None:
+                try:
+                    added = self.shared.add(full_key, namespace, self._encode(payload), now, expires_at)
+                except Exception as e:
+                    # Without the shared tier no replica can claim the key
+                    print(f"Cache write error for {full_key}: {str(e)}")
+                    self.stats.incr("errors", namespace)
+                    return False
+            else:
+                added = self.memory.get(full_key, now) is None
+            if added:
+                self._remember(full_key, now, expires_at, payload, now)
+                self.stats.incr("sets", namespace)
+        return added
+
+    def incr_score(self, namespace: str, key: str, member: str, amount: float = 1.0,
+                   ttl: Optional[int] = None) -> Optional[float]:
+        """
+        Add to a member's score in a scored set, atomically across replicas.
+
+        Scored sets are counters shared through the shared tier (sorted sets on Redis).
+        Every increment renews the TTL, of the whole set on Redis and of the member on SQLite.
+
+        Args:
+            namespace (str): Cache namespace
+            key (str): Key of the set within the namespace
+            member (str): Member whose score changes
+            amount (float): Amount added; negative to subtract
+            ttl (int): TTL in seconds; defaults to the namespace TTL
+
+        Returns:
+            float: The new score, or None when the shared tier failed
+        """
+        now = self.clock()
+        expires_at = now + (self.ttl(namespace) if ttl is None else ttl)
+        full_key = self._key(namespace, key)
+
+        if self.shared is None:
+            with self._add_lock:
+                entry = self._scores.get(full_key)
+                scores = entry[1] if entry is not None and entry[0] > now else {}
+                scores[member] = scores.get(member, 0.0) + amount
+                self._scores[full_key] = (expires_at, scores)
+                return scores[member]
+        try:
+            return self.shared.incr_score(full_key, namespace, member, amount, now, expires_at)
+        except Exception as e:
+            print(f"Cache write error for {full_key}: {str(e)}")
+            self.stats.incr("errors", namespace)
+            return None
+
+    def scores(self, namespace: str, key: str) -> Dict[str, float]:
+        """Return every member's score in a scored set; empty when it is missing or the shared tier failed."""
+        now = self.clock()
+        full_key = self._key(namespace, key)
+
+        if self.shared is None:
+            with self._add_lock:
+                entry = self._scores.get(full_key)
+                return dict(entry[1]) if entry is not None and entry[0] > now else {}
+        try:
+            return self.shared.scores(full_key, now)
+        except Exception as e:
+            print(f"Cache read error for {full_key}: {str(e)}")
+            self.stats.incr("errors", namespace)
+            return {}
+
+    def remove_scores_below(self, namespace: str, key: str, max_score: float) -> int:
+        """Remove the members of a scored set scoring below max_score; returns how many were removed."""
+        full_key = self._key(namespace, key)
+
+        if self.shared is None:
+            with self._add_lock:
+                entry = self._scores.get(full_key)
+                if entry is None:
+                    return 0
+                removed = [member for member, score in entry[1].items() if score < max_score]
+                for member in removed:
+                    del entry[1][member]
+                return len(removed)
+        try:
+            return self.shared.remove_scores_below(full_key, max_score, self.clock())
+        except Exception as e:
+            print(f"Cache write error for {full_key}: {str(e)}")
+            self.stats.incr("errors", namespace)
+            return 0
+
+    def delete(self, namespace: str, key: str) -> None:
+        """Remove a value from both tiers."""
+        full_key = self._key(namespace, key)
+        self.memory.delete(full_key)
+        self._scores.pop(full_key, None)
+        if self.shared is not None:
+            try:
+                self.shared.delete(full_key)
+            except Exception as e:
+                print(f"Cache delete error for {full_key}: {str(e)}")
+                self.stats.incr("errors", namespace)
+
+    def clear(self, namespace: Optional[str] = None) -> None:
+        """Remove every value, or every value in one namespace."""
+        prefix = "" if namespace is None else self._key(namespace, "")
+        self.memory.clear(prefix)
+        with self._add_lock:
+            for key in [k for k in self._scores if k.startswith(prefix)]:
+                del self._scores[key]
+        if self.shared is not None:
+            try:
+                self.shared.clear(namespace)
+            except Exception as e:
+                print(f"Cache clear error for {namespace or 'all namespaces'}: {str(e)}")
+                self.stats.incr("errors", namespace)
+
+    def get_or_compute(self, namespace: str, key: str, compute: Callable[[], Any],
+                       ttl: Optional[int] = None) -> Any:
+        """
+        Return the cached value, computing and storing it on a miss.
+
+        Concurrent callers for the same key wait for one computation instead of repeating it.
+
+        Args:
+            namespace (str): Cache namespace
+            key (str): Key within the namespace
+            compute (Callable[[], Any]): Produces the value on a miss
+            ttl (int): TTL in seconds; defaults to the namespace TTL
+
+        Returns:
+            Any: Cached or computed value
+        """
+        hit, value = self.get(namespace, key)
+        if hit:
+            return value
+
+        full_key = self._key(namespace, key)
+        with self._compute_locks_lock:
+            lock = self._compute_locks.setdefault(full_key, threading.Lock())
+        with lock:
+            try:
+                hit, value = self.get(namespace, key)
+                if hit:
+                    return value
+                value = compute()
+                self.set(namespace, key, value, ttl)
+                return value
+            finally:
+                with self._compute_locks_lock:
+                    self._compute_locks.pop(full_key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Return hit/miss/eviction counters, the memory tier size and the shared tier type."""
+        return {
+            **self.stats.snapshot(),
+            "shared_tier": type(self.shared).__name__ if self.shared is not None else None,
+            "memory_bytes": self.memory.size,
+            "memory_max_bytes": self.memory.max_bytes
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def _shared_tier_from_env():
+    """Build the shared tier selected by CACHE_BACKEND."""
+    backend = os.getenv("CACHE_BACKEND", "sqlite").lower()
+    prefix = os.getenv("CACHE_KEY_PREFIX", "stocksage:")
+
+    if backend == "redis":
+        if redis is None:
+            raise ImportError("CACHE_BACKEND=redis requires the redis package")
+        client = redis.Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"),
+                                      socket_timeout=2, socket_connect_timeout=2)
+        return RedisTier(client, prefix)
+    if backend == "inprocess_redis":
+        return RedisTier(InMemoryRedis(), prefix)
+    if backend == "memory":
+        return None
+
+    default_path = os.path.join(
+        os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "cache.sqlite3"
+    )
+    path = os.getenv("CACHE_DB_PATH", default_path)
+    return SQLiteTier(path) if path else None
+
+
+def get_cache() -> TieredCache:
+    """
+    Return the process-wide cache, configured from the environment.
+
+    CACHE_BACKEND selects the shared tier: "sqlite" (default, at CACHE_DB_PATH), "redis"
+    (at REDIS_URL, shared by all replicas), "inprocess_redis" (the Redis tier on an in-process
+    stand-in, not shared) or "memory". CACHE_KEY_PREFIX prefixes Redis keys, CACHE_MEMORY_MAX_BYTES
+    sizes the in-memory tier, CACHE_MEMORY_TTL_SECONDS bounds how long memory copies of shared
+    entries are served before re-reading them, and CACHE_COMPRESS_MIN_BYTES sets the compression
+    threshold.
+    """
+    global _default_cache
+    with _default_lock:
+        if _default_cache is None:
+            _default_cache = TieredCache(
+                shared=_shared_tier_from_env(),
+                memory_max_bytes=int(os.getenv("CACHE_MEMORY_MAX_BYTES", str(64 * 1024 * 1024))),
+                compress_min_bytes=int(os.getenv("CACHE_COMPRESS_MIN_BYTES", str(COMPRESS_MIN_BYTES))),
+                memory_ttl=float(os.getenv("CACHE_MEMORY_TTL_SECONDS", str(MEMORY_TTL_SECONDS)))
+            )
+        return _default_cache
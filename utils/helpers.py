@@ -1,65 +1,37 @@
 # utils/helpers.py
-import os
-import json
-from datetime import datetime
-import requests
-from typing import Dict, Any, List, Tuple
+from typing import Dict, Any, List, Optional, Tuple
+from utils.cache import get_cache
+from utils.prices import get_price_service
 
-def create_cache_dir():
-    """Create cache directory if it doesn't exist."""
-    cache_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache")
-    if not os.path.exists(cache_dir):
-        os.makedirs(cache_dir)
-    return cache_dir
-
-def save_to_cache(key: str, data: Any) -> str:
+def save_to_cache(key: str, data: Any, namespace: str = "default") -> str:
     """
     Save data to cache.
     
     Args:
         key (str): Cache key
-        data (Any): Data to cache
+        data (Any): JSON-serializable data to cache
+        namespace (str): Cache namespace, which sets the TTL
         
     Returns:
-        str: Cache file path
+        str: Cache key
     """
-    cache_dir = create_cache_dir()
-    cache_file = os.path.join(cache_dir, f"{key}_{datetime.now().strftime('%Y%m%d')}.json")
-    
-    with open(cache_file, "w") as f:
-        json.dump(data, f)
-    
-    return cache_file
+    get_cache().set(namespace, key, data)
+    return key
 
-def load_from_cache(key: str, max_age_days: int = 1) -> Tuple[bool, Any]:
+def load_from_cache(key: str, max_age_days: Optional[float] = None, namespace: str = "default") -> Tuple[bool, Any]:
     """
-    Load data from cache if it exists and is not too old.
+    Load data from cache if it exists and has not expired.
     
     Args:
         key (str): Cache key
-        max_age_days (int): Maximum age in days
+        max_age_days (float): Optionally reject entries older than this, in days
+        namespace (str): Cache namespace
         
     Returns:
         Tuple[bool, Any]: (success, data)
     """
-    cache_dir = create_cache_dir()
-    cache_file = os.path.join(cache_dir, f"{key}_{datetime.now().strftime('%Y%m%d')}.json")
-    
-    if os.path.exists(cache_file):
-        # Check if file is recent enough
-        file_time = datetime.fromtimestamp(os.path.getmtime(cache_file))
-        age = (datetime.now() - file_time).days
-        
-        if age <= max_age_days:
-            with open(cache_file, "r") as f:
-                return True, json.load(f)
-    
-    # Older cache files with the same key
-    for file in os.listdir(cache_dir):
-        if file.startswith(f"{key}_") and file.endswith(".json"):
-            os.remove(os.path.join(cache_dir, file))
-    
-    return False, None
+    max_age = max_age_days * 24 * 60 * 60 if max_age_days is not None else None
+    return get_cache().get(namespace, key, max_age=max_age)
 
 def fetch_stock_price(ticker: str) -> Dict[str, Any]:
     """
@@ -71,50 +43,8 @@ def fetch_stock_price(ticker: str) -> Dict[str, Any]:
     Returns:
         Dict[str, Any]: Price information
     """
-    try:
-        # Try the cache first
-        cache_hit, cache_data = load_from_cache(f"price_{ticker}")
-        if cache_hit:
-            return cache_data
-        
-        # Alpha Vantage API (free tier, limited requests)
-        api_key = os.getenv("ALPHA_VANTAGE_API_KEY", "demo")
-        url = f"https://www.alphavantage.co/query?function=GLOBAL_QUOTE&symbol={ticker}&apikey={api_key}"
-        
-        response = requests.get(url)
-        data = response.json()
-        
-        if "Global Quote" in data and data["Global Quote"]:
-            price_data = {
-                "price": float(data["Global Quote"].get("05. price", 0)),
-                "change": float(data["Global Quote"].get("09. change", 0)),
-                "change_percent": data["Global Quote"].get("10. change percent", "0%"),
-                "volume": int(data["Global Quote"].get("06. volume", 0)),
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            }
-            
-            # Cache the result
-            save_to_cache(f"price_{ticker}", price_data)
-            
-            return price_data
-        else:
-            return {
-                "price": 0,
-                "change": 0,
-                "change_percent": "0%",
-                "volume": 0,
-                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-                "error": "Price data not available"
-            }
-    except Exception as e:
-        return {
-            "price": 0,
-            "change": 0,
-            "change_percent": "0%",
-            "volume": 0,
-            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            "error": str(e)
-        }
+    # Quotes are cached in memory by the price service with intraday TTLs
+    return get_price_service().get_quote(ticker)
 
 def clean_text(text: str) -> str:
     """
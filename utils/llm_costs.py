@@ -0,0 +1,193 @@
+# utils/llm_costs.py
+import threading
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.passages import count_tokens
+
+
+class TokenBudgetExceeded(RuntimeError):
+    """Raised before an LLM call that would take a request over its token budget."""
+
+
+def price_for(model: str, pricing: Dict[str, Tuple[float, float]]) -> Optional[Tuple[float, float]]:
+    """
+    Return the (prompt, completion) USD price per million tokens of a model.
+
+    Dated model names such as "gpt-4o-mini-2024-07-18" use the price of the
+    longest matching prefix.
+    """
+    matches = [name for name in pricing if model and model.startswith(name)]
+    return pricing[max(matches, key=len)] if matches else None
+
+
+def estimate_cost(model: str, prompt_tokens: int, completion_tokens: int,
+                  pricing: Dict[str, Tuple[float, float]]) -> float:
+    """Estimated USD cost of an LLM call; 0 for models without a price."""
+    price = price_for(model, pricing)
+    if price is None:
+        return 0.0
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+
+def reported_usage(response) -> Optional[Tuple[int, int]]:
+    """(prompt, completion) tokens reported with an LLMResult, or None when the provider sent none."""
+    prompt_tokens = completion_tokens = 0
+    reported = False
+    for generations in response.generations:
+        for generation in generations:
+            usage = getattr(getattr(generation, "message", None), "usage_metadata", None)
+            if usage:
+                prompt_tokens += usage.get("input_tokens", 0)
+                completion_tokens += usage.get("output_tokens", 0)
+                reported = True
+    if reported:
+        return prompt_tokens, completion_tokens
+    token_usage = (response.llm_output or {}).get("token_usage") or {}
+    if token_usage:
+        return token_usage.get("prompt_tokens", 0), token_usage.get("completion_tokens", 0)
+    return None
+
+
+class RequestCostTracker(BaseCallbackHandler):
+    """
+    LangChain callback recording the token usage and cost of one request.
+
+    Usage is attributed to the LangGraph node that made the call, from the
+    "langgraph_node" metadata every nested run inherits. With a token budget,
+    an LLM call whose prompt would exceed it raises TokenBudgetExceeded, which
+    fails the calling node instead of spending more.
+    """
+
+    # Let TokenBudgetExceeded propagate instead of being logged by the callback manager
+    raise_error = True
+
+    def __init__(self, ticker: Optional[str] = None, token_budget: int = 0,
+                 pricing: Optional[Dict[str, Tuple[float, float]]] = None,
+                 default_model: str = "gpt-4o-mini"):
+        """
+        Args:
+            ticker (str): Ticker the request analyzes
+            token_budget (int): Maximum prompt plus completion tokens; 0 disables the budget
+            pricing (dict): Model name -> (prompt, completion) USD per million tokens
+            default_model (str): Model assumed when the callback does not report one
+        """
+        self.ticker = ticker.upper() if ticker else None
+        self.token_budget = token_budget
+        self.pricing = pricing or {}
+        self.default_model = default_model
+        self.lock = threading.Lock()
+        self.pending: Dict[UUID, Tuple[str, str, int]] = {}  # run id -> (node, model, estimated prompt tokens)
+        self.by_node: Dict[str, Dict[str, Any]] = {}
+        self.degraded: Dict[str, str] = {}
+        self.budget_exceeded = False
+
+    @staticmethod
+    def _model(metadata, kwargs, default):
+        params = kwargs.get("invocation_params") or {}
+        return (metadata or {}).get("ls_model_name") or params.get("model_name") or params.get("model") or default
+
+    def _start(self, run_id, prompt_text, metadata, kwargs):
+        node = (metadata or {}).get("langgraph_node") or "other"
+        model = self._model(metadata, kwargs, self.default_model)
+        estimated = count_tokens(prompt_text, model)
+        with self.lock:
+            if self.token_budget and self._used_tokens() + estimated > self.token_budget:
+                self.budget_exceeded = True
+                raise TokenBudgetExceeded(
+                    f"Token budget of {self.token_budget} exceeded: {self._used_tokens()} used, "
+                    f"{node} call needs about {estimated} more"
+                )
+            self.pending[run_id] = (node, model, estimated)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        text = "\n".join(str(message.content) for batch in messages for message in batch)
+        self._start(run_id, text, metadata, kwargs)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        self._start(run_id, "\n".join(prompts), metadata, kwargs)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self.lock:
+            node, model, estimated = self.pending.pop(run_id, ("other", self.default_model, 0))
+        prompt_tokens, completion_tokens = self._usage(response, model, estimated)
+        self.record(node, model, prompt_tokens, completion_tokens)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self.lock:
+            self.pending.pop(run_id, None)
+
+    @staticmethod
+    def _usage(response, model, estimated_prompt_tokens):
+        """Reported (prompt, completion) tokens, or estimates when the provider did not report usage."""
+        usage = reported_usage(response)
+        if usage is not None:
+            return usage
+        # Streamed responses carry no usage unless requested: count the text instead
+        completion_tokens = sum(count_tokens(generation.text, model)
+                                for generations in response.generations for generation in generations)
+        return estimated_prompt_tokens, completion_tokens
+
+    def record(self, node: str, model: str, prompt_tokens: int, completion_tokens: int) -> None:
+        """Add the usage of one LLM call to a node's totals."""
+        cost = estimate_cost(model, prompt_tokens, completion_tokens, self.pricing)
+        with self.lock:
+            totals = self.by_node.setdefault(node, {
+                "calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0
+            })
+            totals["calls"] += 1
+            totals["prompt_tokens"] += prompt_tokens
+            totals["completion_tokens"] += completion_tokens
+            totals["cost_usd"] += cost
+
+    def _used_tokens(self) -> int:
+        return sum(t["prompt_tokens"] + t["completion_tokens"] for t in self.by_node.values())
+
+    def remaining_tokens(self) -> float:
+        """Tokens left in the budget; infinite without a budget."""
+        if not self.token_budget:
+            return float("inf")
+        with self.lock:
+            return max(0, self.token_budget - self._used_tokens())
+
+    def note_degradation(self, stage: str, action: str) -> None:
+        """Record that a stage was downgraded or skipped to stay within the budget."""
+        with self.lock:
+            self.degraded[stage] = action
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Report the request's usage.
+
+        Returns:
+            dict: Token and cost totals, per-node breakdown, budget and degraded stages
+        """
+        with self.lock:
+            by_node = {node: {**totals, "cost_usd": round(totals["cost_usd"], 6)}
+                       for node, totals in self.by_node.items()}
+            prompt_tokens = sum(t["prompt_tokens"] for t in self.by_node.values())
+            completion_tokens = sum(t["completion_tokens"] for t in self.by_node.values())
+            return {
+                "ticker": self.ticker,
+                "llm_calls": sum(t["calls"] for t in self.by_node.values()),
+                "prompt_tokens": prompt_tokens,
+                "completion_tokens": completion_tokens,
+                "total_tokens": prompt_tokens + completion_tokens,
+                "cost_usd": round(sum(t["cost_usd"] for t in self.by_node.values()), 6),
+                "token_budget": self.token_budget or None,
+                "budget_exceeded": self.budget_exceeded,
+                "degraded_stages": dict(self.degraded),
+                "by_node": by_node
+            }
+
+
+def find_cost_tracker(config: Optional[Dict[str, Any]]) -> Optional[RequestCostTracker]:
+    """Return the RequestCostTracker among a runnable config's callbacks, if any."""
+    callbacks = (config or {}).get("callbacks")
+    handlers: List = getattr(callbacks, "handlers", callbacks) or []
+    for handler in handlers:
+        if isinstance(handler, RequestCostTracker):
+            return handler
+    return None
@@ -1,124 +1,448 @@
 # utils/metrics_tracker.py
 
+import hashlib
+import math
+import threading
 import time
-from typing import Dict, Any, List
-import pandas as pd
+from collections import OrderedDict, deque
+from contextlib import contextmanager
 from datetime import datetime
+from typing import Callable, Dict, Any, Iterable, List, Optional, Tuple
+from urllib.parse import urlparse
 
-class ResearchMetricsTracker:
+LATENCY_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class QuantileSketch:
     """
-    Tracks success metrics for the Research Agent.
+    Streaming quantile estimate with bounded memory and relative accuracy.
+
+    Values are counted in logarithmic buckets, so any quantile is within
+    relative_accuracy of the true value. When more than max_buckets are in
+    use, the lowest buckets are merged, which only affects the low quantiles.
+    """
+
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.max_buckets = max_buckets
+        self.buckets: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.total = 0.0
+        self.min = None
+        self.max = None
+
+    def add(self, value: float) -> None:
+        """Add a non-negative observation."""
+        value = max(0.0, float(value))
+        self.count += 1
+        self.total += value
+        self.min = value if self.min is None else min(self.min, value)
+        self.max = value if self.max is None else max(self.max, value)
+        if value < 1e-9:
+            self.zero_count += 1
+            return
+        index = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        if len(self.buckets) > self.max_buckets:
+            lowest = sorted(self.buckets)[:2]
+            self.buckets[lowest[1]] += self.buckets.pop(lowest[0])
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Estimate a quantile.
+
+        Args:
+            q (float): Quantile between 0 and 1
+
+        Returns:
+            float: Estimated value, or None when empty
+        """
+        if self.count == 0:
+            return None
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen > rank:
+                # Midpoint of the bucket, clamped to the observed range
+                value = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(value, self.min), self.max)
+        return self.max
+
+    def summary(self, quantiles: Iterable[float] = LATENCY_QUANTILES, digits: int = 3) -> Dict[str, Any]:
+        """Count, mean, min, max and the requested quantiles, rounded to digits decimals."""
+        def rounded(value):
+            return round(value, digits) if value is not None else None
+
+        summary = {
+            "count": self.count,
+            "mean": rounded(self.total / self.count) if self.count else None,
+            "min": rounded(self.min),
+            "max": rounded(self.max)
+        }
+        for q in quantiles:
+            summary[f"p{int(q * 100)}"] = rounded(self.quantile(q))
+        return summary
+
+
+class SpaceSavingCounter:
+    """
+    Approximate top-K counts in fixed memory (the Space-Saving algorithm).
+
+    At most capacity keys are tracked. A new key replaces the least counted
+    one and inherits its count, so counts are overestimated by at most the
+    recorded error, and any key more frequent than total / capacity is kept.
     """
-    
+
+    def __init__(self, capacity: int = 100):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+        self.total = 0
+
+    def add(self, key: str, count: int = 1) -> None:
+        """Count occurrences of a key."""
+        self.total += count
+        if key in self.counts:
+            self.counts[key] += count
+            return
+        if len(self.counts) < self.capacity:
+            self.counts[key] = count
+            self.errors[key] = 0
+            return
+        evicted = min(self.counts, key=self.counts.get)
+        floor = self.counts.pop(evicted)
+        self.errors.pop(evicted)
+        self.counts[key] = floor + count
+        self.errors[key] = floor
+
+    def top(self, k: int) -> List[Tuple[str, int]]:
+        """Return the k most frequent keys with their (upper bound) counts."""
+        return sorted(self.counts.items(), key=lambda item: item[1], reverse=True)[:k]
+
+
+class DistinctCounter:
+    """
+    Approximate distinct count in fixed memory (HyperLogLog, about 3% error).
+    """
+
+    def __init__(self, precision: int = 10):
+        self.precision = precision
+        self.size = 1 << precision
+        self.registers = bytearray(self.size)
+
+    def add(self, value: str) -> None:
+        """Count a value."""
+        hashed = int.from_bytes(hashlib.sha1(value.encode("utf-8")).digest()[:8], "big")
+        index = hashed >> (64 - self.precision)
+        rest = (hashed << self.precision) & ((1 << 64) - 1)
+        rank = 1
+        while rank <= 64 - self.precision and not rest & (1 << 63):
+            rank += 1
+            rest <<= 1
+        self.registers[index] = max(self.registers[index], rank)
+
+    def count(self) -> int:
+        """Estimate the number of distinct values added."""
+        alpha = 0.7213 / (1 + 1.079 / self.size)
+        estimate = alpha * self.size ** 2 / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.size and zeros:
+            # Linear counting is more accurate for small cardinalities
+            estimate = self.size * math.log(self.size / zeros)
+        return int(round(estimate))
+
+
+class StageStats:
+    """Call count, failures and latency sketch of one workflow stage."""
+
     def __init__(self):
-        """Initialize the metrics tracker."""
-        self.metrics = {
-            "requests": 0,
-            "successful_requests": 0,
-            "failed_requests": 0,
-            "total_execution_time": 0,
-            "avg_execution_time": 0,
-            "stocks_researched": set(),
-            "research_timestamps": [],
-            "error_types": {},
-            "source_domains": {},
-            "data_freshness": {}
+        self.calls = 0
+        self.failures = 0
+        self.latency = QuantileSketch()
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "failures": self.failures,
+            "latency_seconds": self.latency.summary()
         }
-    
+
+
+class ResearchMetricsTracker:
+    """
+    Tracks success metrics for the Research Agent.
+
+    Memory is fixed regardless of how long the process runs: latencies go into
+    quantile sketches, domains, tickers and errors into bounded top-K counters,
+    and recent requests into a ring buffer. All methods are thread-safe.
+    """
+
+    def __init__(self, recent_capacity: int = 256, top_k_capacity: int = 100,
+                 freshness_capacity: int = 1000, max_stages: int = 32,
+                 clock: Callable[[], float] = time.time):
+        """
+        Initialize the metrics tracker.
+
+        Args:
+            recent_capacity: Requests kept in the recent-requests ring buffer
+            top_k_capacity: Keys tracked by each top-K counter
+            freshness_capacity: Tickers whose data freshness is kept
+            max_stages: Distinct stage names tracked
+            clock: Wall-clock time source, for tests
+        """
+        self.recent_capacity = recent_capacity
+        self.top_k_capacity = top_k_capacity
+        self.freshness_capacity = freshness_capacity
+        self.max_stages = max_stages
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.started_at = clock()
+
+        self.requests = 0
+        self.successful_requests = 0
+        self.failed_requests = 0
+        self.in_flight = 0
+        self.latency = QuantileSketch()
+        self.stages: Dict[str, StageStats] = {}
+        self.recent = deque(maxlen=recent_capacity)
+        self.stocks_researched = DistinctCounter()
+        self.tickers = SpaceSavingCounter(top_k_capacity)
+        self.source_domains = SpaceSavingCounter(top_k_capacity)
+        self.error_types = SpaceSavingCounter(top_k_capacity)
+        self.data_freshness: "OrderedDict[str, Any]" = OrderedDict()
+        self.last_research_time = None
+
+        self.llm_usage = {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost_usd": 0.0}
+        self.node_usage: Dict[str, Dict[str, Any]] = {}
+        self.request_cost = QuantileSketch()
+        self.ticker_costs = SpaceSavingCounter(top_k_capacity)
+        self.budget_exceeded_requests = 0
+        self.degraded_stages: Dict[str, int] = {}
+
     def start_request(self) -> float:
         """
         Start timing a new request.
-        
+
         Returns:
-            Start time in seconds
+            Start time in seconds (monotonic)
         """
-        self.metrics["requests"] += 1
-        return time.time()
-    
+        with self.lock:
+            self.requests += 1
+            self.in_flight += 1
+        return time.perf_counter()
+
+    @staticmethod
+    def _source_urls(result: Dict[str, Any]) -> List[str]:
+        """Article URLs of a workflow or research result."""
+        urls = [article.get("url") for article in
+                result.get("filtered_results", {}).get("filtered_articles", [])]
+        # Results of the standalone research agent
+        for step in result.get("research_data", {}).get("intermediate_steps", []):
+            if hasattr(step, "observation") and isinstance(step.observation, list):
+                urls.extend(item.get("source") for item in step.observation if isinstance(item, dict))
+        return [url for url in urls if url]
+
+    @staticmethod
+    def _domain(url: str) -> str:
+        if "://" not in url:
+            return url
+        return urlparse(url).netloc or url
+
     def end_request(self, start_time: float, result: Dict[str, Any], success: bool = True) -> None:
         """
         End timing a request and update metrics.
-        
+
         Args:
             start_time: Start time from start_request
-            result: Research result dictionary
+            result: Research or workflow result dictionary
             success: Whether the request was successful
         """
-        execution_time = time.time() - start_time
-        self.metrics["total_execution_time"] += execution_time
-        
-        if success:
-            self.metrics["successful_requests"] += 1
-            
-            # Track stock symbol
-            symbol = result.get("symbol")
-            if symbol:
-                self.metrics["stocks_researched"].add(symbol)
-            
-            # Track timestamp
-            self.metrics["research_timestamps"].append(datetime.now())
-            
-            # Track source domains
-            if "research_data" in result and "intermediate_steps" in result["research_data"]:
-                for step in result["research_data"]["intermediate_steps"]:
-                    if hasattr(step, "observation") and isinstance(step.observation, list):
-                        for item in step.observation:
-                            if isinstance(item, dict) and "source" in item:
-                                domain = item["source"].split('/')[2] if '://' in item["source"] else item["source"]
-                                self.metrics["source_domains"][domain] = self.metrics["source_domains"].get(domain, 0) + 1
-            
-            # Track data freshness
-            if "financial_data" in result:
-                fin_data = result["financial_data"]
-                last_updated = fin_data.get("last_updated")
-                if last_updated:
-                    self.metrics["data_freshness"][symbol] = last_updated
-        else:
-            self.metrics["failed_requests"] += 1
-            
-            # Track error types
-            error = result.get("error", "Unknown error")
-            error_type = error.split(':')[0] if ':' in error else error
-            self.metrics["error_types"][error_type] = self.metrics["error_types"].get(error_type, 0) + 1
-        
-        # Update average execution time
-        self.metrics["avg_execution_time"] = (
-            self.metrics["total_execution_time"] / 
-            (self.metrics["successful_requests"] + self.metrics["failed_requests"])
-        )
-    
+        execution_time = time.perf_counter() - start_time
+        symbol = result.get("ticker") or result.get("symbol")
+        symbol = symbol.upper() if isinstance(symbol, str) else None
+        domains = [self._domain(url) for url in self._source_urls(result)] if success else []
+
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - 1)
+            self.latency.add(execution_time)
+            now = self.clock()
+            self.recent.append({
+                "timestamp": now,
+                "ticker": symbol,
+                "duration_seconds": round(execution_time, 3),
+                "success": success
+            })
+
+            if success:
+                self.successful_requests += 1
+                self.last_research_time = now
+                if symbol:
+                    self.stocks_researched.add(symbol)
+                    self.tickers.add(symbol)
+                for domain in domains:
+                    self.source_domains.add(domain)
+
+                # Track data freshness of the most recently researched tickers
+                last_updated = result.get("financial_data", {}).get("last_updated")
+                if symbol and last_updated:
+                    self.data_freshness[symbol] = last_updated
+                    self.data_freshness.move_to_end(symbol)
+                    while len(self.data_freshness) > self.freshness_capacity:
+                        self.data_freshness.popitem(last=False)
+            else:
+                self.failed_requests += 1
+                error = str(result.get("error") or "Unknown error")
+                error_type = error.split(':')[0] if ':' in error else error
+                self.error_types.add(error_type[:200])
+
+    def record_stage(self, stage: str, duration: float, success: bool = True) -> None:
+        """
+        Record one execution of a workflow stage.
+
+        Args:
+            stage: Stage name, e.g. "research"
+            duration: Execution time in seconds
+            success: Whether the stage succeeded
+        """
+        with self.lock:
+            stats = self.stages.get(stage)
+            if stats is None:
+                if len(self.stages) >= self.max_stages:
+                    return
+                stats = self.stages[stage] = StageStats()
+            stats.calls += 1
+            if not success:
+                stats.failures += 1
+            stats.latency.add(duration)
+
+    def record_usage(self, usage: Dict[str, Any]) -> None:
+        """
+        Record the LLM usage of one request.
+
+        Args:
+            usage: RequestCostTracker summary
+        """
+        with self.lock:
+            for node, totals in usage.get("by_node", {}).items():
+                node_totals = self.node_usage.get(node)
+                if node_totals is None:
+                    if len(self.node_usage) >= self.max_stages:
+                        continue
+                    node_totals = self.node_usage[node] = dict.fromkeys(self.llm_usage, 0)
+                for key in self.llm_usage:
+                    node_totals[key] += totals.get(key, 0)
+                    self.llm_usage[key] += totals.get(key, 0)
+            self.request_cost.add(usage.get("cost_usd", 0.0))
+            if usage.get("ticker"):
+                self.ticker_costs.add(usage["ticker"], usage.get("cost_usd", 0.0))
+            if usage.get("budget_exceeded"):
+                self.budget_exceeded_requests += 1
+            for stage in usage.get("degraded_stages", {}):
+                if stage in self.degraded_stages or len(self.degraded_stages) < self.max_stages:
+                    self.degraded_stages[stage] = self.degraded_stages.get(stage, 0) + 1
+
+    @contextmanager
+    def stage(self, stage: str):
+        """
+        Time a block as a stage; exceptions count as failures and propagate.
+
+        Yields:
+            dict: Set "success" to False to record a failure without raising
+        """
+        outcome = {"success": True}
+        start = time.perf_counter()
+        try:
+            yield outcome
+        except Exception:
+            outcome["success"] = False
+            raise
+        finally:
+            self.record_stage(stage, time.perf_counter() - start, outcome["success"])
+
     def get_metrics_summary(self) -> Dict[str, Any]:
         """
         Get a summary of all tracked metrics.
-        
+
         Returns:
             Dictionary with metrics summary
         """
-        return {
-            "requests": self.metrics["requests"],
-            "success_rate": (self.metrics["successful_requests"] / self.metrics["requests"]) * 100 if self.metrics["requests"] > 0 else 0,
-            "avg_execution_time": self.metrics["avg_execution_time"],
-            "unique_stocks_researched": len(self.metrics["stocks_researched"]),
-            "top_source_domains": dict(sorted(self.metrics["source_domains"].items(), key=lambda x: x[1], reverse=True)[:5]),
-            "top_error_types": dict(sorted(self.metrics["error_types"].items(), key=lambda x: x[1], reverse=True)[:3]),
-            "last_research_time": max(self.metrics["research_timestamps"]) if self.metrics["research_timestamps"] else None
-        }
-    
+        with self.lock:
+            completed = self.successful_requests + self.failed_requests
+            window = [r for r in self.recent if r["timestamp"] >= self.clock() - 60]
+            latency = self.latency.summary()
+            return {
+                "requests": self.requests,
+                "in_flight": self.in_flight,
+                "success_rate": (self.successful_requests / completed) * 100 if completed > 0 else 0,
+                "avg_execution_time": latency["mean"] or 0,
+                "latency_seconds": latency,
+                "requests_last_minute": len(window),
+                "unique_stocks_researched": self.stocks_researched.count(),
+                "top_tickers": dict(self.tickers.top(5)),
+                "top_source_domains": dict(self.source_domains.top(5)),
+                "top_error_types": dict(self.error_types.top(3)),
+                "stages": {name: stats.summary() for name, stats in self.stages.items()},
+                "last_research_time": (datetime.fromtimestamp(self.last_research_time).isoformat()
+                                       if self.last_research_time else None),
+                "llm_usage": {
+                    **self.llm_usage,
+                    "cost_usd": round(self.llm_usage["cost_usd"], 6),
+                    "cost_per_request_usd": self.request_cost.summary(digits=6),
+                    "by_node": {node: {**totals, "cost_usd": round(totals["cost_usd"], 6)}
+                                for node, totals in self.node_usage.items()},
+                    "top_tickers_by_cost_usd": {ticker: round(cost, 6) for ticker, cost in self.ticker_costs.top(5)},
+                    "budget_exceeded_requests": self.budget_exceeded_requests,
+                    "degraded_stages": dict(self.degraded_stages)
+                },
+                "uptime_seconds": round(self.clock() - self.started_at, 1)
+            }
+
     def get_detailed_report(self) -> Dict[str, Any]:
         """
         Get a detailed metrics report including all tracked data.
-        
+
         Returns:
             Dictionary with detailed metrics
         """
-        return {
-            "summary": self.get_metrics_summary(),
-            "raw_metrics": {
-                k: list(v) if isinstance(v, set) else v 
-                for k, v in self.metrics.items()
+        summary = self.get_metrics_summary()
+        with self.lock:
+            return {
+                "summary": summary,
+                "raw_metrics": {
+                    "recent_requests": list(self.recent),
+                    "tickers": dict(self.tickers.top(self.top_k_capacity)),
+                    "source_domains": dict(self.source_domains.top(self.top_k_capacity)),
+                    "error_types": dict(self.error_types.top(self.top_k_capacity)),
+                    "ticker_costs_usd": {t: round(c, 6) for t, c in self.ticker_costs.top(self.top_k_capacity)},
+                    "data_freshness": dict(self.data_freshness)
+                }
             }
-        }
 
     def reset(self) -> None:
         """Reset all metrics."""
-        self.__init__()
\ No newline at end of file
+        with self.lock:
+            fresh = ResearchMetricsTracker(
+                self.recent_capacity, self.top_k_capacity, self.freshness_capacity,
+                self.max_stages, self.clock
+            )
+            state = {k: v for k, v in fresh.__dict__.items() if k != "lock"}
+            self.__dict__.update(state)
+
+
+_default_tracker = None
+_default_lock = threading.Lock()
+
+
+def get_metrics_tracker() -> ResearchMetricsTracker:
+    """Return the process-wide metrics tracker."""
+    global _default_tracker
+    with _default_lock:
+        if _default_tracker is None:
+            _default_tracker = ResearchMetricsTracker()
+        return _default_tracker
@@ -0,0 +1,188 @@
+# utils/passages.py
+import re
+from typing import List, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # Fall back to a character estimate
+    tiktoken = None
+
+# Terms that signal investment-relevant content in a passage
+FINANCIAL_TERMS = (
+    "revenue", "earnings", "eps", "profit", "margin", "guidance", "forecast",
+    "quarter", "q1", "q2", "q3", "q4", "fiscal", "growth", "sales", "income",
+    "analyst", "rating", "upgrade", "downgrade", "price target", "target price",
+    "buy", "sell", "hold", "outperform", "underperform", "overweight", "underweight",
+    "dividend", "buyback", "acquisition", "merger", "partnership", "launch",
+    "shares", "stock", "valuation", "volume", "volatility", "risk", "debt", "cash flow"
+)
+
+# Phrases typical of navigation, cookie banners and other page boilerplate
+BOILERPLATE_TERMS = (
+    "cookie", "subscribe", "sign up", "sign in", "log in", "newsletter",
+    "privacy policy", "terms of use", "all rights reserved", "advertisement",
+    "follow us", "share this", "related articles", "read more"
+)
+
+# Words dropped when matching a company name in text
+COMPANY_SUFFIXES = {
+    "inc", "inc.", "corp", "corp.", "corporation", "co", "co.", "company",
+    "ltd", "ltd.", "limited", "plc", "llc", "group", "holdings", "the", "and", "&"
+}
+
+_NUMBER_PATTERN = re.compile(r"[$₹€£]\s?\d|\d+(?:\.\d+)?\s?(?:%|percent|bn|billion|mn|million|crore|lakh)", re.IGNORECASE)
+_SENTENCE_PATTERN = re.compile(r"(?<=[.!?])\s+")
+
+_encodings = {}
+
+
+def _get_encoding(model: str):
+    """Return a cached tiktoken encoding for the model, or None if unavailable."""
+    if tiktoken is None:
+        return None
+    if model not in _encodings:
+        try:
+            _encodings[model] = tiktoken.encoding_for_model(model)
+        except Exception:
+            try:
+                _encodings[model] = tiktoken.get_encoding("cl100k_base")
+            except Exception:
+                _encodings[model] = None
+    return _encodings[model]
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """
+    Count the tokens in a text for the given model.
+
+    Args:
+        text (str): Input text
+        model (str): Model name used to pick the tokenizer
+
+    Returns:
+        int: Token count (estimated at 4 characters per token without tiktoken)
+    """
+    if not text:
+        return 0
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return max(1, len(text) // 4)
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_passages(text: str, max_tokens: int = 150, model: str = "gpt-4o-mini") -> List[str]:
+    """
+    Split text into passages of at most max_tokens, keeping lines and sentences whole.
+
+    Args:
+        text (str): Input text
+        max_tokens (int): Maximum tokens per passage
+        model (str): Model name used to pick the tokenizer
+
+    Returns:
+        List[str]: Passages in document order
+    """
+    # Break the text into units no larger than a passage
+    units = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line:
+            continue
+        if count_tokens(line, model) <= max_tokens:
+            units.append(line)
+            continue
+        for sentence in _SENTENCE_PATTERN.split(line):
+            if count_tokens(sentence, model) <= max_tokens:
+                units.append(sentence)
+            else:
+                words = sentence.split()
+                step = max(1, max_tokens * 3 // 4)  # Roughly 0.75 words per token
+                units.extend(" ".join(words[i:i + step]) for i in range(0, len(words), step))
+
+    # Merge consecutive units up to the passage size
+    passages = []
+    current, current_tokens = [], 0
+    for unit in units:
+        unit_tokens = count_tokens(unit, model) + 1  # Include the joining newline
+        if current and current_tokens + unit_tokens > max_tokens:
+            passages.append("\n".join(current))
+            current, current_tokens = [], 0
+        current.append(unit)
+        current_tokens += unit_tokens
+    if current:
+        passages.append("\n".join(current))
+
+    return passages
+
+
+def _company_terms(company_name: str) -> List[str]:
+    """Return the distinctive lower-case words of a company name."""
+    words = re.findall(r"[\w.&]+", company_name.lower())
+    return [w.strip(".") for w in words if w not in COMPANY_SUFFIXES and len(w.strip(".")) > 1]
+
+
+def score_passage(passage: str, ticker: str, company_name: str) -> float:
+    """
+    Score how much investment signal a passage carries about a stock.
+
+    Args:
+        passage (str): Passage text
+        ticker (str): Stock ticker symbol
+        company_name (str): Company name
+
+    Returns:
+        float: Relevance score (higher is better)
+    """
+    lowered = passage.lower()
+    words = max(1, len(lowered.split()))
+
+    ticker_hits = len(re.findall(rf"\b{re.escape(ticker)}\b", passage, re.IGNORECASE)) if ticker else 0
+    company_hits = sum(lowered.count(term) for term in _company_terms(company_name))
+    term_hits = sum(lowered.count(term) for term in FINANCIAL_TERMS)
+    number_hits = len(_NUMBER_PATTERN.findall(passage))
+    boilerplate_hits = sum(lowered.count(term) for term in BOILERPLATE_TERMS)
+
+    score = 3.0 * ticker_hits + 2.0 * company_hits + 1.0 * term_hits + 1.5 * number_hits
+    score -= 2.0 * boilerplate_hits
+
+    # Normalise by length so long passages do not win on size alone
+    return score / (words ** 0.5)
+
+
+def select_passages(text: str, ticker: str, company_name: str, token_budget: int,
+                    passage_tokens: int = 150, model: str = "gpt-4o-mini") -> str:
+    """
+    Select the highest-scoring passages of a text that fit in a token budget.
+
+    Args:
+        text (str): Article text
+        ticker (str): Stock ticker symbol
+        company_name (str): Company name
+        token_budget (int): Maximum tokens of selected text
+        passage_tokens (int): Maximum tokens per passage
+        model (str): Model name used to pick the tokenizer
+
+    Returns:
+        str: Selected passages joined in document order
+    """
+    if not text:
+        return ""
+    if count_tokens(text, model) <= token_budget:
+        return text
+
+    passages = split_passages(text, passage_tokens, model)
+    ranked: List[Tuple[float, int]] = sorted(
+        ((score_passage(p, ticker, company_name), i) for i, p in enumerate(passages)),
+        key=lambda x: (-x[0], x[1])
+    )
+
+    selected, used = [], 0
+    for score, index in ranked:
+        tokens = count_tokens(passages[index], model)
+        if used + tokens > token_budget:
+            continue
+        selected.append(index)
+        used += tokens
+
+    # Keep document order so the LLM reads passages in context
+    return "\n\n".join(passages[i] for i in sorted(selected))
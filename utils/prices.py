@@ -0,0 +1,316 @@
+# utils/prices.py
+import os
+import threading
+import time
+import hashlib
+from datetime import datetime
+from typing import Callable, Dict, Iterable, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+
+try:
+    from zoneinfo import ZoneInfo
+except ImportError:  # Python < 3.9
+    ZoneInfo = None
+
+ALPHA_VANTAGE_URL = "https://www.alphavantage.co/query"
+
+
+def _empty_quote(error: str) -> Dict:
+    """Quote returned when no price is available, matching the fetch_stock_price shape."""
+    return {
+        "price": 0,
+        "change": 0,
+        "change_percent": "0%",
+        "volume": 0,
+        "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "error": error
+    }
+
+
+class RateLimitExceeded(Exception):
+    """Raised when a provider call would wait longer than allowed for the rate limit."""
+
+
+class RateLimiter:
+    """
+    Thread-safe token bucket limiting calls per minute.
+    """
+
+    def __init__(self, calls_per_minute: int, clock: Callable[[], float] = time.monotonic,
+                 sleep: Callable[[float], None] = time.sleep):
+        self.capacity = max(1, calls_per_minute)
+        self.rate = self.capacity / 60.0
+        self.tokens = float(self.capacity)
+        self.clock = clock
+        self.sleep = sleep
+        self.updated = clock()
+        self.lock = threading.Lock()
+
+    def acquire(self, max_wait: Optional[float] = None) -> bool:
+        """
+        Block until a call is allowed.
+
+        Args:
+            max_wait (float): Give up instead of waiting longer than this many seconds in total
+
+        Returns:
+            bool: Whether the call is allowed; False when it would exceed max_wait
+        """
+        deadline = None if max_wait is None else self.clock() + max_wait
+        while True:
+            with self.lock:
+                now = self.clock()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return True
+                wait = (1 - self.tokens) / self.rate
+            if deadline is not None and now + wait > deadline:
+                return False
+            self.sleep(wait)
+
+
+class AlphaVantageProvider:
+    """
+    Quote provider for the Alpha Vantage API over a pooled HTTP session.
+    """
+
+    def __init__(self, api_key: Optional[str] = None, calls_per_minute: int = 5,
+                 bulk: bool = False, timeout: int = 10, pool_size: int = 10, max_wait: Optional[float] = 2.0):
+        """
+        Initialize the provider.
+
+        Without an API key no lookups are made and every quote is an error quote.
+
+        Args:
+            api_key (str): Alpha Vantage API key (defaults to ALPHA_VANTAGE_API_KEY)
+            calls_per_minute (int): Provider rate limit
+            bulk (bool): Use REALTIME_BULK_QUOTES (premium plans) for up to 100 symbols per call
+            timeout (int): Request timeout in seconds
+            pool_size (int): HTTP connection pool size
+            max_wait (float): Longest wait for the rate limit per call before the quote fails;
+                None waits as long as needed
+        """
+        self.api_key = api_key or os.getenv("ALPHA_VANTAGE_API_KEY")
+        self.bulk = bulk
+        self.timeout = timeout
+        self.max_wait = max_wait
+        self.rate_limiter = RateLimiter(calls_per_minute)
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=2)
+        self.session.mount("https://", adapter)
+
+    def _get(self, params: Dict) -> Dict:
+        # Quotes are looked up while serving requests, which must not stall behind the limit
+        if not self.rate_limiter.acquire(self.max_wait):
+            raise RateLimitExceeded("Price provider rate limit reached")
+        response = self.session.get(ALPHA_VANTAGE_URL, params={**params, "apikey": self.api_key}, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()
+
+    def _fetch_one(self, ticker: str) -> Dict:
+        data = self._get({"function": "GLOBAL_QUOTE", "symbol": ticker})
+        quote = data.get("Global Quote")
+        if not quote:
+            return _empty_quote("Price data not available")
+        return {
+            "price": float(quote.get("05. price", 0)),
+            "change": float(quote.get("09. change", 0)),
+            "change_percent": quote.get("10. change percent", "0%"),
+            "volume": int(quote.get("06. volume", 0)),
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        }
+
+    def _fetch_bulk(self, tickers: List[str]) -> Dict[str, Dict]:
+        quotes = {}
+        for i in range(0, len(tickers), 100):
+            chunk = tickers[i:i + 100]
+            data = self._get({"function": "REALTIME_BULK_QUOTES", "symbol": ",".join(chunk)})
+            for item in data.get("data", []):
+                quotes[item.get("symbol", "").upper()] = {
+                    "price": float(item.get("close", 0)),
+                    "change": float(item.get("change", 0)),
+                    "change_percent": f"{item.get('change_percent', 0)}%",
+                    "volume": int(float(item.get("volume", 0))),
+                    "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                }
+        return quotes
+
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """
+        Fetch quotes for several tickers.
+
+        Args:
+            tickers (List[str]): Upper-case ticker symbols
+
+        Returns:
+            Dict[str, Dict]: Quote by ticker
+        """
+        if not self.api_key:
+            return {t: _empty_quote("ALPHA_VANTAGE_API_KEY is not set") for t in tickers}
+
+        if self.bulk:
+            try:
+                quotes = self._fetch_bulk(tickers)
+                return {t: quotes.get(t, _empty_quote("Price data not available")) for t in tickers}
+            except Exception as e:
+                return {t: _empty_quote(str(e)) for t in tickers}
+
+        quotes = {}
+        for i, ticker in enumerate(tickers):
+            try:
+                quotes[ticker] = self._fetch_one(ticker)
+            except RateLimitExceeded as e:
+                # The limit will not free up for the rest either
+                quotes.update({t: _empty_quote(str(e)) for t in tickers[i:]})
+                break
+            except Exception as e:
+                quotes[ticker] = _empty_quote(str(e))
+        return quotes
+
+
+class FakePriceProvider:
+    """
+    Local provider with deterministic prices, for tests and offline development.
+    """
+
+    def __init__(self, prices: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            prices (Dict[str, float]): Fixed prices by ticker; other tickers get a stable
+                pseudo-random price derived from the symbol
+        """
+        self.prices = {k.upper(): v for k, v in (prices or {}).items()}
+        self.calls: List[List[str]] = []
+
+    def fetch_quotes(self, tickers: List[str]) -> Dict[str, Dict]:
+        """Return a quote for every ticker and record the call."""
+        self.calls.append(list(tickers))
+        quotes = {}
+        for ticker in tickers:
+            seed = int(hashlib.sha256(ticker.encode("utf-8")).hexdigest()[:8], 16)
+            price = self.prices.get(ticker, 10 + seed % 490)
+            quotes[ticker] = {
+                "price": float(price),
+                "change": 0.0,
+                "change_percent": "0%",
+                "volume": seed % 1000000,
+                "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            }
+        return quotes
+
+
+class PriceService:
+    """
+    Quote lookups with batching and an in-memory TTL cache.
+
+    Quotes are cached for ttl_seconds while the market is open and for
+    closed_ttl_seconds otherwise, when prices do not move. Failed quotes are
+    cached for error_ttl_seconds, so retries do not hit the provider again.
+    """
+
+    def __init__(self, provider, ttl_seconds: int = 300, closed_ttl_seconds: int = 3600,
+                 error_ttl_seconds: int = 60, market_timezone: str = "America/New_York",
+                 clock: Callable[[], float] = time.time):
+        self.provider = provider
+        self.ttl_seconds = ttl_seconds
+        self.closed_ttl_seconds = closed_ttl_seconds
+        self.error_ttl_seconds = error_ttl_seconds
+        self.market_timezone = market_timezone
+        self.clock = clock
+        self._cache: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+
+    def _market_open(self) -> bool:
+        """Whether regular trading hours are in session (weekdays 09:30-16:00 exchange time)."""
+        if ZoneInfo is None:
+            return True
+        try:
+            now = datetime.fromtimestamp(self.clock(), ZoneInfo(self.market_timezone))
+        except Exception:
+            return True
+        minutes = now.hour * 60 + now.minute
+        return now.weekday() < 5 and 9 * 60 + 30 <= minutes < 16 * 60
+
+    def _ttl(self) -> int:
+        return self.ttl_seconds if self._market_open() else self.closed_ttl_seconds
+
+    def get_quotes(self, tickers: Iterable[str]) -> Dict[str, Dict]:
+        """
+        Get quotes for several tickers, fetching only the uncached ones in one provider call.
+
+        Args:
+            tickers (Iterable[str]): Ticker symbols
+
+        Returns:
+            Dict[str, Dict]: Quote by upper-case ticker
+        """
+        tickers = list(dict.fromkeys(t.upper() for t in tickers if t))
+        now = self.clock()
+        quotes, missing = {}, []
+
+        with self._lock:
+            for ticker in tickers:
+                cached = self._cache.get(ticker)
+                if cached and cached[0] > now:
+                    quotes[ticker] = cached[1]
+                else:
+                    missing.append(ticker)
+
+        if missing:
+            fetched = self.provider.fetch_quotes(missing)
+            expires_at = now + self._ttl()
+            with self._lock:
+                for ticker in missing:
+                    quote = fetched.get(ticker) or _empty_quote("Price data not available")
+                    quotes[ticker] = quote
+                    # Failures are kept briefly, so the provider is retried soon but not on every request
+                    self._cache[ticker] = (now + self.error_ttl_seconds if quote.get("error") else expires_at, quote)
+
+        return quotes
+
+    def get_quote(self, ticker: str) -> Dict:
+        """Get the quote for one ticker."""
+        return self.get_quotes([ticker])[ticker.upper()]
+
+    def clear(self) -> None:
+        """Drop all cached quotes."""
+        with self._lock:
+            self._cache.clear()
+
+
+_default_service = None
+_default_lock = threading.Lock()
+
+
+def get_price_service() -> PriceService:
+    """
+    Return the process-wide price service, configured from the environment.
+
+    PRICE_PROVIDER selects "alphavantage" (default) or "fake"; Alpha Vantage needs
+    ALPHA_VANTAGE_API_KEY, without which prices are skipped. PRICE_RATE_LIMIT_PER_MINUTE,
+    PRICE_MAX_WAIT_SECONDS, PRICE_CACHE_TTL_SECONDS, PRICE_CLOSED_CACHE_TTL_SECONDS,
+    PRICE_ERROR_CACHE_TTL_SECONDS and ALPHA_VANTAGE_BULK tune it.
+    """
+    global _default_service
+    with _default_lock:
+        if _default_service is None:
+            if os.getenv("PRICE_PROVIDER", "alphavantage").lower() == "fake":
+                provider = FakePriceProvider()
+            else:
+                provider = AlphaVantageProvider(
+                    calls_per_minute=int(os.getenv("PRICE_RATE_LIMIT_PER_MINUTE", "5")),
+                    bulk=os.getenv("ALPHA_VANTAGE_BULK", "false").lower() == "true",
+                    max_wait=float(os.getenv("PRICE_MAX_WAIT_SECONDS", "2"))
+                )
+            _default_service = PriceService(
+                provider,
+                ttl_seconds=int(os.getenv("PRICE_CACHE_TTL_SECONDS", "300")),
+                closed_ttl_seconds=int(os.getenv("PRICE_CLOSED_CACHE_TTL_SECONDS", "3600")),
+                error_ttl_seconds=int(os.getenv("PRICE_ERROR_CACHE_TTL_SECONDS", "60"))
+            )
+        return _default_service
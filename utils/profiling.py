@@ -0,0 +1,266 @@
+# utils/profiling.py
+import contextvars
+import cProfile
+import glob
+import json
+import os
+import pstats
+import re
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+
+# Profiler of the running request, and the node being profiled; thread pools that
+# copy the context (LangGraph nodes, LangChain batch) profile into the same node
+_active_profiler: contextvars.ContextVar = contextvars.ContextVar("active_profiler", default=None)
+_active_node: contextvars.ContextVar = contextvars.ContextVar("active_profile_node", default=None)
+
+# tracemalloc is process-wide, so only one request is profiled at a time
+_session_lock = threading.Lock()
+
+PROFILE_ID_PATTERN = re.compile(r"^[0-9a-f]{8,64}$")
+
+
+def _short_path(filename: str) -> str:
+    """Last two components of a source path, e.g. "agents/filtering.py"."""
+    return "/".join(filename.replace(os.sep, "/").split("/")[-2:])
+
+
+def _function_name(key) -> str:
+    """Short "package/module.py:line(function)" label of a pstats function key."""
+    filename, line, function = key
+    if filename == "~":
+        return function
+    return f"{_short_path(filename)}:{line}({function})"
+
+
+class RequestProfiler:
+    """
+    CPU profile and allocation snapshot of one analysis, broken down by node.
+
+    Each node runs under cProfile, together with the worker threads it starts
+    through profile_thread, and the allocations it leaves behind are the
+    difference of tracemalloc snapshots taken around it.
+    """
+
+    def __init__(self, profile_id: str, ticker: Optional[str] = None, top_n: int = 15,
+                 tracemalloc_frames: int = 1):
+        """
+        Args:
+            profile_id (str): Hex id naming the profile files
+            ticker (str): Ticker the request analyzes
+            top_n (int): Functions and allocation sites reported per node
+            tracemalloc_frames (int): Frames stored per allocation
+        """
+        self.profile_id = profile_id
+        self.ticker = ticker.upper() if ticker else None
+        self.top_n = top_n
+        self.tracemalloc_frames = tracemalloc_frames
+        self.lock = threading.Lock()
+        self.cpu: Dict[str, pstats.Stats] = {}
+        self.wall: Dict[str, float] = {}
+        self.allocations: Dict[str, List[Dict[str, Any]]] = {}
+        self.created_at = time.time()
+        self._started_tracemalloc = False
+
+    @contextmanager
+    def session(self):
+        """
+        Profile the nodes run within the block.
+
+        Yields:
+            bool: False when another request is being profiled; the block then runs unprofiled
+        """
+        if not _session_lock.acquire(blocking=False):
+            yield False
+            return
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+        token = _active_profiler.set(self)
+        try:
+            yield True
+        finally:
+            _active_profiler.reset(token)
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+                self._started_tracemalloc = False
+            _session_lock.release()
+
+    @contextmanager
+    def node(self, name: str):
+        """Profile one node run in the current thread."""
+        before = self._snapshot()
+        token = _active_node.set(name)
+        start = time.perf_counter()
+        try:
+            with profile_thread():
+                yield
+        finally:
+            _active_node.reset(token)
+            with self.lock:
+                self.wall[name] = self.wall.get(name, 0.0) + time.perf_counter() - start
+            if before is not None:
+                self._record_allocations(name, before, self._snapshot())
+
+    def _snapshot(self):
+        if not tracemalloc.is_tracing():
+            return None
+        # Leave out the profiler's own bookkeeping
+        return tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, cProfile.__file__),
+            tracemalloc.Filter(False, pstats.__file__),
+            tracemalloc.Filter(False, __file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>")
+        ))
+
+    def _record_allocations(self, name, before, after):
+        sites = []
+        for diff in after.compare_to(before, "lineno")[:self.top_n]:
+            if diff.size_diff <= 0:
+                continue
+            frame = diff.traceback[0]
+            sites.append({
+                "site": f"{_short_path(frame.filename)}:{frame.lineno}",
+                "size_kb": round(diff.size_diff / 1024, 1),
+                "count": diff.count_diff
+            })
+        with self.lock:
+            self.allocations.setdefault(name, []).extend(sites)
+
+    def add_cpu(self, name: str, profile: cProfile.Profile) -> None:
+        """Merge a thread's CPU profile into a node's."""
+        with self.lock:
+            if name in self.cpu:
+                self.cpu[name].add(profile)
+            else:
+                self.cpu[name] = pstats.Stats(profile)
+
+    def _top_functions(self, stats: pstats.Stats) -> List[Dict[str, Any]]:
+        rows = sorted(stats.stats.items(), key=lambda item: item[1][2], reverse=True)
+        return [{
+            "function": _function_name(key),
+            "calls": calls,
+            "self_seconds": round(self_time, 4),
+            "cumulative_seconds": round(cumulative, 4)
+        } for key, (_, calls, self_time, cumulative, _) in rows[:self.top_n]]
+
+    def report(self) -> Dict[str, Any]:
+        """
+        Summarize the profile.
+
+        Returns:
+            dict: Wall and CPU seconds, top functions by self time and top allocation sites per node
+        """
+        with self.lock:
+            nodes = {}
+            for name in self.wall:
+                stats = self.cpu.get(name)
+                nodes[name] = {
+                    "wall_seconds": round(self.wall[name], 4),
+                    "cpu_seconds": round(stats.total_tt, 4) if stats else None,
+                    "top_functions": self._top_functions(stats) if stats else [],
+                    "top_allocations": sorted(self.allocations.get(name, []),
+                                              key=lambda site: site["size_kb"], reverse=True)[:self.top_n]
+                }
+            return {
+                "profile_id": self.profile_id,
+                "ticker": self.ticker,
+                "created_at": self.created_at,
+                "nodes": nodes
+            }
+
+    def save(self, directory: str, max_profiles: int = 50) -> Dict[str, Any]:
+        """
+        Write the report (JSON) and the merged CPU profile (pstats, for snakeviz or
+        python -m pstats) to a directory, keeping the newest max_profiles.
+
+        Returns:
+            dict: The report
+        """
+        os.makedirs(directory, exist_ok=True)
+        report = self.report()
+        with self.lock:
+            merged = pstats.Stats()
+            for stats in self.cpu.values():
+                merged.add(stats)
+        if merged.stats:
+            merged.dump_stats(os.path.join(directory, f"{self.profile_id}.prof"))
+        with open(os.path.join(directory, f"{self.profile_id}.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f)
+        _prune(directory, max_profiles)
+        return report
+
+
+@contextmanager
+def profile_thread():
+    """
+    Profile the block's CPU time into the node being profiled, if any.
+
+    Worker threads started by a node (e.g. batched extraction) use this to be
+    included in the node's CPU profile; it does nothing outside a profiled request.
+    """
+    profiler, name = _active_profiler.get(), _active_node.get()
+    # Work run inline in an already profiled thread is part of that thread's profile
+    if profiler is None or name is None or sys.getprofile() is not None:
+        yield
+        return
+    # Thread CPU time, so time blocked on I/O and locks does not count as work
+    profile = cProfile.Profile(time.thread_time)
+    try:
+        profile.enable()
+    except ValueError:
+        # Another profiler is already active in this thread
+        yield
+        return
+    try:
+        yield
+    finally:
+        profile.disable()
+        profiler.add_cpu(name, profile)
+
+
+def current_profiler() -> Optional[RequestProfiler]:
+    """Return the profiler of the running request, if it is profiled."""
+    return _active_profiler.get()
+
+
+def _prune(directory: str, max_profiles: int) -> None:
+    reports = sorted(glob.glob(os.path.join(directory, "*.json")), key=os.path.getmtime, reverse=True)
+    for path in reports[max_profiles:]:
+        for stale in (path, path[:-len(".json")] + ".prof"):
+            try:
+                os.remove(stale)
+            except OSError:
+                pass
+
+
+def list_profiles(directory: str) -> List[Dict[str, Any]]:
+    """Id, ticker, creation time and total CPU seconds of the stored profiles, newest first."""
+    profiles = []
+    for path in glob.glob(os.path.join(directory, "*.json")):
+        try:
+            with open(path, encoding="utf-8") as f:
+                report = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            continue
+        profiles.append({
+            "profile_id": report["profile_id"],
+            "ticker": report.get("ticker"),
+            "created_at": report.get("created_at"),
+            "cpu_seconds": round(sum(node["cpu_seconds"] or 0 for node in report["nodes"].values()), 4)
+        })
+    return sorted(profiles, key=lambda profile: profile["created_at"] or 0, reverse=True)
+
+
+def profile_path(directory: str, profile_id: str, extension: str = "json") -> Optional[str]:
+    """Path of a stored profile file, or None for unknown or malformed ids."""
+    if not PROFILE_ID_PATTERN.match(profile_id):
+        return None
+    path = os.path.join(directory, f"{profile_id}.{extension}")
+    return path if os.path.exists(path) else None
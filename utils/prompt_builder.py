@@ -0,0 +1,194 @@
+# utils/prompt_builder.py
+from typing import Any, Dict, List, Tuple
+from utils.passages import count_tokens
+
+# Section priorities for insight prompts (lower is kept first); sentiment only rolls up the others
+INSIGHT_PRIORITIES = {
+    "ANALYST TARGETS": 0,
+    "FINANCIAL METRICS": 1,
+    "BUSINESS DEVELOPMENTS": 2,
+    "RISK FACTORS": 3,
+    "MARKET SENTIMENT": 4,
+    "ARTICLE SUMMARIES": 5
+}
+
+SCORE_COMPONENTS = (
+    ("Financial Health", "financial_health_score"),
+    ("Growth Potential", "growth_potential_score"),
+    ("Analyst Sentiment", "analyst_sentiment_score"),
+    ("Momentum", "momentum_score"),
+    ("Risk Level", "risk_score")
+)
+
+
+class PromptBuilder:
+    """
+    Assemble prompt sections under a token budget, keeping higher-priority lines first.
+    """
+
+    def __init__(self, token_budget: int, model: str = "gpt-4o-mini"):
+        """
+        Initialize the builder.
+
+        Args:
+            token_budget (int): Maximum tokens of the rendered text
+            model (str): Model name used to count tokens
+        """
+        self.token_budget = token_budget
+        self.model = model
+        self.sections: List[Tuple[str, List[str], int]] = []
+
+    def add_section(self, title: str, lines: List[str], priority: int) -> "PromptBuilder":
+        """
+        Add a titled section of lines.
+
+        Args:
+            title (str): Section heading
+            lines (List[str]): Lines in their preferred order
+            priority (int): Lower values are kept first when over budget
+
+        Returns:
+            PromptBuilder: The builder, for chaining
+        """
+        lines = [line for line in lines if line]
+        if lines:
+            self.sections.append((title, lines, priority))
+        return self
+
+    def build(self) -> Tuple[str, Dict[str, Any]]:
+        """
+        Render the sections that fit in the budget.
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: (text, stats with token count and dropped lines)
+        """
+        used = 0
+        kept = {title: [] for title, _, _ in self.sections}
+        dropped = 0
+
+        # Fill the budget by priority; sections keep their insertion order when rendered
+        for title, lines, _ in sorted(self.sections, key=lambda s: s[2]):
+            for line in lines:
+                cost = count_tokens(f"- {line}\n", self.model)
+                if not kept[title]:
+                    cost += count_tokens(f"{title}:\n", self.model)
+                if used + cost > self.token_budget:
+                    dropped += 1
+                    continue
+                kept[title].append(line)
+                used += cost
+
+        text = "".join(
+            f"{title}:\n" + "".join(f"- {line}\n" for line in kept[title])
+            for title, _, _ in self.sections if kept[title]
+        )
+
+        return text, {
+            "tokens": count_tokens(text, self.model),
+            "budget": self.token_budget,
+            "dropped_lines": dropped
+        }
+
+
+def _join(*parts) -> str:
+    """Join non-empty parts with ' | '."""
+    return " | ".join(str(part) for part in parts if part)
+
+
+def _mentions(entry: Dict[str, Any]) -> str:
+    """Return a compact mention count such as 'x3' for entries cited more than once."""
+    mentions = entry.get("mentions", 1)
+    return f"x{mentions}" if mentions > 1 else ""
+
+
+def build_insights_text(consolidated: Dict[str, Any], token_budget: int,
+                        model: str = "gpt-4o-mini") -> Tuple[str, Dict[str, Any]]:
+    """
+    Render consolidated insights compactly under a token budget.
+
+    Args:
+        consolidated (Dict[str, Any]): Results of InsightConsolidator
+        token_budget (int): Maximum tokens of the rendered insights
+        model (str): Model name used to count tokens
+
+    Returns:
+        Tuple[str, Dict[str, Any]]: (insights text, stats)
+    """
+    builder = PromptBuilder(token_budget, model)
+
+    sentiment = consolidated.get("market_sentiment") or {}
+    if sentiment:
+        counts = ", ".join(f"{label} {count}" for label, count in sorted(sentiment.get("counts", {}).items()))
+        builder.add_section("MARKET SENTIMENT", [_join(sentiment.get("overall_sentiment"), counts)],
+                            INSIGHT_PRIORITIES["MARKET SENTIMENT"])
+
+    builder.add_section("ANALYST TARGETS", [
+        _join(
+            o.get("analyst_or_firm"), o.get("rating"),
+            f"target {o['target_price']}" if o.get("target_price") else "",
+            f"prev {o.get('previous_rating') or ''} {o.get('previous_target') or ''}".strip()
+            if o.get("previous_rating") or o.get("previous_target") else "",
+            _mentions(o)
+        )
+        for o in consolidated.get("analyst_opinions", [])
+    ], INSIGHT_PRIORITIES["ANALYST TARGETS"])
+
+    builder.add_section("FINANCIAL METRICS", [
+        _join(f"{m.get('metric_name')}: {m.get('value', 'N/A')}", m.get("comparison"), m.get("sentiment"), _mentions(m))
+        for m in consolidated.get("financial_metrics", [])
+    ], INSIGHT_PRIORITIES["FINANCIAL METRICS"])
+
+    builder.add_section("BUSINESS DEVELOPMENTS", [
+        _join(d.get("event_type"), d.get("description"), d.get("expected_impact"), _mentions(d))
+        for d in consolidated.get("business_developments", [])
+    ], INSIGHT_PRIORITIES["BUSINESS DEVELOPMENTS"])
+
+    builder.add_section("RISK FACTORS", [
+        _join(r.get("risk_type"), r.get("severity"), r.get("description"), _mentions(r))
+        for r in consolidated.get("risk_factors", [])
+    ], INSIGHT_PRIORITIES["RISK FACTORS"])
+
+    builder.add_section("ARTICLE SUMMARIES", [
+        " ".join(str(s.get("summary", "")).split())
+        for s in consolidated.get("summaries", [])
+    ], INSIGHT_PRIORITIES["ARTICLE SUMMARIES"])
+
+    return builder.build()
+
+
+def build_scores_text(score: Any) -> str:
+    """
+    Render a StockScore compactly for the recommendation prompt.
+
+    Args:
+        score (Any): StockScore (or object with the same attributes)
+
+    Returns:
+        str: Scores text
+    """
+    reasoning = getattr(score, "reasoning", {}) or {}
+    lines = [
+        _join(f"{label}: {getattr(score, field)}/10", reasoning.get(field, ""))
+        for label, field in SCORE_COMPONENTS
+    ]
+    lines.append(f"OVERALL SCORE: {score.overall_score}/100")
+    lines.append(f"RECOMMENDATION: {score.investment_recommendation}")
+    lines.append(f"CONFIDENCE: {score.confidence_level}")
+    return "\n".join(lines)
+
+
+def build_price_text(price_data: Dict[str, Any]) -> str:
+    """
+    Render a price quote for prompts.
+
+    Args:
+        price_data (Dict[str, Any]): Quote from the price service
+
+    Returns:
+        str: Price text, or a note that the price is unavailable
+    """
+    if not price_data or price_data.get("error") or not price_data.get("price"):
+        return "Current price: not available"
+    return (f"Current price: {price_data['price']:.2f} "
+            f"(change {price_data.get('change', 0):+.2f}, {price_data.get('change_percent', '0%')}) "
+            f"as of {price_data.get('timestamp', '')}").strip()
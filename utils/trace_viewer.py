@@ -0,0 +1,122 @@
+# utils/trace_viewer.py
+"""
+Render the timeline of one traced run from the JSON-lines trace file.
+
+Usage:
+    python -m utils.trace_viewer                # list recent traces
+    python -m utils.trace_viewer <trace_id>     # timeline of one trace
+"""
+import argparse
+import json
+import os
+from typing import Any, Dict, List
+
+
+def load_spans(path: str, trace_id: str = None) -> List[Dict[str, Any]]:
+    """
+    Read spans from a trace file and its rotated predecessor.
+
+    Args:
+        path (str): JSON-lines trace file
+        trace_id (str): Only spans of this trace (a unique prefix is enough)
+
+    Returns:
+        list: Span dicts in file order
+    """
+    spans = []
+    for candidate in (path + ".1", path):
+        if not os.path.exists(candidate):
+            continue
+        with open(candidate, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    span = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if trace_id is None or span["trace_id"].startswith(trace_id):
+                    spans.append(span)
+    return spans
+
+
+def list_traces(spans: List[Dict[str, Any]], limit: int = 20) -> str:
+    """Summarize the most recent root spans, one line per trace."""
+    roots = [span for span in spans if span["parent_id"] is None]
+    roots.sort(key=lambda span: span["start_time"], reverse=True)
+    lines = []
+    for span in roots[:limit]:
+        ticker = span["attributes"].get("ticker", "")
+        lines.append(f"{span['trace_id']}  {span['name']:<24} {ticker:<8} "
+                     f"{span['duration_ms'] / 1000:8.2f}s  {span['status']}")
+    return "\n".join(lines) or "No traces found"
+
+
+def _label(span: Dict[str, Any]) -> str:
+    """Span name with its most telling attributes."""
+    attributes = span["attributes"]
+    details = []
+    for key in ("ticker", "url", "llm.model", "tool.input", "cache_hit", "http.status_code",
+                "http.response_bytes", "llm.prompt_tokens", "llm.completion_tokens", "tool.results"):
+        value = attributes.get(key)
+        if value is not None and value != "":
+            details.append(f"{key.split('.')[-1]}={str(value)[:60]}")
+    if span["status"] == "error":
+        details.append(f"error={str(attributes.get('error.message', ''))[:60]}")
+    return span["name"] + (f" ({', '.join(details)})" if details else "")
+
+
+def render_timeline(spans: List[Dict[str, Any]], width: int = 40) -> str:
+    """
+    Render spans as an indented tree with a bar showing when each ran.
+
+    Args:
+        spans (list): Span dicts of one trace
+        width (int): Characters of the timeline bar
+
+    Returns:
+        str: Timeline text
+    """
+    if not spans:
+        return "No spans found"
+    start = min(span["start_time"] for span in spans)
+    end = max(span["end_time"] or span["start_time"] for span in spans)
+    total = max(end - start, 1e-9)
+
+    span_ids = {span["span_id"] for span in spans}
+    children: Dict[Any, List[Dict[str, Any]]] = {}
+    for span in spans:
+        # Spans whose parent is not in the file are shown at the top level
+        parent = span["parent_id"] if span["parent_id"] in span_ids else None
+        children.setdefault(parent, []).append(span)
+
+    lines = [f"Trace {spans[0]['trace_id']}: {total:.2f}s, {len(spans)} spans"]
+
+    def visit(parent, depth):
+        for span in sorted(children.get(parent, []), key=lambda s: s["start_time"]):
+            offset = span["start_time"] - start
+            duration = (span["end_time"] or span["start_time"]) - span["start_time"]
+            left = int(offset / total * width)
+            bar = " " * left + "█" * max(1, int(round(duration / total * width)))
+            lines.append(f"{offset:8.2f}s {duration:8.2f}s |{bar[:width]:<{width}}| {'  ' * depth}{_label(span)}")
+            visit(span["span_id"], depth + 1)
+
+    visit(None, 0)
+    return "\n".join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Show the timeline of a traced analysis run.")
+    parser.add_argument("trace_id", nargs="?", help="Trace id (or a unique prefix); lists recent traces if omitted")
+    parser.add_argument("--file", default=os.getenv("TRACE_FILE", os.path.join("cache", "traces.jsonl")),
+                        help="JSON-lines trace file")
+    parser.add_argument("--width", type=int, default=40, help="Width of the timeline bars")
+    parser.add_argument("--limit", type=int, default=20, help="Traces listed without a trace id")
+    args = parser.parse_args(argv)
+
+    if args.trace_id:
+        print(render_timeline(load_spans(args.file, args.trace_id), args.width))
+    else:
+        print(list_traces(load_spans(args.file), args.limit))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# utils/tracing.py
+import contextvars
+import json
+import os
+import secrets
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, List, Optional
+from uuid import UUID
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+from utils.llm_costs import reported_usage
+
+# Span of the code running in this context; thread pools that copy the context
+# (LangGraph nodes, LangChain batch) keep the parent-child links
+_current_span: contextvars.ContextVar = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    """
+    One timed operation of a trace, with the OpenTelemetry span fields.
+    """
+
+    def __init__(self, name: str, trace_id: Optional[str] = None, parent_id: Optional[str] = None,
+                 kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        self.name = name
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.kind = kind
+        self.attributes: Dict[str, Any] = dict(attributes or {})
+        self.status = "ok"
+        self.start_time = time.time()
+        self.end_time: Optional[float] = None
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_attributes(self, attributes: Dict[str, Any]) -> None:
+        self.attributes.update(attributes)
+
+    def set_error(self, message: str, error_type: Optional[str] = None) -> None:
+        """Mark the span as failed."""
+        self.status = "error"
+        self.attributes["error.message"] = str(message)[:500]
+        if error_type:
+            self.attributes["error.type"] = error_type
+
+    def end(self) -> None:
+        if self.end_time is None:
+            self.end_time = time.time()
+
+    @property
+    def duration_ms(self) -> Optional[float]:
+        if self.end_time is None:
+            return None
+        return round((self.end_time - self.start_time) * 1000, 3)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": self.duration_ms,
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class JsonlExporter:
+    """
+    Append finished spans to a JSON-lines file, rotating it at max_bytes.
+    """
+
+    def __init__(self, path: str, max_bytes: int = 50 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def export(self, span: Span) -> None:
+        line = json.dumps(span.to_dict(), default=str) + "\n"
+        with self.lock:
+            try:
+                if os.path.getsize(self.path) > self.max_bytes:
+                    os.replace(self.path, self.path + ".1")
+            except OSError:
+                pass
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+
+
+class ConsoleExporter:
+    """Print one line per finished span."""
+
+    def __init__(self, stream=None):
+        self.stream = stream or sys.stderr
+
+    def export(self, span: Span) -> None:
+        attributes = " ".join(f"{k}={v}" for k, v in span.attributes.items())
+        print(f"[trace {span.trace_id[:8]}] {span.name} {span.duration_ms:.1f}ms {span.status} {attributes}",
+              file=self.stream)
+
+
+class InMemoryExporter:
+    """Keep the most recent finished spans in memory, for tests and debugging."""
+
+    def __init__(self, max_spans: int = 10000):
+        self.spans = deque(maxlen=max_spans)
+
+    def export(self, span: Span) -> None:
+        self.spans.append(span)
+
+    def trace(self, trace_id: str) -> List[Span]:
+        return [span for span in list(self.spans) if span.trace_id == trace_id]
+
+
+class Tracer:
+    """
+    Create spans and hand finished spans to the exporters.
+    """
+
+    def __init__(self, exporters: Iterable = ()):
+        self.exporters = list(exporters)
+
+    def _export(self, span: Span) -> None:
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                print(f"Error exporting span {span.name}: {str(e)}")
+
+    def begin_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None,
+                   parent: Optional[Span] = None) -> Span:
+        """
+        Start a span without making it current; finish it with end_span.
+
+        Args:
+            name (str): Operation name
+            kind (str): "internal", "server" or "client"
+            attributes (dict): Initial attributes
+            parent (Span): Parent span; defaults to the current span
+
+        Returns:
+            Span: The started span
+        """
+        parent = parent or _current_span.get()
+        return Span(name, parent.trace_id if parent else None, parent.span_id if parent else None, kind, attributes)
+
+    def end_span(self, span: Span) -> None:
+        """Finish a span started with begin_span and export it."""
+        span.end()
+        self._export(span)
+
+    @contextmanager
+    def start_span(self, name: str, kind: str = "internal", attributes: Optional[Dict[str, Any]] = None):
+        """
+        Run a block in a new span, child of the current one.
+
+        Exceptions mark the span as failed and propagate.
+
+        Yields:
+            Span: The span, current within the block
+        """
+        span = self.begin_span(name, kind, attributes)
+        token = _current_span.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set_error(str(e), type(e).__name__)
+            raise
+        finally:
+            _current_span.reset(token)
+            self.end_span(span)
+
+
+@contextmanager
+def use_span(span: Span):
+    """Make a span started with begin_span current within a block, without ending it."""
+    token = _current_span.set(span)
+    try:
+        yield span
+    finally:
+        _current_span.reset(token)
+
+
+def current_span() -> Optional[Span]:
+    """Return the span of the running code, if any."""
+    return _current_span.get()
+
+
+def set_span_attributes(**attributes) -> None:
+    """Add attributes to the current span; does nothing outside a span."""
+    span = _current_span.get()
+    if span is not None:
+        span.set_attributes(attributes)
+
+
+class TracingCallbackHandler(BaseCallbackHandler):
+    """
+    LangChain callback recording a span for every LLM call and tool call (e.g. web search).
+
+    Spans are children of the current span. Calls made where no span is current,
+    such as a streamed response consumed by another thread, can name their parent
+    with "trace_id" and "parent_span_id" run metadata.
+    """
+
+    def __init__(self, tracer: Tracer):
+        self.tracer = tracer
+        self.lock = threading.Lock()
+        self.spans: Dict[UUID, Span] = {}
+
+    def _begin(self, run_id, name, kind, attributes, metadata=None):
+        metadata = metadata or {}
+        if _current_span.get() is None and metadata.get("trace_id"):
+            span = Span(name, metadata["trace_id"], metadata.get("parent_span_id"), kind, attributes)
+        else:
+            span = self.tracer.begin_span(name, kind, attributes)
+        with self.lock:
+            self.spans[run_id] = span
+
+    def _end(self, run_id, error=None, attributes=None):
+        with self.lock:
+            span = self.spans.pop(run_id, None)
+        if span is None:
+            return
+        if attributes:
+            span.set_attributes(attributes)
+        if error is not None:
+            span.set_error(str(error), type(error).__name__)
+        self.tracer.end_span(span)
+
+    def _llm_attributes(self, metadata, kwargs):
+        params = kwargs.get("invocation_params") or {}
+        return {
+            "llm.model": (metadata or {}).get("ls_model_name") or params.get("model_name") or params.get("model"),
+            "langgraph.node": (metadata or {}).get("langgraph_node")
+        }
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, metadata=None, **kwargs):
+        attributes = self._llm_attributes(metadata, kwargs)
+        attributes["llm.messages"] = sum(len(batch) for batch in messages)
+        self._begin(run_id, "llm", "client", attributes, metadata)
+
+    def on_llm_start(self, serialized, prompts, *, run_id, metadata=None, **kwargs):
+        attributes = self._llm_attributes(metadata, kwargs)
+        attributes["llm.prompts"] = len(prompts)
+        self._begin(run_id, "llm", "client", attributes, metadata)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        usage = reported_usage(response)
+        attributes = {}
+        if usage is not None:
+            attributes = {"llm.prompt_tokens": usage[0], "llm.completion_tokens": usage[1]}
+        self._end(run_id, attributes=attributes)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+    def on_tool_start(self, serialized, input_str, *, run_id, metadata=None, **kwargs):
+        name = (serialized or {}).get("name") or kwargs.get("name") or "tool"
+        self._begin(run_id, f"tool {name}", "client", {
+            "tool.name": name,
+            "tool.input": str(input_str)[:300],
+            "langgraph.node": (metadata or {}).get("langgraph_node")
+        }, metadata)
+
+    def on_tool_end(self, output, *, run_id, **kwargs):
+        attributes = {"tool.output_bytes": len(str(output).encode("utf-8"))}
+        content = getattr(output, "content", output)
+        if isinstance(content, list):
+            attributes["tool.results"] = len(content)
+        self._end(run_id, attributes=attributes)
+
+    def on_tool_error(self, error, *, run_id, **kwargs):
+        self._end(run_id, error=error)
+
+
+_default_tracer = None
+_default_lock = threading.Lock()
+
+
+def get_tracer() -> Tracer:
+    """
+    Return the process-wide tracer, configured from the environment.
+
+    TRACE_EXPORTER is a comma-separated list of "jsonl" (default), "console" or
+    "none". The JSON-lines exporter writes to TRACE_FILE (cache/traces.jsonl).
+    """
+    global _default_tracer
+    with _default_lock:
+        if _default_tracer is None:
+            exporters = []
+            for name in os.getenv("TRACE_EXPORTER", "jsonl").lower().split(","):
+                name = name.strip()
+                if name == "jsonl":
+                    exporters.append(JsonlExporter(os.getenv("TRACE_FILE", os.path.join("cache", "traces.jsonl"))))
+                elif name == "console":
+                    exporters.append(ConsoleExporter())
+            _default_tracer = Tracer(exporters)
+        return _default_tracer